@@ -0,0 +1,115 @@
+"""
+Asyncio runtime for Kafka consumers.
+
+The blocking kafka-python consumer is driven from one dedicated thread while
+handlers run as coroutines on the event loop, so a single process can keep
+hundreds of I/O-bound events in flight. Events with the same key still run
+one after another, and offsets are committed only after handling completes.
+If a handler raises, its record is not committed and the runtime stops, so
+the record is consumed again after a restart.
+"""
+
+import os
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from kafka import KafkaConsumer
+
+import kafka_utils
+
+logger = logging.getLogger(__name__)
+
+# Runtime settings
+ASYNC_CONCURRENCY = int(os.getenv("CONSUMER_ASYNC_CONCURRENCY", 200))
+POLL_TIMEOUT_MS = int(os.getenv("CONSUMER_POLL_TIMEOUT_MS", 1000))
+POLL_MAX_RECORDS = int(os.getenv("CONSUMER_POLL_MAX_RECORDS", 500))
+
+class AsyncConsumerRuntime:
+    """Dispatches consumed records to an async handler with bounded concurrency."""
+
+    def __init__(self, handler: Callable[[Dict[str, Any]], Awaitable[Any]], concurrency: int = ASYNC_CONCURRENCY):
+        self.handler = handler
+        self.concurrency = concurrency
+        self._slots = None
+        self._tails = {}  # key -> last task queued for that key
+        self._tasks = set()
+        self._stopping = None
+        self._error = None
+        # kafka-python consumers are not thread-safe, so every call goes through one thread
+        self._consumer_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="kafka-poll")
+
+    async def run(self, consumer: KafkaConsumer, tracker: Optional[kafka_utils.OffsetTracker] = None,
+                  poll_timeout_ms: int = POLL_TIMEOUT_MS, max_records: int = POLL_MAX_RECORDS) -> None:
+        """
+        Poll the consumer and run the handler for each record until stop() is called.
+
+        The consumer should be created with the same tracker passed to
+        kafka_utils.get_consumer(offset_tracker=...).
+
+        Raises:
+            Exception: The first error raised by the handler, once in-flight handlers have finished
+        """
+        loop = asyncio.get_running_loop()
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self._stopping = asyncio.Event()
+        tracker = tracker or kafka_utils.OffsetTracker()
+        logger.info(f"Async consumer started with up to {self.concurrency} events in flight")
+
+        try:
+            while not self._stopping.is_set():
+                records = await loop.run_in_executor(
+                    self._consumer_thread, lambda: consumer.poll(timeout_ms=poll_timeout_ms, max_records=max_records)
+                )
+                for tp, batch in records.items():
+                    for record in batch:
+                        # Wait for a free slot so polling stops when handlers fall behind
+                        await self._slots.acquire()
+                        tracker.add(tp, record.offset)
+                        self._dispatch(tracker, tp, record)
+                await loop.run_in_executor(self._consumer_thread, tracker.maybe_commit, consumer)
+        finally:
+            # Let in-flight handlers finish so their offsets can be committed
+            if self._tasks:
+                await asyncio.wait(list(self._tasks))
+            await loop.run_in_executor(self._consumer_thread, tracker.commit, consumer)
+            self._consumer_thread.shutdown(wait=True)
+            logger.info("Async consumer stopped")
+        if self._error is not None:
+            raise self._error
+
+    def stop(self) -> None:
+        """Ask run() to finish after the current poll."""
+        if self._stopping is not None:
+            self._stopping.set()
+
+    def _dispatch(self, tracker, tp, record) -> None:
+        key = record.key if record.key is not None else (tp.topic, tp.partition)
+        previous = self._tails.get(key)
+        task = asyncio.create_task(self._handle(previous, tp, record))
+        self._tails[key] = task
+        self._tasks.add(task)
+
+        def on_done(task):
+            self._tasks.discard(task)
+            if self._tails.get(key) is task:
+                del self._tails[key]
+            # A handler cancelled at shutdown did not finish, so its record is consumed again
+            if not task.cancelled() and task.exception() is None:
+                tracker.done(tp, record.offset)
+            self._slots.release()
+
+        task.add_done_callback(on_done)
+
+    async def _handle(self, previous, tp, record) -> None:
+        # Keep events for the same key in order
+        if previous is not None:
+            await asyncio.wait([previous])
+        try:
+            await self.handler(record.value)
+        except Exception as e:
+            logger.error(f"Error processing record {tp.topic}-{tp.partition}@{record.offset}, stopping: {e}")
+            self._error = self._error or e
+            self.stop()
+            raise
@@ -2,7 +2,12 @@
 Authentication utilities and handlers.
 """
 
+import os
+import asyncio
+import multiprocessing
 import bcrypt
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
@@ -16,6 +21,33 @@ def hash_password(password: str) -> str:
     hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
     return hashed.decode('utf-8')
 
+# Worker processes hashing passwords for bulk imports
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", os.cpu_count() or 1))
+_hash_pool = None
+
+def hash_passwords(passwords: List[str]) -> List[str]:
+    return [hash_password(password) for password in passwords]
+
+async def hash_passwords_in_pool(passwords: List[str]) -> List[str]:
+    """Hash many passwords, split across the worker processes."""
+    global _hash_pool
+    if _hash_pool is None:
+        # Forking would copy the API's threads' locks mid-use, so start workers fresh
+        _hash_pool = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS,
+                                         mp_context=multiprocessing.get_context("spawn"))
+    loop = asyncio.get_running_loop()
+    size = -(-len(passwords) // PASSWORD_HASH_WORKERS)
+    parts = [passwords[start:start + size] for start in range(0, len(passwords), size)]
+    hashed = await asyncio.gather(*(loop.run_in_executor(_hash_pool, hash_passwords, part) for part in parts))
+    return [value for part in hashed for value in part]
+
+def shutdown_hash_pool() -> None:
+    """Stop the password hashing workers."""
+    global _hash_pool
+    if _hash_pool is not None:
+        _hash_pool.shutdown(cancel_futures=True)
+        _hash_pool = None
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
 
@@ -0,0 +1,4 @@
+# Benchmarks package initialization
+"""
+Benchmark scripts for the backend. Run them from the Backend directory.
+"""
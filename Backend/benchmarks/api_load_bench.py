@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+"""
+Load benchmark for cached reads: sync handlers on the blocking Redis client
+versus async handlers on utils.async_cache, at high concurrency.
+
+By default both handlers run in-process against a stand-in Redis that adds a
+fixed latency to every command, so no server is needed. Sync handlers run in
+FastAPI's threadpool (40 threads), which caps how many cache calls can wait at
+once; async handlers are limited only by the concurrency.
+
+With --url, the same load is sent to a running API instead, e.g. GET /users/1.
+
+Requires httpx.
+
+Usage:
+    python benchmarks/api_load_bench.py [--requests 5000] [--concurrency 500] [--latency-ms 5]
+    python benchmarks/api_load_bench.py --url http://localhost:8000/users/1
+"""
+
+import os
+import sys
+import time
+import asyncio
+import logging
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import FastAPI
+
+from utils import cache, async_cache
+
+class SlowRedis:
+    """Blocking stand-in for the Redis client with a fixed per-command latency."""
+
+    def __init__(self, store, latency):
+        self.store = store
+        self.latency = latency
+
+    def get(self, key):
+        time.sleep(self.latency)
+        return self.store.get(key)
+
+    def setex(self, key, expiry, value):
+        time.sleep(self.latency)
+        self.store[key] = value
+
+    def set(self, key, value, nx=False, px=None):
+        time.sleep(self.latency)
+        if nx and key in self.store:
+            return None
+        self.store[key] = value
+        return True
+
+    def eval(self, script, numkeys, key, token):
+        time.sleep(self.latency)
+        return int(self.store.pop(key, None) is not None)
+
+class AsyncSlowRedis(SlowRedis):
+    """Async stand-in for the Redis client with the same latency."""
+
+    async def get(self, key):
+        await asyncio.sleep(self.latency)
+        return self.store.get(key)
+
+    async def setex(self, key, expiry, value):
+        await asyncio.sleep(self.latency)
+        self.store[key] = value
+
+    async def set(self, key, value, nx=False, px=None):
+        await asyncio.sleep(self.latency)
+        if nx and key in self.store:
+            return None
+        self.store[key] = value
+        return True
+
+    async def eval(self, script, numkeys, key, token):
+        await asyncio.sleep(self.latency)
+        return int(self.store.pop(key, None) is not None)
+
+def make_app():
+    app = FastAPI()
+    user = {"id": 1, "email": "user1@example.com", "details": None}
+
+    @app.get("/sync/users/{user_id}")
+    def read_user_sync(user_id: int):
+        return cache.get_or_compute(f"users:{user_id}", lambda: user, 300, beta=0)
+
+    @app.get("/async/users/{user_id}")
+    async def read_user_async(user_id: int):
+        async def load():
+            return user
+        return await async_cache.get_or_compute(f"users:{user_id}", load, 300, beta=0)
+
+    return app
+
+async def run(label, client, url, requests, concurrency):
+    remaining = iter(range(requests))
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            response = await client.get(url)
+            if response.status_code != 200:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    print(f"{label:<8} {requests} requests, concurrency {concurrency}: {elapsed:.2f}s "
+          f"({requests / elapsed:,.0f} req/s, {errors} errors)")
+
+async def main():
+    parser = argparse.ArgumentParser(description="Compare sync and async cached reads under load")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="Simulated Redis latency per command")
+    parser.add_argument("--url", help="Load test a running API at this URL instead")
+    args = parser.parse_args()
+
+    if args.url:
+        limits = httpx.Limits(max_connections=args.concurrency)
+        async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+            await run("remote", client, args.url, args.requests, args.concurrency)
+        return
+
+    # Per-request cache logging would dominate the measurement
+    logging.disable(logging.INFO)
+
+    # Route both cache paths to the stand-in Redis
+    store = {}
+    latency = args.latency_ms / 1000
+    cache.redis_client.client = SlowRedis(store, latency)
+    slow_async = AsyncSlowRedis(store, latency)
+    async_cache.get_async_client = lambda: slow_async
+
+    transport = httpx.ASGITransport(app=make_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for label in ("sync", "async"):
+            await client.get(f"/{label}/users/1")  # warm the cache
+            await run(label, client, f"/{label}/users/1", args.requests, args.concurrency)
+
+if __name__ == "__main__":
+    asyncio.run(main())
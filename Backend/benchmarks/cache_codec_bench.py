@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+"""
+Benchmark encode/decode time and stored size of cached values per codec.
+
+The payload is a users list page with details, like the ones cached by the
+list routes. Codecs and compressors that are not installed are skipped.
+
+Usage:
+    python benchmarks/cache_codec_bench.py [page size] [iterations]
+"""
+
+import os
+import sys
+import json
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.codecs import Codec, available_codecs
+
+def make_page(size):
+    return [{
+        "id": i,
+        "email": f"user{i}@example.com",
+        "details": {
+            "id": i,
+            "user_id": i,
+            "name": f"User Number {i}",
+            "email": f"user{i}@example.com",
+            "phone": f"+1555{i:07d}",
+        },
+    } for i in range(size)]
+
+def timed(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    page = make_page(size)
+    codecs, compressors = available_codecs()
+
+    # What cache_set stored before the codec layer
+    legacy = json.dumps(page)
+    print(f"{'codec':<16} {'encode us':>10} {'decode us':>10} {'bytes':>8}")
+    print(f"{'json (legacy)':<16} {timed(lambda: json.dumps(page), iterations):>10.1f} "
+          f"{timed(lambda: json.loads(legacy), iterations):>10.1f} {len(legacy.encode('utf-8')):>8}")
+
+    for name in codecs:
+        for compression in compressors:
+            codec = Codec(name, compression, compress_min_bytes=0)
+            data = codec.encode(page)
+            assert codec.decode(data) == page
+            print(f"{codec.name:<16} {timed(lambda: codec.encode(page), iterations):>10.1f} "
+                  f"{timed(lambda: codec.decode(data), iterations):>10.1f} {len(data):>8}")
+
+if __name__ == "__main__":
+    main()
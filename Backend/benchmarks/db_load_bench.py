@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+"""
+Load benchmark for database reads: sync handlers on the blocking engine
+versus async handlers on the async engine, at high concurrency.
+
+Both handlers run in-process against a temporary SQLite database, on the
+timed pools from database.py with the same size. Each query calls a SQL function that sleeps for a fixed time, standing
+in for the network and server time of a MySQL query. Sync handlers hold a
+threadpool worker (40 threads) for the whole query, so at most 40 queries
+wait at once however large the pool is; async handlers are limited only by
+the pool. The in-process client and app cost a few milliseconds of CPU per
+request, so the default latency is high enough for waiting on the database,
+not that overhead, to set the sync throughput.
+
+With --url, the same load is sent to a running API instead, e.g. GET /users/
+with the cache disabled.
+
+Requires httpx and aiosqlite.
+
+Usage:
+    python benchmarks/db_load_bench.py [--requests 5000] [--concurrency 500] [--pool-size 200] [--latency-ms 200]
+    python benchmarks/db_load_bench.py --url http://localhost:8000/users/1
+"""
+
+import os
+import sys
+import time
+import asyncio
+import logging
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import create_engine, event, func, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+import database
+from database import Base
+from models.user import User
+from models.user_details import UserDetail
+from api_load_bench import run
+
+USERS = 1000
+
+def add_sleep_function(engine, latency):
+    """Register bench_sleep(), which blocks its connection for `latency` seconds."""
+
+    def bench_sleep(value):
+        time.sleep(latency)
+        return value
+
+    @event.listens_for(engine, "connect")
+    def connect(dbapi_connection, connection_record):
+        dbapi_connection.create_function("bench_sleep", 1, bench_sleep)
+
+def make_app(sync_engine, async_engine):
+    SyncSession = sessionmaker(bind=sync_engine)
+    AsyncSession = async_sessionmaker(async_engine, expire_on_commit=False)
+
+    def get_sync_db():
+        db = SyncSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def get_async_db():
+        async with AsyncSession() as db:
+            yield db
+
+    def user_query(user_id):
+        return select(User).filter(User.id == func.bench_sleep(user_id))
+
+    app = FastAPI()
+
+    @app.get("/sync/users/{user_id}")
+    def read_user_sync(user_id: int, db=Depends(get_sync_db)):
+        user = db.scalar(user_query(user_id))
+        return {"id": user.id, "email": user.email}
+
+    @app.get("/async/users/{user_id}")
+    async def read_user_async(user_id: int, db=Depends(get_async_db)):
+        user = await db.scalar(user_query(user_id))
+        return {"id": user.id, "email": user.email}
+
+    return app
+
+async def main():
+    parser = argparse.ArgumentParser(description="Compare sync and async database reads under load")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--pool-size", type=int, default=200, help="Connections in each engine's pool")
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="Simulated database time per query")
+    parser.add_argument("--url", help="Load test a running API at this URL instead")
+    args = parser.parse_args()
+
+    if args.url:
+        limits = httpx.Limits(max_connections=args.concurrency)
+        async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+            await run("remote", client, args.url, args.requests, args.concurrency)
+        return
+
+    # Per-request logging would dominate the measurement
+    logging.disable(logging.INFO)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Both engines get the same pool, sized for the test instead of from the environment
+        url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        options = {"pool_size": args.pool_size, "max_overflow": 0, "pool_timeout": 60,
+                   "connect_args": {"check_same_thread": False}}
+        sync_engine = create_engine(url, poolclass=database.TimedQueuePool, **options)
+        async_engine = create_async_engine(database.async_url(url), poolclass=database.TimedAsyncQueuePool, **options)
+        latency = args.latency_ms / 1000
+        add_sleep_function(sync_engine, latency)
+        add_sleep_function(async_engine.sync_engine, latency)
+
+        Base.metadata.create_all(sync_engine)
+        with sync_engine.begin() as conn:
+            conn.execute(User.__table__.insert(), [
+                {"id": i, "email": f"user{i}@example.com", "password": "x"} for i in range(1, USERS + 1)
+            ])
+
+        transport = httpx.ASGITransport(app=make_app(sync_engine, async_engine))
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            for label, engine in (("sync", sync_engine), ("async", async_engine.sync_engine)):
+                await run(label, client, f"/{label}/users/1", args.requests, args.concurrency)
+                stats = engine.pool.stats.snapshot()
+                print(f"{'':<8} pool wait avg {stats['wait_avg_ms']:.1f} ms, max {stats['wait_max_ms']:.1f} ms")
+
+        await async_engine.dispose()
+        sync_engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
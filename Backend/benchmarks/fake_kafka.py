@@ -0,0 +1,117 @@
+"""
+In-process stand-in for a Kafka broker used by the benchmarks.
+
+Latencies are simulated with time.sleep so that results reflect the cost of
+connection setup and broker round-trips without needing a running cluster.
+"""
+
+import itertools
+import threading
+import time
+from collections import namedtuple, defaultdict
+from concurrent.futures import Future
+
+RecordMetadata = namedtuple("RecordMetadata", ["topic", "partition", "offset"])
+ConsumerRecord = namedtuple("ConsumerRecord", ["topic", "partition", "offset", "key", "value"])
+TopicPartition = namedtuple("TopicPartition", ["topic", "partition"])
+
+# Simulated network costs (seconds)
+BOOTSTRAP_LATENCY = 0.02
+ACK_LATENCY = 0.001
+PARTITIONS = 6
+
+class FakeBroker:
+    """Keeps per-partition logs and hands out offsets."""
+
+    def __init__(self, partitions=PARTITIONS):
+        self.partitions = partitions
+        self.logs = defaultdict(list)
+        self.lock = threading.Lock()
+
+    def append(self, topic, key, value):
+        partition = hash(key) % self.partitions if key is not None else 0
+        with self.lock:
+            log = self.logs[(topic, partition)]
+            log.append((key, value))
+            return RecordMetadata(topic, partition, len(log) - 1)
+
+broker = FakeBroker()
+
+class _FakeFuture(Future):
+    def add_callback(self, fn, *args, **kwargs):
+        self.add_done_callback(lambda f: f.exception() is None and fn(*args, f.result(), **kwargs))
+        return self
+
+    def add_errback(self, fn, *args, **kwargs):
+        self.add_done_callback(lambda f: f.exception() is not None and fn(*args, f.exception(), **kwargs))
+        return self
+
+    def get(self, timeout=None):
+        return self.result(timeout)
+
+class FakeProducer:
+    """Mimics the parts of KafkaProducer the backend uses."""
+
+    def __init__(self, *args, **kwargs):
+        # Bootstrap + metadata round-trip
+        time.sleep(BOOTSTRAP_LATENCY)
+        self.linger_ms = kwargs.get("linger_ms", 0)
+        self._pending = []
+
+    def send(self, topic, value=None, key=None, headers=None):
+        future = _FakeFuture()
+        self._pending.append((future, topic, key, value))
+        if not self.linger_ms:
+            self.flush()
+        return future
+
+    def flush(self, timeout=None):
+        if not self._pending:
+            return
+        # One round-trip acknowledges everything batched so far
+        time.sleep(ACK_LATENCY)
+        pending, self._pending = self._pending, []
+        for future, topic, key, value in pending:
+            future.set_result(broker.append(topic, key, value))
+
+    def bootstrap_connected(self):
+        return True
+
+    def close(self, timeout=None):
+        self.flush()
+
+class FakeConsumer:
+    """Serves pre-generated records through poll() like KafkaConsumer."""
+
+    def __init__(self, records):
+        self._records = list(records)
+        self.committed = {}
+
+    def poll(self, timeout_ms=0, max_records=500):
+        batch, self._records = self._records[:max_records], self._records[max_records:]
+        grouped = defaultdict(list)
+        for record in batch:
+            grouped[TopicPartition(record.topic, record.partition)].append(record)
+        return dict(grouped)
+
+    def commit(self, offsets=None):
+        if offsets:
+            self.committed.update(offsets)
+
+    def close(self):
+        pass
+
+    @property
+    def exhausted(self):
+        return not self._records
+
+def make_records(topic, count, keys):
+    """Generate count records spread across keys, partitioned by key."""
+    offsets = defaultdict(itertools.count)
+    records = []
+    for i in range(count):
+        key = str(i % keys)
+        partition = hash(key) % PARTITIONS
+        value = {"event_type": "user_created", "user_id": int(key), "email": f"user{key}@example.com"}
+        records.append(ConsumerRecord(topic, partition, next(offsets[partition]), key.encode("utf-8"), value))
+    return records
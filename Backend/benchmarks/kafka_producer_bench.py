@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+"""
+Benchmark kafka_utils.send_message with a producer per message versus the
+shared process-wide producer.
+
+Usage:
+    python benchmarks/kafka_producer_bench.py [messages]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import kafka_utils
+from benchmarks.fake_kafka import FakeProducer
+
+def send_with_new_producer(topic, message, key=None):
+    """The old send_message: connect, send, wait, flush, close."""
+    producer = FakeProducer()
+    future = producer.send(topic, value=message, key=key.encode("utf-8") if key else None)
+    future.get(timeout=10)
+    producer.flush()
+    producer.close()
+    return True
+
+def run(label, send, messages):
+    start = time.perf_counter()
+    for i in range(messages):
+        send("user_events", {"event_type": "user_created", "user_id": i}, str(i))
+    elapsed = time.perf_counter() - start
+    print(f"{label:<22} {messages} messages in {elapsed:.2f}s  ({messages / elapsed:,.0f} msg/s)")
+
+def main():
+    messages = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    # Route the shared producer to the fake broker
+    kafka_utils.producer_manager = kafka_utils.ProducerManager(factory=FakeProducer)
+
+    run("producer per message", send_with_new_producer, messages)
+    run("shared producer", kafka_utils.send_message, messages)
+
+    kafka_utils.close_producer()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+"""
+Cache warm-up.
+
+Preloads the cache after a deploy or a Redis flush so the first requests do
+not all go to the database. Targets are warmed in priority order:
+
+    lists   first cursor pages of the users and user details lists
+    hot     the most read users:{id} keys, sampled by get_or_compute
+    recent  the most recently created users
+
+Keys that are already cached are skipped, database queries are rate limited,
+and only one replica warms at a time.
+
+The warm-up runs in a background thread of the API at startup when
+CACHE_WARMUP_ENABLED=true, or standalone:
+    python cache_warmup.py
+"""
+
+import os
+import sys
+import time
+import logging
+import threading
+from typing import Dict, List
+
+from sqlalchemy.orm import Session, joinedload
+
+from database import SessionLocal
+from models.user import User
+from utils import cache
+from utils.pagination import page_key
+from routes.user_routes import user_response, users_page
+from routes.user_details_routes import details_page
+
+logger = logging.getLogger(__name__)
+
+# Warm-up settings
+WARMUP_ENABLED = os.getenv("CACHE_WARMUP_ENABLED", "false").lower() == "true"
+WARMUP_TARGETS = os.getenv("CACHE_WARMUP_TARGETS", "lists,hot,recent")  # priority order
+WARMUP_LIST_PAGES = int(os.getenv("CACHE_WARMUP_LIST_PAGES", 1))
+WARMUP_PAGE_SIZE = int(os.getenv("CACHE_WARMUP_PAGE_SIZE", 100))
+WARMUP_HOT_KEYS = int(os.getenv("CACHE_WARMUP_HOT_KEYS", 1000))
+WARMUP_RECENT_USERS = int(os.getenv("CACHE_WARMUP_RECENT_USERS", 1000))
+WARMUP_BATCH_SIZE = int(os.getenv("CACHE_WARMUP_BATCH_SIZE", 100))
+WARMUP_QUERIES_PER_SECOND = float(os.getenv("CACHE_WARMUP_QUERIES_PER_SECOND", 5.0))
+
+# Sampled read counts kept between warm-ups
+HOTKEYS_MAX = 10000
+LOCK_KEY = "cache-warmup"
+LOCK_TIMEOUT = 300
+
+class RateLimiter:
+    """Spaces calls to wait() at least 1/rate seconds apart."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0
+        self._next = time.monotonic()
+
+    def wait(self) -> None:
+        delay = self._next - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self._next = max(self._next, time.monotonic()) + self.interval
+
+class CacheWarmer:
+    """Fills cache keys for each warm-up target without overloading the database."""
+
+    def __init__(self, targets: str = WARMUP_TARGETS, queries_per_second: float = WARMUP_QUERIES_PER_SECOND):
+        self.targets = [target.strip() for target in targets.split(",") if target.strip()]
+        for target in self.targets:
+            if target not in ("lists", "hot", "recent"):
+                raise ValueError(f"Unknown warm-up target '{target}', expected lists, hot or recent")
+        self.limiter = RateLimiter(queries_per_second)
+
+    def run(self) -> Dict[str, int]:
+        """
+        Warm every target in priority order.
+
+        Returns:
+            dict: Number of keys loaded from the database per target
+        """
+        token = cache._acquire_redis_lock(LOCK_KEY, LOCK_TIMEOUT)
+        if token is None:
+            logger.info("Cache warm-up skipped, another replica is warming or Redis is unavailable")
+            return {}
+
+        db = SessionLocal()
+        loaded = {}
+        try:
+            for target in self.targets:
+                started = time.monotonic()
+                loaded[target] = getattr(self, f"warm_{target}")(db)
+                logger.info(f"Cache warm-up loaded {loaded[target]} keys for '{target}' in {time.monotonic() - started:.1f}s")
+        finally:
+            db.close()
+            cache._release_redis_lock(LOCK_KEY, token)
+        return loaded
+
+    def warm_lists(self, db: Session) -> int:
+        loaded = 0
+        for namespace, load_page in (("users:all", users_page), ("user-details:all", details_page)):
+            # Follow the cursors, so the keys match the pages clients walk through
+            after_id = 0
+            for _ in range(WARMUP_LIST_PAGES):
+                key = cache.namespace_key(namespace, page_key(0, WARMUP_PAGE_SIZE, after_id))
+
+                def compute(load_page=load_page, after_id=after_id):
+                    nonlocal loaded
+                    self.limiter.wait()
+                    loaded += 1
+                    return load_page(db, 0, WARMUP_PAGE_SIZE, after_id)
+
+                rows = cache.get_or_compute(key, compute, 300, beta=0)
+                if len(rows) < WARMUP_PAGE_SIZE:
+                    break
+                after_id = rows[-1]["id"]
+        return loaded
+
+    def warm_hot(self, db: Session) -> int:
+        cache.redis_client.zremrangebyrank(cache.HOTKEYS_KEY, 0, -(HOTKEYS_MAX + 1))
+        user_ids = []
+        for key in cache.hot_keys("users:", WARMUP_HOT_KEYS):
+            suffix = key[len("users:"):]
+            if suffix.isdigit():
+                user_ids.append(int(suffix))
+        return self.warm_users(db, user_ids)
+
+    def warm_recent(self, db: Session) -> int:
+        if WARMUP_RECENT_USERS <= 0:
+            return 0
+        self.limiter.wait()
+        user_ids = [row[0] for row in db.query(User.id).order_by(User.id.desc()).limit(WARMUP_RECENT_USERS).all()]
+        return self.warm_users(db, user_ids)
+
+    def warm_users(self, db: Session, user_ids: List[int]) -> int:
+        """Cache users:{id} for the given users, one IN query per batch of uncached IDs."""
+        loaded = 0
+
+        def load_users(missing_keys):
+            nonlocal loaded
+            self.limiter.wait()
+            missing_ids = [int(key[len("users:"):]) for key in missing_keys]
+            users = db.query(User).options(joinedload(User.details)).filter(User.id.in_(missing_ids)).all()
+            loaded += len(users)
+            return {f"users:{user.id}": user_response(user) for user in users}
+
+        for start in range(0, len(user_ids), WARMUP_BATCH_SIZE):
+            keys = [f"users:{user_id}" for user_id in user_ids[start:start + WARMUP_BATCH_SIZE]]
+            cache.get_many_or_compute(keys, load_users, 300)
+        return loaded
+
+def start_warmup() -> None:
+    """Warm the cache in a background thread if CACHE_WARMUP_ENABLED is set."""
+    if not WARMUP_ENABLED:
+        return
+
+    def run():
+        try:
+            CacheWarmer().run()
+        except Exception as e:
+            logger.error(f"Cache warm-up failed: {e}")
+
+    threading.Thread(target=run, name="cache-warmup", daemon=True).start()
+
+def main():
+    """Run the warm-up in the foreground."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    loaded = CacheWarmer().run()
+    logger.info(f"Cache warm-up finished: {loaded}")
+
+if __name__ == "__main__":
+    main()
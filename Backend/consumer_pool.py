@@ -0,0 +1,133 @@
+"""
+Partition-aware worker pool for Kafka consumers.
+
+Records are routed to one of N single-worker lanes by message key, so records
+with the same key (user_id for user_events) are processed in order while
+different keys run in parallel. Lanes are threads or processes. Process lanes
+are started with spawn, so they share no locks with the consumer's threads,
+and the handler must be a picklable, module-level function. Offsets are
+committed in batches, and only once every earlier record in the partition has
+finished. If the handler raises, its record is not committed and the pool
+stops, so the record is consumed again after a restart.
+"""
+
+import os
+import zlib
+import logging
+import pickle
+import threading
+import multiprocessing
+import multiprocessing.util
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from kafka import KafkaConsumer
+
+import kafka_utils
+
+logger = logging.getLogger(__name__)
+
+# Pool settings
+CONSUMER_CONCURRENCY = int(os.getenv("CONSUMER_CONCURRENCY", 8))
+CONSUMER_WORKER_TYPE = os.getenv("CONSUMER_WORKER_TYPE", "thread")  # thread or process
+CONSUMER_MAX_IN_FLIGHT = int(os.getenv("CONSUMER_MAX_IN_FLIGHT", 1000))
+POLL_TIMEOUT_MS = int(os.getenv("CONSUMER_POLL_TIMEOUT_MS", 1000))
+POLL_MAX_RECORDS = int(os.getenv("CONSUMER_POLL_MAX_RECORDS", 500))
+LANE_CLOSE_TIMEOUT = float(os.getenv("CONSUMER_LANE_CLOSE_TIMEOUT", 10.0))
+
+def _start_lane_process() -> None:
+    """Runs in each process lane: deliver the events it published before the process exits."""
+    multiprocessing.util.Finalize(None, kafka_utils.close_producer, args=(LANE_CLOSE_TIMEOUT,), exitpriority=10)
+
+class KeyedWorkerPool:
+    """Runs a handler over consumed records, in parallel across keys and in order within a key."""
+
+    def __init__(self, handler: Callable[[Dict[str, Any]], Any], concurrency: int = CONSUMER_CONCURRENCY,
+                 worker_type: str = CONSUMER_WORKER_TYPE, max_in_flight: int = CONSUMER_MAX_IN_FLIGHT):
+        if worker_type not in ("thread", "process"):
+            raise ValueError(f"Unknown worker type '{worker_type}', expected 'thread' or 'process'")
+        self.handler = handler
+        self.concurrency = concurrency
+        self.worker_type = worker_type
+        # One single-worker executor per lane keeps each lane FIFO
+        if worker_type == "thread":
+            self._lanes = [ThreadPoolExecutor(max_workers=1) for _ in range(concurrency)]
+        else:
+            try:
+                pickle.dumps(handler)
+            except Exception as e:
+                raise ValueError(f"Process workers need a picklable, module-level handler: {e}")
+            # Forking would copy locks held by the consumer's Kafka, retry and publisher threads
+            context = multiprocessing.get_context("spawn")
+            self._lanes = [ProcessPoolExecutor(max_workers=1, mp_context=context, initializer=_start_lane_process)
+                           for _ in range(concurrency)]
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._outstanding = set()
+        self._outstanding_changed = threading.Condition()
+        self._stopping = threading.Event()
+        self._error = None
+
+    def lane_for(self, key: Optional[bytes], partition: int) -> int:
+        """Pick the lane for a record. Records without a key stay ordered per partition."""
+        if key is None:
+            key = str(partition).encode("utf-8")
+        return zlib.crc32(key) % self.concurrency
+
+    def submit(self, tracker: kafka_utils.OffsetTracker, tp, record) -> None:
+        """Queue one record on its lane, blocking while max_in_flight records are outstanding."""
+        self._slots.acquire()
+        tracker.add(tp, record.offset)
+        future = self._lanes[self.lane_for(record.key, record.partition)].submit(self.handler, record.value)
+        with self._outstanding_changed:
+            self._outstanding.add(future)
+        future.add_done_callback(lambda f: self._complete(f, tracker, tp, record.offset))
+
+    def _complete(self, future, tracker, tp, offset) -> None:
+        try:
+            future.result()
+            tracker.done(tp, offset)
+        except Exception as e:
+            logger.error(f"Error processing record {tp.topic}-{tp.partition}@{offset}, stopping: {e}")
+            self._error = self._error or e
+            self.stop()
+        finally:
+            self._slots.release()
+            with self._outstanding_changed:
+                self._outstanding.discard(future)
+                self._outstanding_changed.notify_all()
+
+    def run(self, consumer: KafkaConsumer, tracker: Optional[kafka_utils.OffsetTracker] = None,
+            poll_timeout_ms: int = POLL_TIMEOUT_MS, max_records: int = POLL_MAX_RECORDS) -> None:
+        """
+        Poll the consumer and dispatch records until stop() is called.
+
+        The consumer should be created with the same tracker passed to
+        kafka_utils.get_consumer(offset_tracker=...), which disables auto-commit
+        and commits completed offsets when partitions are revoked.
+
+        Raises:
+            Exception: The first error raised by the handler, once in-flight work has finished
+        """
+        tracker = tracker or kafka_utils.OffsetTracker()
+        logger.info(f"Worker pool started with {self.concurrency} {self.worker_type} workers")
+        try:
+            while not self._stopping.is_set():
+                records = consumer.poll(timeout_ms=poll_timeout_ms, max_records=max_records)
+                for tp, batch in records.items():
+                    for record in batch:
+                        self.submit(tracker, tp, record)
+                tracker.maybe_commit(consumer)
+        finally:
+            # Let in-flight work finish so its offsets can be committed
+            with self._outstanding_changed:
+                self._outstanding_changed.wait_for(lambda: not self._outstanding)
+            tracker.commit(consumer)
+            for lane in self._lanes:
+                lane.shutdown(wait=True)
+            logger.info("Worker pool stopped")
+        if self._error is not None:
+            raise self._error
+
+    def stop(self) -> None:
+        """Ask run() to finish after the current poll."""
+        self._stopping.set()
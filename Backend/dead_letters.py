@@ -0,0 +1,145 @@
+"""
+Retry topics and dead-letter queue for failed events.
+
+A failed event is not retried inline, which would stall its partition.
+Instead it is re-published to the first retry topic (e.g. user_events.retry.5s)
+with failure metadata under the "_failure" key. A retry worker consumes each
+retry topic, waits until the event is due and runs the handler again. An event
+that fails every tier lands in the dead-letter topic (e.g. user_events.dlq),
+from where dlq_replay.py can re-inject it.
+
+If a failed event cannot be re-published, routing raises RoutingError and its
+offset is left uncommitted, so the event is consumed again instead of lost.
+"""
+
+import os
+import time
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import kafka_utils
+
+logger = logging.getLogger(__name__)
+
+# Retry tiers as comma-separated delays, e.g. "5s,1m". Each delay must stay
+# below the consumer's max.poll.interval (5 minutes by default).
+RETRY_TIERS = os.getenv("CONSUMER_RETRY_TIERS", "5s,1m")
+RETRY_ENABLED = os.getenv("CONSUMER_RETRY_ENABLED", "true").lower() == "true"
+RETRY_RESTART_DELAY = float(os.getenv("CONSUMER_RETRY_RESTART_DELAY", 5.0))
+
+FAILURE_KEY = "_failure"
+_UNITS = {"s": 1, "m": 60, "h": 3600}
+
+def parse_delay(label: str) -> float:
+    """Convert a delay label like "5s" or "1m" to seconds."""
+    return float(label[:-1]) * _UNITS[label[-1]]
+
+def retry_topics(topic: str, tiers: str = RETRY_TIERS) -> List[Tuple[str, float]]:
+    """Return (retry topic, delay in seconds) for each configured tier of a topic."""
+    labels = [label.strip() for label in tiers.split(",") if label.strip()]
+    return [(f"{topic}.retry.{label}", parse_delay(label)) for label in labels]
+
+def dlq_topic(topic: str) -> str:
+    """Return the dead-letter topic for a topic."""
+    return f"{topic}.dlq"
+
+class RoutingError(Exception):
+    """Raised when a failed event could not be sent to its retry topic or the DLQ."""
+
+class FailureRouter:
+    """Sends failed events to the next retry tier, or to the DLQ once the tiers are used up."""
+
+    def __init__(self, topic: str, tiers: str = RETRY_TIERS):
+        self.topic = topic
+        self.tiers = retry_topics(topic, tiers) if RETRY_ENABLED else []
+        self.dlq = dlq_topic(topic)
+
+    def route(self, event: Dict[str, Any], error: Exception, key: Optional[str] = None) -> str:
+        """
+        Publish a failed event with failure metadata to its next destination.
+
+        Returns:
+            str: Topic the event was sent to
+
+        Raises:
+            RoutingError: If the event could not be sent; do not commit its offset
+        """
+        failure = event.get(FAILURE_KEY) or {}
+        attempt = failure.get("attempt", 0) + 1
+        now = time.time()
+
+        if attempt <= len(self.tiers):
+            destination, delay = self.tiers[attempt - 1]
+        else:
+            destination, delay = self.dlq, 0
+
+        payload = {k: v for k, v in event.items() if k != FAILURE_KEY}
+        payload[FAILURE_KEY] = {
+            "original_topic": failure.get("original_topic", self.topic),
+            "key": key if key is not None else failure.get("key"),
+            "attempt": attempt,
+            "error": str(error)[:1000],
+            "error_type": type(error).__name__,
+            "first_failed_at": failure.get("first_failed_at", datetime.now().isoformat()),
+            "failed_at": datetime.now().isoformat(),
+            "retry_at": now + delay,
+        }
+
+        if not kafka_utils.send_message(destination, payload, key=payload[FAILURE_KEY]["key"]):
+            raise RoutingError(f"Could not route failed {event.get('event_type')} event to {destination}")
+        logger.warning(f"Routed failed {event.get('event_type')} event to {destination} (attempt {attempt}): {error}")
+        return destination
+
+class RetryWorker:
+    """Consumes one retry tier, waiting until each event is due before handling it again."""
+
+    def __init__(self, retry_topic: str, group_id: str, handler: Callable[[Dict[str, Any]], Any], router: FailureRouter):
+        self.retry_topic = retry_topic
+        self.group_id = group_id
+        self.handler = handler
+        self.router = router
+        self._thread = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self.run, name=f"retry-{self.retry_topic}", daemon=True)
+        self._thread.start()
+        logger.info(f"Retry worker listening on {self.retry_topic}")
+
+    def run(self) -> None:
+        # Reconnect after any error; events that were not routed are consumed again
+        while True:
+            try:
+                self.consume()
+            except Exception as e:
+                logger.error(f"Retry worker on {self.retry_topic} failed, restarting in {RETRY_RESTART_DELAY}s: {e}")
+                time.sleep(RETRY_RESTART_DELAY)
+
+    def consume(self) -> None:
+        """Handle events from the retry topic until an event cannot be routed or the consumer fails."""
+        events = kafka_utils.consume_messages(self.retry_topic, self.group_id, manual_commit=True)
+        try:
+            # Events in one tier share a delay, so waiting on the head of the topic is correct
+            for event in events:
+                failure = event.get(FAILURE_KEY) or {}
+                wait = failure.get("retry_at", 0) - time.time()
+                if wait > 0:
+                    time.sleep(wait)
+                try:
+                    self.handler({k: v for k, v in event.items() if k != FAILURE_KEY})
+                except Exception as e:
+                    self.router.route(event, e)
+        finally:
+            # Commits the events handled so far, but not the one being handled
+            events.close()
+
+def start_retry_workers(topic: str, group_id: str, handler: Callable[[Dict[str, Any]], Any],
+                        router: FailureRouter) -> List[RetryWorker]:
+    """Start one retry worker per tier of a topic."""
+    workers = []
+    for retry_topic, _ in router.tiers:
+        worker = RetryWorker(retry_topic, f"{group_id}.{retry_topic}", handler, router)
+        worker.start()
+        workers.append(worker)
+    return workers
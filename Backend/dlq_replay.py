@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+"""
+Replay events from a dead-letter topic.
+
+Events are re-published to the topic they originally failed on, without their
+failure metadata, at a controlled rate. Offsets are committed as events are
+replayed, so an interrupted replay resumes where it stopped.
+
+Usage:
+    python dlq_replay.py --topic user_events.dlq --rate 20 --limit 1000
+    python dlq_replay.py --dry-run
+"""
+
+import sys
+import time
+import argparse
+import logging
+
+import kafka_utils
+from dead_letters import FAILURE_KEY, dlq_topic
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler(sys.stdout)]
+)
+logger = logging.getLogger("dlq_replay")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Re-inject dead-lettered events into their original topic")
+    parser.add_argument("--topic", default=dlq_topic("user_events"), help="Dead-letter topic to read")
+    parser.add_argument("--group", default="dlq-replay", help="Consumer group used to track replay progress")
+    parser.add_argument("--rate", type=float, default=10.0, help="Maximum events replayed per second")
+    parser.add_argument("--limit", type=int, default=None, help="Stop after this many events")
+    parser.add_argument("--idle-timeout", type=float, default=10.0, help="Stop after this many seconds without events")
+    parser.add_argument("--dry-run", action="store_true", help="Log what would be replayed without sending or committing")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    interval = 1.0 / args.rate
+    tracker = kafka_utils.OffsetTracker(commit_every=100, commit_interval=1.0)
+    consumer = kafka_utils.get_consumer(args.topic, args.group, offset_tracker=tracker)
+    replayed = failed = 0
+    last_event = time.monotonic()
+    next_send = time.monotonic()
+
+    logger.info(f"Replaying {args.topic} at up to {args.rate} events/s{' (dry run)' if args.dry_run else ''}")
+    try:
+        while args.limit is None or replayed + failed < args.limit:
+            records = consumer.poll(timeout_ms=1000, max_records=100)
+            if not records:
+                if time.monotonic() - last_event > args.idle_timeout:
+                    break
+                continue
+            last_event = time.monotonic()
+
+            for tp, messages in records.items():
+                for message in messages:
+                    if args.limit is not None and replayed + failed >= args.limit:
+                        break
+                    event = message.value
+                    failure = event.get(FAILURE_KEY) or {}
+                    topic = failure.get("original_topic")
+                    if topic is None:
+                        logger.warning(f"Skipping {tp.topic}-{tp.partition}@{message.offset}: no failure metadata")
+                        tracker.add(tp, message.offset)
+                        tracker.done(tp, message.offset)
+                        continue
+                    payload = {k: v for k, v in event.items() if k != FAILURE_KEY}
+
+                    # Pace sends to the requested rate
+                    delay = next_send - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                    next_send = max(next_send, time.monotonic()) + interval
+
+                    if args.dry_run:
+                        logger.info(f"Would replay {payload.get('event_type')} to {topic} (failed {failure.get('attempt')} times: {failure.get('error')})")
+                        replayed += 1
+                        continue
+
+                    if kafka_utils.send_message(topic, payload, key=failure.get("key")):
+                        replayed += 1
+                        tracker.add(tp, message.offset)
+                        tracker.done(tp, message.offset)
+                    else:
+                        # Stop here so the event is replayed on the next run
+                        failed += 1
+                        raise RuntimeError(f"Failed to replay event at {tp.topic}-{tp.partition}@{message.offset}")
+                tracker.maybe_commit(consumer)
+    except KeyboardInterrupt:
+        logger.info("Replay interrupted")
+    except RuntimeError as e:
+        logger.error(str(e))
+    finally:
+        if not args.dry_run:
+            tracker.commit(consumer)
+        consumer.close(autocommit=False)
+        kafka_utils.close_producer(timeout=5)
+
+    logger.info(f"Replayed {replayed} events, {failed} failed")
+
+if __name__ == "__main__":
+    main()
@@ -3,28 +3,51 @@ Kafka utilities for the backend service.
 Contains helper functions for producing and consuming messages.
 """
 
+import itertools
 import json
 import os
 import logging
-from kafka import KafkaProducer, KafkaConsumer
-from typing import Dict, Any, Generator, Optional, List
+import queue
+import threading
+import time
+from collections import deque
+from kafka import KafkaProducer, KafkaConsumer, TopicPartition, ConsumerRebalanceListener
+from kafka.structs import OffsetAndMetadata
+from kafka.errors import CommitFailedError, KafkaConnectionError, KafkaTimeoutError, NoBrokersAvailable
+from typing import Dict, Any, Callable, Generator, Optional, List, Tuple
 
 logger = logging.getLogger(__name__)
 
+KAFKA_BROKER = os.environ.get('KAFKA_BROKER', 'kub-kafka:9092')
+
+# How long a send may wait for the broker to acknowledge
+SEND_TIMEOUT = float(os.environ.get('KAFKA_SEND_TIMEOUT', 10))
+
+# Producer batching: wait up to LINGER_MS to fill batches of up to BATCH_SIZE bytes per partition
+LINGER_MS = int(os.environ.get('KAFKA_LINGER_MS', 5))
+BATCH_SIZE = int(os.environ.get('KAFKA_BATCH_SIZE', 16384))
+
+# How long a discarded producer may keep delivering sends that are already in flight
+RESET_CLOSE_TIMEOUT = float(os.environ.get('KAFKA_RESET_CLOSE_TIMEOUT', 1.0))
+
 def get_kafka_producer() -> KafkaProducer:
     """
-    Create and return a Kafka producer instance.
+    Create and return a new Kafka producer instance.
+    
+    Most callers should use get_producer() instead, which reuses a single
+    producer for the whole process.
     
     Returns:
         KafkaProducer: Configured Kafka producer
     """
     try:
         producer = KafkaProducer(
-            bootstrap_servers=os.environ.get('KAFKA_BROKER', 'kub-kafka:9092'),
+            bootstrap_servers=KAFKA_BROKER,
             value_serializer=lambda v: json.dumps(v).encode('utf-8'),
             acks='all',  # Wait for all replicas to acknowledge
             retries=3,   # Retry sending a few times
-            linger_ms=5  # Small delay to batch messages
+            linger_ms=LINGER_MS,  # Small delay to batch messages
+            batch_size=BATCH_SIZE
         )
         logger.info("Kafka producer created successfully")
         return producer
@@ -32,9 +55,108 @@ def get_kafka_producer() -> KafkaProducer:
         logger.error(f"Failed to create Kafka producer: {e}")
         raise
 
+class ProducerManager:
+    """
+    Owns the process-wide Kafka producer.
+    
+    The producer is created lazily on first use and shared by every request
+    handled by this process. If a send fails because the producer lost its
+    connection, the producer is discarded and rebuilt on the next call. A
+    forked worker never inherits its parent's producer.
+    """
+    
+    def __init__(self, factory=get_kafka_producer):
+        self._factory = factory
+        self._producer = None
+        self._pid = None
+        self._lock = threading.Lock()
+    
+    def get(self) -> KafkaProducer:
+        """Return the shared producer, creating it if needed."""
+        producer = self._producer
+        if producer is not None and self._pid == os.getpid():
+            return producer
+        
+        with self._lock:
+            if self._producer is None or self._pid != os.getpid():
+                # A producer inherited across fork shares sockets with the parent, so drop it
+                self._producer = self._factory()
+                self._pid = os.getpid()
+            return self._producer
+    
+    def reset(self, producer: Optional[KafkaProducer] = None) -> None:
+        """
+        Discard the shared producer so the next get() reconnects.
+        
+        Args:
+            producer (Optional[KafkaProducer]): Only reset if this is still the current producer
+        """
+        with self._lock:
+            if self._producer is None or (producer is not None and producer is not self._producer):
+                return
+            stale, self._producer = self._producer, None
+        
+        logger.warning("Resetting Kafka producer")
+        try:
+            # Other requests may still have sends in flight on it
+            stale.close(timeout=RESET_CLOSE_TIMEOUT)
+        except Exception as e:
+            logger.debug(f"Error closing stale Kafka producer: {e}")
+    
+    def is_healthy(self) -> bool:
+        """Return True if the shared producer exists and is connected to a broker."""
+        producer = self._producer
+        if producer is None:
+            return False
+        try:
+            return producer.bootstrap_connected()
+        except Exception:
+            return False
+    
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Flush pending messages and close the shared producer."""
+        with self._lock:
+            producer, self._producer = self._producer, None
+        
+        # A producer inherited across fork has no sender thread here to flush it
+        if producer is None or self._pid != os.getpid():
+            return
+        try:
+            producer.flush(timeout=timeout)
+            producer.close(timeout=timeout)
+            logger.info("Kafka producer closed")
+        except Exception as e:
+            logger.error(f"Error closing Kafka producer: {e}")
+
+# Process-wide producer manager
+producer_manager = ProducerManager()
+
+def get_producer() -> KafkaProducer:
+    """
+    Return the shared Kafka producer for this process.
+    
+    Returns:
+        KafkaProducer: Long-lived Kafka producer
+    """
+    return producer_manager.get()
+
+def close_producer(timeout: Optional[float] = None) -> None:
+    """
+    Flush and close the shared Kafka producer. Called on application shutdown.
+    
+    Args:
+        timeout (Optional[float]): Seconds to wait for pending messages
+    """
+    global _async_publisher
+    if _async_publisher is not None and _async_publisher_pid == os.getpid():
+        # Hand any queued events to the producer before it is flushed
+        _async_publisher.close(timeout)
+    _async_publisher = None
+    producer_manager.close(timeout)
+
 def send_message(topic: str, message: Dict[str, Any], key: Optional[str] = None) -> bool:
     """
-    Send a message to a Kafka topic.
+    Send a message to a Kafka topic using the shared producer.
     
     Args:
         topic (str): Kafka topic to send message to
@@ -44,8 +166,9 @@ def send_message(topic: str, message: Dict[str, Any], key: Optional[str] = None)
     Returns:
         bool: True if message was sent successfully, False otherwise
     """
+    producer = None
     try:
-        producer = get_kafka_producer()
+        producer = get_producer()
         
         # Convert key to bytes if provided
         key_bytes = key.encode('utf-8') if key else None
@@ -54,64 +177,526 @@ def send_message(topic: str, message: Dict[str, Any], key: Optional[str] = None)
         future = producer.send(topic, value=message, key=key_bytes)
         
         # Block until message is sent (or timeout)
-        record_metadata = future.get(timeout=10)
+        record_metadata = future.get(timeout=SEND_TIMEOUT)
         
         logger.info(f"Message sent to topic {record_metadata.topic}, partition {record_metadata.partition}, offset {record_metadata.offset}")
         
-        # Close producer
-        producer.flush()
-        producer.close()
-        
         return True
     except Exception as e:
         logger.error(f"Error sending message to Kafka: {e}")
+        # Reconnect on the next send if the producer lost its brokers
+        if producer is not None and _is_connection_error(e):
+            producer_manager.reset(producer)
         return False
 
-def get_consumer(topic: str, group_id: str = 'default-group', auto_offset_reset: str = 'earliest') -> KafkaConsumer:
+def send_batch(topic: str, messages: List[Tuple[Optional[str], Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    Send many messages to a Kafka topic with one flush of the shared producer.
+    
+    Args:
+        topic (str): Kafka topic to send messages to
+        messages (List[Tuple[Optional[str], Dict[str, Any]]]): (key, payload) pairs
+    
+    Returns:
+        List[Dict[str, Any]]: One result per message, in order, with the partition
+        and offset on success or the error otherwise
+    """
+    producer = None
+    futures = []
+    try:
+        producer = get_producer()
+        for key, message in messages:
+            try:
+                futures.append(producer.send(topic, value=message, key=key.encode('utf-8') if key else None))
+            except Exception as e:
+                futures.append(e)
+        
+        # Push out every linger batch at once and wait for the acknowledgements
+        producer.flush(timeout=SEND_TIMEOUT)
+    except Exception as e:
+        logger.error(f"Error sending batch to Kafka: {e}")
+        if producer is not None and _is_connection_error(e):
+            producer_manager.reset(producer)
+        futures.extend([e] * (len(messages) - len(futures)))
+    
+    results = []
+    for future in futures:
+        if isinstance(future, Exception):
+            results.append({"status": "error", "error": str(future)})
+            continue
+        try:
+            record_metadata = future.get(timeout=0)
+            results.append({"status": "success", "partition": record_metadata.partition, "offset": record_metadata.offset})
+        except Exception as e:
+            results.append({"status": "error", "error": str(e)})
+    
+    sent = sum(1 for result in results if result["status"] == "success")
+    logger.info(f"Batch sent to topic {topic}: {sent}/{len(messages)} messages acknowledged")
+    return results
+
+def _is_connection_error(error: Exception) -> bool:
+    """Return True if a send error means the producer should be rebuilt."""
+    if isinstance(error, (NoBrokersAvailable, KafkaConnectionError)):
+        return True
+    # A timeout alone may just be a slow broker, and resetting would abort every other request's sends
+    return isinstance(error, KafkaTimeoutError) and not producer_manager.is_healthy()
+
+# Non-blocking publish settings
+ASYNC_PUBLISH = os.environ.get('KAFKA_ASYNC_PUBLISH', 'false').lower() == 'true'
+BACKLOG_SIZE = int(os.environ.get('KAFKA_BACKLOG_SIZE', 10000))
+BACKLOG_POLICY = os.environ.get('KAFKA_BACKLOG_POLICY', 'drop')  # drop, block or spill
+BACKLOG_BLOCK_TIMEOUT = float(os.environ.get('KAFKA_BACKLOG_BLOCK_TIMEOUT', 1.0))
+SPILL_PATH = os.environ.get('KAFKA_SPILL_PATH', 'kafka_spill.jsonl')
+
+class AsyncPublisher:
+    """
+    Fire-and-forget publisher backed by a bounded in-memory backlog.
+    
+    publish() enqueues the event and returns immediately. A background thread
+    hands queued events to the shared producer and reports the outcome through
+    the optional on_success/on_error callbacks and the counters in stats().
+    
+    When the backlog is full the policy decides what happens:
+    - drop: discard the event and call on_error
+    - block: wait up to block_timeout seconds for room, then drop
+    - spill: append the event to spill_path; spilled events are replayed
+      once the backlog drains (callbacks are not kept for spilled events)
+    """
+    
+    POLICIES = ('drop', 'block', 'spill')
+    
+    def __init__(self, max_backlog: int = BACKLOG_SIZE, policy: str = BACKLOG_POLICY,
+                 block_timeout: float = BACKLOG_BLOCK_TIMEOUT, spill_path: str = SPILL_PATH):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown backlog policy '{policy}', expected one of {self.POLICIES}")
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.spill_path = spill_path
+        self._queue = queue.Queue(maxsize=max_backlog)
+        self._spill_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {"enqueued": 0, "delivered": 0, "failed": 0, "dropped": 0, "spilled": 0, "replayed": 0}
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="kafka-async-publisher", daemon=True)
+        self._thread.start()
+    
+    def publish(self, topic: str, message: Dict[str, Any], key: Optional[str] = None,
+                on_success: Optional[Callable] = None, on_error: Optional[Callable] = None) -> bool:
+        """
+        Enqueue a message for delivery without waiting for the broker.
+        
+        Args:
+            topic (str): Kafka topic to send message to
+            message (Dict[str, Any]): Message payload
+            key (Optional[str]): Message key for partitioning
+            on_success (Optional[Callable]): Called with RecordMetadata once delivered
+            on_error (Optional[Callable]): Called with the exception if delivery fails or the event is dropped
+        
+        Returns:
+            bool: True if the event was queued or spilled, False if it was dropped
+        """
+        item = (topic, message, key, on_success, on_error)
+        try:
+            if self.policy == 'block':
+                self._queue.put(item, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(item)
+            self._count("enqueued")
+            return True
+        except queue.Full:
+            pass
+        
+        if self.policy == 'spill' and self._spill(topic, message, key):
+            return True
+        
+        self._count("dropped")
+        logger.warning(f"Kafka backlog full, dropped message for topic {topic}")
+        self._notify(on_error, BufferError("Kafka publish backlog is full"))
+        return False
+    
+    def stats(self) -> Dict[str, int]:
+        """Return delivery counters and the current backlog size."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["backlog"] = self._queue.qsize()
+        stats["backlog_limit"] = self._queue.maxsize
+        return stats
+    
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Stop accepting work and wait for the backlog to be handed to the producer."""
+        self._running = False
+        self._thread.join(timeout)
+    
+    def _run(self) -> None:
+        while self._running or not self._queue.empty():
+            # Keep the thread alive whatever goes wrong, or every later publish would sit in the backlog
+            try:
+                try:
+                    item = self._queue.get(timeout=0.5)
+                except queue.Empty:
+                    self._replay_spill()
+                    continue
+                self._deliver(*item)
+            except Exception as e:
+                logger.error(f"Kafka async publisher error: {e}")
+    
+    def _deliver(self, topic, message, key, on_success=None, on_error=None) -> None:
+        producer = None
+        try:
+            producer = get_producer()
+            future = producer.send(topic, value=message, key=key.encode('utf-8') if key else None)
+        except Exception as e:
+            if producer is not None and _is_connection_error(e):
+                producer_manager.reset(producer)
+            self._on_failure(topic, e, on_error)
+            return
+        
+        future.add_callback(self._on_delivered, on_success)
+        future.add_errback(lambda e: self._on_failure(topic, e, on_error))
+    
+    def _on_delivered(self, on_success, record_metadata) -> None:
+        self._count("delivered")
+        logger.debug(f"Message delivered to topic {record_metadata.topic}, partition {record_metadata.partition}, offset {record_metadata.offset}")
+        self._notify(on_success, record_metadata)
+    
+    def _on_failure(self, topic, error, on_error) -> None:
+        self._count("failed")
+        logger.error(f"Error delivering message to Kafka topic {topic}: {error}")
+        self._notify(on_error, error)
+    
+    def _notify(self, callback, arg) -> None:
+        if callback is None:
+            return
+        try:
+            callback(arg)
+        except Exception as e:
+            logger.error(f"Kafka delivery callback failed: {e}")
+    
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._stats_lock:
+            self._stats[name] += amount
+    
+    def _spill(self, topic, message, key) -> bool:
+        try:
+            with self._spill_lock, open(self.spill_path, 'a') as f:
+                f.write(json.dumps({"topic": topic, "key": key, "message": message}) + "\n")
+            self._count("spilled")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to spill Kafka message to {self.spill_path}: {e}")
+            return False
+    
+    def _replay_spill(self) -> None:
+        """Send spilled events once the backlog has drained."""
+        replay_path = f"{self.spill_path}.replay"
+        with self._spill_lock:
+            if not os.path.exists(replay_path):
+                if not os.path.exists(self.spill_path):
+                    return
+                os.replace(self.spill_path, replay_path)
+        
+        with open(replay_path) as f:
+            lines = f.readlines()
+        logger.info(f"Replaying {len(lines)} spilled Kafka messages")
+        entries = []
+        bad_lines = []
+        for line in lines:
+            try:
+                entry = json.loads(line)
+                entries.append((entry["topic"], entry["message"], entry.get("key")))
+            except (ValueError, TypeError, KeyError):
+                # e.g. a line cut short by a crash while spilling
+                bad_lines.append(line if line.endswith("\n") else line + "\n")
+        if bad_lines:
+            with open(f"{self.spill_path}.bad", 'a') as f:
+                f.writelines(bad_lines)
+            logger.warning(f"Moved {len(bad_lines)} unreadable spilled Kafka messages to {self.spill_path}.bad")
+        
+        for topic, message, key in entries:
+            # Spill again if delivery fails so the event is not lost
+            respill = lambda e, topic=topic, message=message, key=key: self._spill(topic, message, key)
+            self._deliver(topic, message, key, on_error=respill)
+        self._count("replayed", len(entries))
+        os.remove(replay_path)
+
+_async_publisher = None
+_async_publisher_pid = None
+_async_publisher_lock = threading.Lock()
+
+def get_async_publisher() -> AsyncPublisher:
+    """
+    Return the process-wide AsyncPublisher, starting it on first use.
+    
+    A forked worker gets its own publisher: the one inherited from the parent
+    has no sender thread in the child, so nothing would drain its backlog.
+    
+    Returns:
+        AsyncPublisher: Shared non-blocking publisher
+    """
+    global _async_publisher, _async_publisher_pid
+    publisher = _async_publisher
+    if publisher is not None and _async_publisher_pid == os.getpid():
+        return publisher
+    
+    with _async_publisher_lock:
+        if _async_publisher is None or _async_publisher_pid != os.getpid():
+            _async_publisher = AsyncPublisher()
+            _async_publisher_pid = os.getpid()
+        return _async_publisher
+
+def publish_async(topic: str, message: Dict[str, Any], key: Optional[str] = None,
+                  on_success: Optional[Callable] = None, on_error: Optional[Callable] = None) -> bool:
+    """
+    Queue a message for delivery and return without waiting for the broker.
+    
+    See AsyncPublisher.publish for the arguments.
+    
+    Returns:
+        bool: True if the event was accepted, False if it was dropped
+    """
+    return get_async_publisher().publish(topic, message, key, on_success, on_error)
+
+def publisher_stats() -> Optional[Dict[str, int]]:
+    """
+    Return the async publisher counters, or None if it was never started.
+    
+    Returns:
+        Optional[Dict[str, int]]: Delivery counters and backlog size
+    """
+    if _async_publisher is None or _async_publisher_pid != os.getpid():
+        return None
+    return _async_publisher.stats()
+
+# Manual commit batching: commit after this many completed records or seconds, whichever comes first
+COMMIT_EVERY = int(os.environ.get('KAFKA_COMMIT_EVERY', 100))
+COMMIT_INTERVAL = float(os.environ.get('KAFKA_COMMIT_INTERVAL', 5.0))
+
+class OffsetTracker:
+    """
+    Tracks fetched and completed offsets per partition for manual commits.
+    
+    Records may finish out of order when they are processed in parallel. An
+    offset is only committable once it and every earlier fetched offset in its
+    partition are done, so a crash never skips unprocessed records
+    (at-least-once). Commits are batched: maybe_commit() only talks to the
+    broker after commit_every completed records or commit_interval seconds.
+    """
+    
+    def __init__(self, commit_every: int = COMMIT_EVERY, commit_interval: float = COMMIT_INTERVAL):
+        self.commit_every = commit_every
+        self.commit_interval = commit_interval
+        self._lock = threading.Lock()
+        self._pending = {}  # partition -> deque of fetched offsets, oldest first
+        self._done = {}     # partition -> set of completed offsets
+        self._committable = {}  # partition -> next offset to commit
+        self._completed_since_commit = 0
+        self._last_commit = time.monotonic()
+    
+    def add(self, tp: TopicPartition, offset: int) -> None:
+        """Record that an offset was fetched and handed to a worker."""
+        with self._lock:
+            self._pending.setdefault(tp, deque()).append(offset)
+    
+    def done(self, tp: TopicPartition, offset: int) -> None:
+        """Record that an offset finished processing. Safe to call from worker threads."""
+        with self._lock:
+            pending = self._pending.get(tp)
+            if pending is None:
+                # Partition was revoked while the record was in flight
+                return
+            done = self._done.setdefault(tp, set())
+            done.add(offset)
+            self._completed_since_commit += 1
+            while pending and pending[0] in done:
+                done.discard(pending[0])
+                self._committable[tp] = pending.popleft() + 1
+    
+    def in_flight(self) -> int:
+        """Number of fetched offsets that have not completed."""
+        with self._lock:
+            return sum(len(pending) for pending in self._pending.values())
+    
+    def take_committable(self, partitions=None) -> Dict[TopicPartition, OffsetAndMetadata]:
+        """
+        Return the offsets that advanced since the last call, ready for consumer.commit().
+        
+        Args:
+            partitions: Only take offsets for these partitions (default: all)
+        """
+        with self._lock:
+            if partitions is None:
+                offsets, self._committable = self._committable, {}
+            else:
+                offsets = {tp: self._committable.pop(tp) for tp in partitions if tp in self._committable}
+            self._completed_since_commit = 0
+            self._last_commit = time.monotonic()
+        return {tp: OffsetAndMetadata(offset, None) for tp, offset in offsets.items()}
+    
+    def commit(self, consumer: KafkaConsumer, partitions=None) -> int:
+        """
+        Synchronously commit completed offsets. Must be called from the consumer's thread.
+        
+        Returns:
+            int: Number of partitions committed
+        """
+        offsets = self.take_committable(partitions)
+        if not offsets:
+            return 0
+        try:
+            consumer.commit(offsets=offsets)
+        except CommitFailedError as e:
+            # The group rebalanced; the new owner re-processes from the last committed offset
+            logger.warning(f"Offset commit failed, records may be redelivered: {e}")
+            return 0
+        logger.debug(f"Committed offsets: { {f'{tp.topic}-{tp.partition}': o.offset for tp, o in offsets.items()} }")
+        return len(offsets)
+    
+    def maybe_commit(self, consumer: KafkaConsumer) -> int:
+        """Commit if enough records completed or enough time passed since the last commit."""
+        with self._lock:
+            due = (self._completed_since_commit >= self.commit_every or
+                   (self._committable and time.monotonic() - self._last_commit >= self.commit_interval))
+        return self.commit(consumer) if due else 0
+    
+    def revoke(self, partitions) -> None:
+        """Forget partitions that were taken away from this consumer."""
+        with self._lock:
+            for tp in partitions:
+                self._pending.pop(tp, None)
+                self._done.pop(tp, None)
+                self._committable.pop(tp, None)
+
+class CommitOnRebalance(ConsumerRebalanceListener):
+    """Commits completed offsets for partitions before they are reassigned."""
+    
+    def __init__(self, consumer: KafkaConsumer, tracker: OffsetTracker):
+        self.consumer = consumer
+        self.tracker = tracker
+    
+    def on_partitions_revoked(self, revoked):
+        # Runs inside poll() on the consumer's thread, so committing here is safe
+        committed = self.tracker.commit(self.consumer, revoked)
+        self.tracker.revoke(revoked)
+        logger.info(f"Partitions revoked: {len(revoked)}, committed offsets for {committed}")
+    
+    def on_partitions_assigned(self, assigned):
+        logger.info(f"Partitions assigned: {sorted(f'{tp.topic}-{tp.partition}' for tp in assigned)}")
+
+def get_consumer(topic: str, group_id: Optional[str] = 'default-group', auto_offset_reset: str = 'earliest',
+                 offset_tracker: Optional[OffsetTracker] = None) -> KafkaConsumer:
     """
     Create and return a Kafka consumer instance.
     
     Args:
         topic (str): Kafka topic to consume from
-        group_id (str): Consumer group ID
+        group_id (Optional[str]): Consumer group ID, or None to read all partitions without committing
         auto_offset_reset (str): Where to start reading messages ('earliest' or 'latest')
+        offset_tracker (Optional[OffsetTracker]): Commit offsets manually through this tracker
+            instead of auto-committing on a timer. Completed offsets are also committed
+            when partitions are revoked.
     
     Returns:
         KafkaConsumer: Configured Kafka consumer
     """
     try:
         consumer = KafkaConsumer(
-            topic,
-            bootstrap_servers=os.environ.get('KAFKA_BROKER', 'kub-kafka:9092'),
+            bootstrap_servers=KAFKA_BROKER,
             auto_offset_reset=auto_offset_reset,
-            enable_auto_commit=True,
+            enable_auto_commit=offset_tracker is None and group_id is not None,
             group_id=group_id,
             value_deserializer=lambda x: json.loads(x.decode('utf-8'))
         )
+        listener = CommitOnRebalance(consumer, offset_tracker) if offset_tracker is not None else None
+        consumer.subscribe([topic], listener=listener)
         logger.info(f"Created Kafka consumer for topic {topic}, group {group_id}")
         return consumer
     except Exception as e:
         logger.error(f"Failed to create Kafka consumer: {e}")
         raise
 
-def consume_messages(topic: str, group_id: str = 'default-group') -> Generator[Dict[str, Any], None, None]:
+def consume_messages(topic: str, group_id: str = 'default-group', manual_commit: bool = False) -> Generator[Dict[str, Any], None, None]:
     """
     Generator function to consume messages from a Kafka topic.
     
     Args:
         topic (str): Kafka topic to consume from
         group_id (str): Consumer group ID
+        manual_commit (bool): Only commit a message once the caller asks for the next one
     
     Yields:
         Dict[str, Any]: Message payload
     """
-    consumer = get_consumer(topic, group_id)
+    tracker = OffsetTracker() if manual_commit else None
+    consumer = get_consumer(topic, group_id, offset_tracker=tracker)
     try:
         for message in consumer:
-            logger.info(f"Received message from topic {message.topic}, partition {message.partition}, offset {message.offset}")
+            _log_record(message)
+            if tracker is None:
+                yield message.value
+                continue
+            
+            tp = TopicPartition(message.topic, message.partition)
+            tracker.add(tp, message.offset)
             yield message.value
+            tracker.done(tp, message.offset)
+            tracker.maybe_commit(consumer)
     finally:
-        consumer.close()
+        if tracker is not None:
+            tracker.commit(consumer)
+        consumer.close(autocommit=tracker is None)
+
+def consume_batches(topic: str, group_id: str = 'default-group', max_records: int = 500,
+                    timeout_ms: int = 1000) -> Generator[List[Dict[str, Any]], None, None]:
+    """
+    Generator function to consume messages from a Kafka topic in batches.
+    
+    Each poll returns up to max_records messages, in offset order per partition.
+    Offsets of a batch are committed (in batches, see OffsetTracker) once the
+    caller asks for the next one, so a crash mid-batch re-delivers it.
+    
+    Args:
+        topic (str): Kafka topic to consume from
+        group_id (str): Consumer group ID
+        max_records (int): Largest batch to return
+        timeout_ms (int): How long to wait for messages before yielding a smaller batch
+    
+    Yields:
+        List[Dict[str, Any]]: Message payloads (never empty)
+    """
+    tracker = OffsetTracker()
+    consumer = get_consumer(topic, group_id, offset_tracker=tracker)
+    try:
+        while True:
+            records = consumer.poll(timeout_ms=timeout_ms, max_records=max_records)
+            if not records:
+                tracker.maybe_commit(consumer)
+                continue
+            
+            batch = []
+            for tp, messages in records.items():
+                for message in messages:
+                    _log_record(message)
+                    tracker.add(tp, message.offset)
+                    batch.append(message.value)
+            
+            yield batch
+            
+            for tp, messages in records.items():
+                for message in messages:
+                    tracker.done(tp, message.offset)
+            tracker.maybe_commit(consumer)
+    finally:
+        tracker.commit(consumer)
+        consumer.close(autocommit=False)
+
+# Log one in every LOG_SAMPLE_EVERY consumed records at DEBUG level
+LOG_SAMPLE_EVERY = int(os.environ.get('KAFKA_LOG_SAMPLE_EVERY', 100))
+_records_seen = itertools.count()
+
+def _log_record(message) -> None:
+    """Sampled per-record debug logging, cheap when DEBUG is off."""
+    if next(_records_seen) % LOG_SAMPLE_EVERY == 0 and logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"Received message from topic {message.topic}, partition {message.partition}, offset {message.offset}")
 
 def list_topics() -> List[str]:
     """
@@ -122,7 +707,7 @@ def list_topics() -> List[str]:
     """
     try:
         consumer = KafkaConsumer(
-            bootstrap_servers=os.environ.get('KAFKA_BROKER', 'kub-kafka:9092')
+            bootstrap_servers=KAFKA_BROKER
         )
         topics = consumer.topics()
         consumer.close()
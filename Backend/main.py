@@ -4,15 +4,16 @@ Main FastAPI application.
 from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 import logging
-import re
 
 # Import DB models
 from models.user import User
 from models.user_details import UserDetail
-from database import engine, Base
+from models.outbox import OutboxEvent
+from database import engine, Base, pool_status
 
 # Import Redis client for health check
-from utils.cache import redis_client
+from utils.cache import redis_client, cache_stats
+from utils import request_context
 
 # Set up logging
 logging.basicConfig(
@@ -27,26 +28,23 @@ logger = logging.getLogger(__name__)
 
 # Create custom middleware to add source information headers
 class DataSourceMiddleware:
+    """
+    Adds headers describing how a request was served.
+    
+    X-Data-Source is database, redis_cache or local_cache, X-Cache is HIT,
+    MISS or PARTIAL, X-DB-Queries counts queries, and Server-Timing breaks
+    down database, Redis and total time. The values are collected per
+    request by utils.request_context, which also checks them against the
+    query budget of the endpoint.
+    """
     async def __call__(self, request: Request, call_next):
-        # Process the request and get the response
-        response = await call_next(request)
-        
-        # Try to determine the source from recent logs
+        metrics, token = request_context.start_request()
         try:
-            with open("app.log", "r") as f:
-                logs = f.readlines()
-                # Get the most recent 5 log lines
-                recent_logs = logs[-5:]
-                for log in reversed(recent_logs):
-                    if "from Redis cache" in log:
-                        response.headers["X-Data-Source"] = "redis_cache"
-                        break
-                    elif "from database" in log:
-                        response.headers["X-Data-Source"] = "database"
-                        break
-        except Exception as e:
-            logger.error(f"Error adding data source header: {e}")
-            
+            response = await call_next(request)
+        finally:
+            request_context.end_request(token)
+        request_context.check_query_budget(request.scope.get("endpoint"), metrics, request.url.path)
+        response.headers.update(metrics.headers())
         return response
 
 # Create FastAPI app
@@ -63,6 +61,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # let browser clients follow list cursors
 )
 
 # Add our custom middleware
@@ -123,12 +122,38 @@ async def health_check():
     else:
         return {"status": "degraded", "services": health_status}
 
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """Hit ratios for the in-process L1 cache and Redis."""
+    return cache_stats()
+
+@app.get("/db/pool")
+async def get_pool_status():
+    """Connection pool usage and checkout wait times for the primary and each replica."""
+    return pool_status()
+
 @app.on_event("startup")
 async def startup_event():
     try:
         # Create all tables
         Base.metadata.create_all(bind=engine)
         
+        # Fill the existence filters for user and detail IDs
+        from utils import bloom
+        bloom.start_rebuild()
+        
+        # Preload hot cache keys in the background, if enabled
+        import cache_warmup
+        cache_warmup.start_warmup()
+        
+        # Start publishing outbox events to Kafka
+        import outbox_relay
+        outbox_relay.start_relay()
+        
+        # Feed /kafka/events from the user_events topic
+        from routes.kafka_routes import start_events_feed
+        start_events_feed()
+        
         # Check if Kafka is available
         try:
             import kafka_utils
@@ -142,6 +167,30 @@ async def startup_event():
         logger.error(f"Error during startup: {e}")
         # We'll let the app start anyway, but log the error
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Stop the outbox relay, flush and close the shared Kafka producer, then close the async Redis and database pools
+    try:
+        import outbox_relay
+        outbox_relay.stop_relay(timeout=5)
+        
+        from routes.kafka_routes import stop_events_feed
+        stop_events_feed(timeout=5)
+        
+        import kafka_utils
+        kafka_utils.close_producer(timeout=5)
+        
+        from utils.async_cache import close_async_cache
+        await close_async_cache()
+        
+        from database import dispose_async_engines
+        await dispose_async_engines()
+        
+        from auth import shutdown_hash_pool
+        shutdown_hash_pool()
+    except Exception as e:
+        logger.error(f"Error during shutdown: {e}")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,25 @@
+"""
+Outbox model for events waiting to be published to Kafka.
+"""
+
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index
+
+from database import Base
+
+class OutboxEvent(Base):
+    __tablename__ = "outbox_events"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    topic = Column(String(255), nullable=False)
+    key = Column(String(255))
+    payload = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    last_error = Column(String(500))
+    claimed_by = Column(String(32))  # relay holding the lease until next_attempt_at
+    
+    __table_args__ = (
+        Index("ix_outbox_events_key_id", "key", "id"),
+    )
@@ -0,0 +1,324 @@
+#!/usr/bin/env python
+"""
+Transactional outbox relay.
+
+Routes write events to the outbox_events table in the same transaction as the
+rows they describe. The relay drains that table to Kafka in batches, so a slow
+or unavailable broker never stalls or loses a write.
+
+Events sharing a key are published in insertion order. If one fails, it and
+every later event with the same key are retried with exponential backoff,
+which may re-send events that were already delivered (at-least-once).
+Each batch is leased to one relay in a short transaction and sent outside
+it, so several relays can drain the table without blocking the writers.
+
+The relay runs in a background thread of the API, or standalone:
+    python outbox_relay.py
+"""
+
+import os
+import sys
+import json
+import logging
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session, aliased
+
+import kafka_utils
+from database import SessionLocal
+from models.outbox import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+# Relay settings
+OUTBOX_ENABLED = os.getenv("EVENT_OUTBOX_ENABLED", "true").lower() == "true"
+RELAY_ENABLED = os.getenv("OUTBOX_RELAY_ENABLED", "true").lower() == "true"
+BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", 500))
+POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", 1.0))
+RETRY_BASE_DELAY = float(os.getenv("OUTBOX_RETRY_BASE_DELAY", 1.0))
+RETRY_MAX_DELAY = float(os.getenv("OUTBOX_RETRY_MAX_DELAY", 300.0))
+CLAIM_TIMEOUT = float(os.getenv("OUTBOX_CLAIM_TIMEOUT", 60.0))  # must exceed KAFKA_SEND_TIMEOUT
+
+def enqueue_event(db: Session, topic: str, message: Dict[str, Any], key: Optional[str] = None) -> OutboxEvent:
+    """
+    Add an event to the outbox as part of the caller's transaction.
+
+    The event is published by the relay once the caller commits; nothing is
+    sent if the transaction rolls back.
+    """
+    event = OutboxEvent(topic=topic, key=key, payload=json.dumps(message))
+    db.add(event)
+    return event
+
+def outbox_insert(topic: str, messages: List[Tuple[Optional[str], Dict[str, Any]]]):
+    """
+    A single multi-row INSERT adding (key, message) events to the outbox.
+
+    Execute it in the caller's transaction, like enqueue_event, when adding
+    many events at once.
+    """
+    return insert(OutboxEvent).values([
+        {"topic": topic, "key": key, "payload": json.dumps(message)} for key, message in messages
+    ])
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff in seconds for an event that has failed `attempts` times."""
+    return min(RETRY_BASE_DELAY * (2 ** (attempts - 1)), RETRY_MAX_DELAY)
+
+class OutboxRelay:
+    """Background worker that drains the outbox to Kafka."""
+
+    def __init__(self, batch_size: int = BATCH_SIZE, poll_interval: float = POLL_INTERVAL):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self.run, name="outbox-relay", daemon=True)
+        self._thread.start()
+        logger.info(f"Outbox relay started (batch size {self.batch_size})")
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        logger.info("Outbox relay stopped")
+
+    def notify(self) -> None:
+        """Wake the relay so a freshly committed event is sent without waiting for the next poll."""
+        self._wakeup.set()
+
+    def run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                published = self.drain_once()
+            except Exception as e:
+                logger.error(f"Outbox relay error: {e}")
+                published = 0
+
+            # Keep draining while there is a backlog, otherwise wait for work
+            if published < self.batch_size:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+    def drain_once(self) -> int:
+        """
+        Publish one batch of pending events.
+
+        The batch is claimed, sent and settled in three steps, and only the
+        claim and the settle hold a transaction, each for a few statements.
+        Nothing stays locked while the relay waits on Kafka.
+
+        Returns:
+            int: Number of events published
+        """
+        claim = uuid.uuid4().hex
+        events = self._claim(claim)
+        if not events:
+            return 0
+
+        published, failed, released = self._send(events)
+        self._settle(claim, events, published, failed, released)
+
+        if published:
+            logger.info(f"Outbox relay published {len(published)} events")
+        return len(published)
+
+    def _claim(self, claim: str) -> List[OutboxEvent]:
+        """
+        Lease the next ready events to this relay.
+
+        Claimed rows get claimed_by and a next_attempt_at CLAIM_TIMEOUT ahead,
+        which hides them, and every later event with the same key, from other
+        relays. If this relay dies, the events are sent again once the lease
+        runs out.
+        """
+        now = datetime.utcnow()
+        earlier = aliased(OutboxEvent)
+        # An earlier event for the same key is waiting to be retried or is leased to a relay
+        blocked = (
+            select(earlier.id)
+            .where(earlier.key == OutboxEvent.key, earlier.id < OutboxEvent.id, earlier.next_attempt_at > now)
+            .exists()
+        )
+
+        db = SessionLocal(expire_on_commit=False)
+        try:
+            # Skip rows another relay is claiming instead of waiting for its transaction
+            events = (
+                db.query(OutboxEvent)
+                .filter(OutboxEvent.next_attempt_at <= now, ~blocked)
+                .order_by(OutboxEvent.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+                .all()
+            )
+
+            # A skipped row is not visible as blocked yet, so leave every key
+            # that has an earlier event outside this batch to the next poll
+            first_ids = {}
+            for event in events:
+                if event.key is not None:
+                    first_ids.setdefault(event.key, event.id)
+            if first_ids:
+                oldest = dict(
+                    db.query(OutboxEvent.key, func.min(OutboxEvent.id))
+                    .filter(OutboxEvent.key.in_(first_ids))
+                    .group_by(OutboxEvent.key)
+                    .all()
+                )
+                events = [event for event in events
+                          if event.key is None or oldest[event.key] == first_ids[event.key]]
+
+            lease_until = now + timedelta(seconds=CLAIM_TIMEOUT)
+            for event in events:
+                event.claimed_by = claim
+                event.next_attempt_at = lease_until
+            db.commit()
+            return events
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _send(self, events: List[OutboxEvent]) -> Tuple[List[int], Dict[int, Exception], List[int]]:
+        """
+        Send claimed events to Kafka, outside any transaction.
+
+        Returns:
+            tuple: IDs of the published events, errors by ID of the failed
+                events, and IDs of events held back behind a failed one
+        """
+        try:
+            producer = kafka_utils.get_producer()
+        except Exception as e:
+            return [], {event.id: e for event in events}, []
+
+        failed = {}
+        failed_keys = set()
+        in_flight = []
+        released = []
+        for event in events:
+            # An earlier event for this key could not be sent
+            if event.key in failed_keys:
+                released.append(event.id)
+                continue
+            try:
+                future = producer.send(
+                    event.topic,
+                    value=json.loads(event.payload),
+                    key=event.key.encode("utf-8") if event.key else None
+                )
+            except Exception as e:
+                failed[event.id] = e
+                if event.key is not None:
+                    failed_keys.add(event.key)
+                continue
+            in_flight.append((event, future))
+
+        # Send the whole batch in as few requests as possible
+        producer.flush(timeout=kafka_utils.SEND_TIMEOUT)
+
+        published = []
+        for event, future in in_flight:
+            error = None
+            if event.key in failed_keys:
+                error = RuntimeError("earlier event for this key failed")
+            else:
+                try:
+                    future.get(timeout=0)
+                except Exception as e:
+                    error = e
+
+            if error is None:
+                published.append(event.id)
+            else:
+                failed[event.id] = error
+                if event.key is not None:
+                    failed_keys.add(event.key)
+        return published, failed, released
+
+    def _settle(self, claim: str, events: List[OutboxEvent], published: List[int],
+                failed: Dict[int, Exception], released: List[int]) -> None:
+        """Delete published events and reschedule the rest, in one short transaction."""
+        now = datetime.utcnow()
+        # A row whose lease ran out may have been claimed by another relay since
+        mine = OutboxEvent.claimed_by == claim
+
+        db = SessionLocal()
+        try:
+            if published:
+                db.query(OutboxEvent).filter(OutboxEvent.id.in_(published), mine).delete(synchronize_session=False)
+            if released:
+                db.query(OutboxEvent).filter(OutboxEvent.id.in_(released), mine).update(
+                    {OutboxEvent.claimed_by: None, OutboxEvent.next_attempt_at: now}, synchronize_session=False
+                )
+            for event in events:
+                if event.id not in failed:
+                    continue
+                error = failed[event.id]
+                attempts = event.attempts + 1
+                db.query(OutboxEvent).filter(OutboxEvent.id == event.id, mine).update({
+                    OutboxEvent.attempts: attempts,
+                    OutboxEvent.next_attempt_at: now + timedelta(seconds=retry_delay(attempts)),
+                    OutboxEvent.last_error: str(error)[:500],
+                    OutboxEvent.claimed_by: None,
+                }, synchronize_session=False)
+                logger.warning(f"Outbox event {event.id} for topic {event.topic} failed (attempt {attempts}): {error}")
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+# Relay running inside this process, if any
+relay = None
+
+def start_relay() -> Optional[OutboxRelay]:
+    """Start the in-process relay unless it is disabled."""
+    global relay
+    if not (OUTBOX_ENABLED and RELAY_ENABLED) or relay is not None:
+        return relay
+    relay = OutboxRelay()
+    relay.start()
+    return relay
+
+def stop_relay(timeout: Optional[float] = None) -> None:
+    """Stop the in-process relay."""
+    global relay
+    if relay is not None:
+        relay.stop(timeout)
+        relay = None
+
+def notify_relay() -> None:
+    """Tell the in-process relay that new events were committed."""
+    if relay is not None:
+        relay.notify()
+
+def main():
+    """Run the relay in the foreground."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    outbox_relay = OutboxRelay()
+    logger.info(f"Starting outbox relay (batch size {outbox_relay.batch_size})")
+    try:
+        outbox_relay.run()
+    except KeyboardInterrupt:
+        logger.info("Outbox relay shutting down...")
+    finally:
+        kafka_utils.close_producer(timeout=5)
+
+if __name__ == "__main__":
+    main()
@@ -2,14 +2,18 @@
 Kafka API routes for testing and monitoring Kafka functionality.
 """
 
-from fastapi import APIRouter, BackgroundTasks
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Request
+from starlette.concurrency import run_in_threadpool
 import subprocess
 import os
+import threading
 import json
 import logging
 import kafka_utils
 from typing import Dict, Any, List
 from datetime import datetime, timedelta
+from schema.kafka import BatchMessage
+from utils.streaming import read_lines
 
 logger = logging.getLogger(__name__)
 
@@ -23,6 +27,16 @@ router = APIRouter(
 # In a production environment, you might use Redis or a database
 recent_events = []
 MAX_STORED_EVENTS = 50
+_recent_events_lock = threading.Lock()
+
+# Fill recent_events by subscribing to the user_events topic
+USER_EVENTS_TOPIC = "user_events"
+EVENTS_FEED_ENABLED = os.getenv("KAFKA_EVENTS_FEED_ENABLED", "true").lower() == "true"
+_feed_thread = None
+_feed_stopping = threading.Event()
+
+# Largest batch accepted by /publish/{topic_name}/batch
+MAX_BATCH_MESSAGES = int(os.getenv("KAFKA_MAX_BATCH_MESSAGES", 10000))
 
 @router.get("/topics")
 async def list_kafka_topics() -> Dict[str, List[str]]:
@@ -62,17 +76,13 @@ async def publish_message(topic_name: str, message: Dict[str, Any]) -> Dict[str,
     Publish a message to a Kafka topic.
     """
     try:
-        # Store message in recent events for the UI to fetch
-        if topic_name == "user_events":
-            # Add timestamp if not present
-            if "timestamp" not in message:
-                message["timestamp"] = datetime.now().isoformat()
-            
-            # Save to in-memory storage for the /events API
-            recent_events.append(message)
-            # Keep only the most recent events
-            if len(recent_events) > MAX_STORED_EVENTS:
-                recent_events.pop(0)
+        # Add timestamp if not present
+        if topic_name == USER_EVENTS_TOPIC and "timestamp" not in message:
+            message["timestamp"] = datetime.now().isoformat()
+        
+        # Store message in recent events for the UI to fetch, unless the feed will pick it up
+        if topic_name == USER_EVENTS_TOPIC and _feed_thread is None:
+            store_events([message])
         
         result = kafka_utils.send_message(topic=topic_name, message=message)
         if result:
@@ -83,6 +93,124 @@ async def publish_message(topic_name: str, message: Dict[str, Any]) -> Dict[str,
         logger.error(f"Error publishing message: {e}")
         return {"status": "error", "message": str(e)}
 
+@router.post("/publish/{topic_name}/batch")
+async def publish_batch(topic_name: str, request: Request) -> Dict[str, Any]:
+    """
+    Publish many messages to a Kafka topic in one call.
+    
+    The body is either a JSON array or an NDJSON stream (Content-Type
+    application/x-ndjson) of {"key": optional string, "value": {...}} objects.
+    Returns the partition and offset, or the error, for every message in order.
+    """
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type or "jsonl" in content_type:
+        items = []
+        async for item in _read_ndjson(request):
+            # Reject an oversized stream without reading the rest of it
+            if len(items) == MAX_BATCH_MESSAGES:
+                raise HTTPException(status_code=413, detail=f"Batch exceeds {MAX_BATCH_MESSAGES} messages")
+            items.append(item)
+    else:
+        try:
+            items = json.loads(await request.body())
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid JSON body: {e}")
+        if not isinstance(items, list):
+            raise HTTPException(status_code=400, detail="Expected a JSON array of messages")
+    
+    if len(items) > MAX_BATCH_MESSAGES:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {MAX_BATCH_MESSAGES} messages")
+    
+    # Validate every message, remembering where the valid ones sit in the batch
+    results: List[Dict[str, Any]] = [None] * len(items)
+    valid = []
+    for index, item in enumerate(items):
+        try:
+            if isinstance(item, Exception):
+                raise item
+            message = BatchMessage(**item)
+        except Exception as e:
+            results[index] = {"index": index, "status": "error", "error": f"Invalid message: {e}"}
+            continue
+        valid.append((index, message))
+    
+    if topic_name == USER_EVENTS_TOPIC:
+        for _, message in valid:
+            if "timestamp" not in message.value:
+                message.value["timestamp"] = datetime.now().isoformat()
+        if _feed_thread is None:
+            store_events([message.value for _, message in valid])
+    
+    # Sending blocks on the broker acknowledgements, so keep it off the event loop
+    sent = await run_in_threadpool(
+        kafka_utils.send_batch, topic_name, [(message.key, message.value) for _, message in valid]
+    )
+    for (index, _), result in zip(valid, sent):
+        results[index] = {"index": index, **result}
+    
+    failed = sum(1 for result in results if result["status"] != "success")
+    if failed == 0:
+        status = "success"
+    elif failed < len(results):
+        status = "partial"
+    else:
+        status = "error"
+    return {"status": status, "published": len(results) - failed, "failed": failed, "results": results}
+
+async def _read_ndjson(request: Request):
+    """Yield one decoded object (or the parse error) per non-empty line of the request body."""
+    async for line in read_lines(request):
+        yield _parse_line(line)
+
+def _parse_line(line: bytes):
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        return ValueError(f"Invalid JSON line: {e}")
+
+def store_events(events: List[Dict[str, Any]]) -> None:
+    """Save events to in-memory storage for the /events API, keeping only the most recent."""
+    with _recent_events_lock:
+        recent_events.extend(events)
+        del recent_events[:-MAX_STORED_EVENTS]
+
+def _run_events_feed() -> None:
+    """Consume user_events from the latest offset into recent_events until stopped."""
+    while not _feed_stopping.is_set():
+        consumer = None
+        try:
+            # No consumer group: every API replica sees every event, and nothing is committed
+            consumer = kafka_utils.get_consumer(USER_EVENTS_TOPIC, group_id=None, auto_offset_reset="latest")
+            while not _feed_stopping.is_set():
+                records = consumer.poll(timeout_ms=1000)
+                for messages in records.values():
+                    store_events([message.value for message in messages])
+        except Exception as e:
+            logger.warning(f"Events feed error, reconnecting: {e}")
+            _feed_stopping.wait(5)
+        finally:
+            if consumer is not None:
+                consumer.close()
+
+def start_events_feed() -> None:
+    """Start the background subscription that feeds /kafka/events."""
+    global _feed_thread
+    if not EVENTS_FEED_ENABLED or _feed_thread is not None:
+        return
+    _feed_stopping.clear()
+    _feed_thread = threading.Thread(target=_run_events_feed, name="kafka-events-feed", daemon=True)
+    _feed_thread.start()
+    logger.info(f"Events feed subscribed to {USER_EVENTS_TOPIC}")
+
+def stop_events_feed(timeout: float = None) -> None:
+    """Stop the events feed subscription."""
+    global _feed_thread
+    if _feed_thread is None:
+        return
+    _feed_stopping.set()
+    _feed_thread.join(timeout)
+    _feed_thread = None
+
 @router.get("/events")
 async def get_recent_events(since: str = None) -> Dict[str, List[Dict[str, Any]]]:
     """
@@ -90,12 +218,15 @@ async def get_recent_events(since: str = None) -> Dict[str, List[Dict[str, Any]]
     Optionally filter by timestamp with 'since' parameter.
     """
     try:
+        with _recent_events_lock:
+            events = list(recent_events)
+        
         # If since parameter provided, filter events
         if since:
             try:
                 since_dt = datetime.fromisoformat(since)
                 filtered_events = [
-                    event for event in recent_events 
+                    event for event in events 
                     if datetime.fromisoformat(event.get("timestamp", "")) > since_dt
                 ]
                 return {"events": filtered_events}
@@ -104,7 +235,7 @@ async def get_recent_events(since: str = None) -> Dict[str, List[Dict[str, Any]]
                 pass
         
         # Return all recent events
-        return {"events": recent_events}
+        return {"events": events}
     except Exception as e:
         logger.error(f"Error retrieving events: {e}")
         return {"events": [], "error": str(e)}
@@ -159,7 +290,8 @@ async def kafka_status() -> Dict[str, Any]:
             "status": "healthy" if broker_status == "healthy" else "unhealthy",
             "broker": broker_status,
             "topics_count": len(topics),
-            "topics": topics
+            "topics": topics,
+            "async_publisher": kafka_utils.publisher_stats()
         }
     except Exception as e:
         logger.error(f"Error checking Kafka status: {e}")
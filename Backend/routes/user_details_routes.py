@@ -2,16 +2,21 @@
 User details management routes.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 import logging
 
 from models.user import User
 from models.user_details import UserDetail
-from database import get_db
+from database import get_async_db, get_async_read_db, async_session_for_read, READ_REPLICAS_ENABLED
 from schema.user import UserDetailCreate, UserDetailResponse
-from utils.cache import cache_get, cache_set, cache_invalidate_pattern, cache_delete
+from utils.cache import MISSING, NEGATIVE_TTL, is_missing
+from utils import async_cache
+from utils.bloom import user_details_filter
+from utils.pagination import decode_cursor, next_cursor, page_key
+from utils.request_context import query_budget
 
 logger = logging.getLogger(__name__)
 
@@ -21,58 +26,79 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+def detail_response(db_detail):
+    """Build the cached response for a user detail."""
+    return {
+        "id": db_detail.id,
+        "user_id": db_detail.user_id,
+        "name": db_detail.name,
+        "email": db_detail.email,
+        "phone": db_detail.phone
+    }
+
+def details_page_query(skip, limit, after_id=None):
+    """Select a page of user details in ID order, after a cursor position or at an offset."""
+    query = select(UserDetail).order_by(UserDetail.id).limit(limit)
+    if after_id is not None:
+        return query.filter(UserDetail.id > after_id)
+    return query.offset(skip)
+
+def details_page(db, skip, limit, after_id=None):
+    """Load one page of the user details list as cached by read_user_details."""
+    return [detail_response(detail) for detail in db.scalars(details_page_query(skip, limit, after_id))]
+
 @router.get("/", response_model=List[UserDetailResponse])
-def read_user_details(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    """Get a list of all user details."""
-    # Try to get from cache
-    cache_key = f"user-details:all:skip{skip}:limit{limit}"
-    cached_data = cache_get(cache_key)
+@query_budget(1)
+async def read_user_details(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None,
+                            db: AsyncSession = Depends(get_async_read_db)):
+    """
+    Get a list of all user details in ID order.
     
-    if cached_data:
-        logger.info(f"Retrieved user details list from Redis cache with key: {cache_key}")
-        return cached_data
-        
-    # If not in cache, get from database
-    details = db.query(UserDetail).offset(skip).limit(limit).all()
+    Paginated like GET /users/, with skip or with the X-Next-Cursor header
+    passed back as cursor.
+    """
+    try:
+        after_id = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    cache_key = await async_cache.namespace_key("user-details:all", page_key(skip, limit, after_id))
     
-    # Cache the result for 5 minutes
-    details_data = [{
-        "id": detail.id,
-        "user_id": detail.user_id,
-        "name": detail.name,
-        "email": detail.email,
-        "phone": detail.phone
-    } for detail in details]
-    cache_set(cache_key, details_data, 300)
+    async def load_details():
+        # Replicas may not have a write from the last few seconds yet
+        use_primary = READ_REPLICAS_ENABLED and await async_cache.namespace_written_recently("user-details:all")
+        async with async_session_for_read(db, use_primary) as session:
+            details = await session.scalars(details_page_query(skip, limit, after_id))
+            logger.info(f"Retrieved user details list directly from database and cached with key: {cache_key}")
+            return [detail_response(detail) for detail in details]
     
-    logger.info(f"Retrieved user details list directly from database and cached with key: {cache_key}")
+    # Cache the result for 5 minutes; concurrent misses share one query
+    details = await async_cache.get_or_compute(cache_key, load_details, 300)
+    next_page = next_cursor(details, limit)
+    if next_page:
+        response.headers["X-Next-Cursor"] = next_page
     return details
 
 @router.get("/{detail_id}", response_model=UserDetailResponse)
-def read_user_detail(detail_id: int, db: Session = Depends(get_db)):
+@query_budget(1)
+async def read_user_detail(detail_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get details for a specific user detail ID."""
-    # Try to get from cache
     cache_key = f"user-details:{detail_id}"
-    cached_detail = cache_get(cache_key)
     
-    if cached_detail:
-        logger.info(f"Retrieved user detail ID {detail_id} from Redis cache")
-        return cached_detail
+    async def load_detail():
+        # Query the database unless the Bloom filter rules the ID out
+        db_detail = None
+        if await user_details_filter.might_contain_async(detail_id):
+            db_detail = await db.get(UserDetail, detail_id)
+        if db_detail is None:
+            # Remember the miss briefly so repeated lookups skip the database
+            await async_cache.cache_set(cache_key, MISSING, NEGATIVE_TTL)
+            raise HTTPException(status_code=404, detail="User detail not found")
         
-    # If not in cache, get from database
-    db_detail = db.query(UserDetail).filter(UserDetail.id == detail_id).first()
-    if db_detail is None:
-        raise HTTPException(status_code=404, detail="User detail not found")
-        
-    # Cache the result for 5 minutes
-    detail_data = {
-        "id": db_detail.id,
-        "user_id": db_detail.user_id,
-        "name": db_detail.name,
-        "email": db_detail.email,
-        "phone": db_detail.phone
-    }
-    cache_set(cache_key, detail_data, 300)
+        logger.info(f"Retrieved user detail ID {detail_id} directly from database and cached")
+        return detail_response(db_detail)
     
-    logger.info(f"Retrieved user detail ID {detail_id} directly from database and cached")
-    return db_detail 
\ No newline at end of file
+    # Cache the result for 5 minutes; concurrent misses share one query
+    detail = await async_cache.get_or_compute(cache_key, load_detail, 300)
+    if is_missing(detail):
+        raise HTTPException(status_code=404, detail="User detail not found")
+    return detail
@@ -2,19 +2,35 @@
 User management routes.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import insert, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from typing import Any, Dict, List, Optional
+import os
+import csv
+import json
 import logging
 
 from models.user import User
 from models.user_details import UserDetail
-from database import get_db
+from database import get_async_db, get_async_read_db, async_session_for_read, READ_REPLICAS_ENABLED
 from schema.user import UserCreate, UserResponse, UserLogin, UserWithDetails, UserDetailCreate, UserDetailResponse
-from utils.cache import cache_get, cache_set, cache_invalidate_pattern, cache_delete
-from auth import hash_password, verify_password
+from utils.cache import WRITE_THROUGH
+from utils.cache import MISSING, NEGATIVE_TTL, is_missing
+from utils import async_cache
+from utils.bloom import users_filter, user_details_filter
+from utils.pagination import decode_cursor, next_cursor, page_key
+from utils.request_context import query_budget
+from utils.streaming import read_lines
+from routes.user_details_routes import detail_response
+from auth import hash_password, hash_passwords_in_pool, verify_password
 from datetime import datetime
 import kafka_utils  # Import Kafka utilities
+import outbox_relay
+from outbox_relay import enqueue_event, outbox_insert
 
 logger = logging.getLogger(__name__)
 
@@ -27,125 +43,405 @@ router = APIRouter(
 # User events topic
 USER_EVENTS_TOPIC = "user_events"
 
+# Largest number of IDs accepted by the batch lookup
+MAX_BATCH_IDS = 100
+
+# Bulk import settings
+IMPORT_CHUNK_SIZE = int(os.getenv("USER_IMPORT_CHUNK_SIZE", 500))  # rows per INSERT and transaction
+IMPORT_MAX_ROWS = int(os.getenv("USER_IMPORT_MAX_ROWS", 100000))
+
+def send_user_event(event_data, key):
+    """
+    Hand a committed user event to Kafka.
+    
+    With the outbox enabled the event is already stored, so this only wakes the
+    relay. Otherwise the event is published directly, without blocking the
+    request when async publishing is enabled. Failures are logged, never raised.
+    """
+    if outbox_relay.OUTBOX_ENABLED:
+        outbox_relay.notify_relay()
+        return
+    
+    try:
+        # user_id is the key for consistent partitioning
+        if kafka_utils.ASYNC_PUBLISH:
+            kafka_utils.publish_async(
+                topic=USER_EVENTS_TOPIC,
+                message=event_data,
+                key=key,
+                on_error=lambda e: logger.error(f"Failed to deliver {event_data['event_type']} event for user ID {key}: {e}")
+            )
+        else:
+            kafka_utils.send_message(topic=USER_EVENTS_TOPIC, message=event_data, key=key)
+        logger.info(f"Sent {event_data['event_type']} event to Kafka for user ID {key}")
+    except Exception as e:
+        # Kafka is non-critical here, the request still succeeds
+        logger.error(f"Failed to send {event_data['event_type']} event to Kafka: {e}")
+
+def user_response(db_user):
+    """Build the cached response for a user and their details."""
+    response_data = {
+        "id": db_user.id,
+        "email": db_user.email,
+        "details": None
+    }
+    
+    if db_user.details:
+        response_data["details"] = detail_response(db_user.details)
+    return response_data
+
+def users_page_query(skip, limit, after_id=None):
+    """Select a page of users in ID order, after a cursor position or at an offset."""
+    query = select(User).order_by(User.id).limit(limit)
+    if after_id is not None:
+        return query.filter(User.id > after_id)
+    return query.offset(skip)
+
+def users_page(db, skip, limit, after_id=None):
+    """Load one page of the users list as cached by read_users."""
+    return [{"id": user.id, "email": user.email} for user in db.scalars(users_page_query(skip, limit, after_id))]
+
+async def detail_conflict(db, user_id, detail):
+    """
+    Check in one query that a user exists and that new details for them are not taken.
+    
+    Returns:
+        tuple: The user's email, or None if there is no such user, and the
+            error message for the first conflict found, or None
+    """
+    rows = (await db.execute(
+        select(User.email.label("user_email"), UserDetail.user_id.label("detail_user_id"),
+               UserDetail.email.label("detail_email"), UserDetail.phone.label("detail_phone"))
+        .outerjoin(UserDetail, or_(UserDetail.user_id == user_id,
+                                   UserDetail.email == detail.email,
+                                   UserDetail.phone == detail.phone))
+        .filter(User.id == user_id)
+    )).all()
+    if not rows:
+        return None, None
+    
+    user_email = rows[0].user_email
+    if any(row.detail_user_id == user_id for row in rows):
+        return user_email, "User details already exist"
+    if any(row.detail_email == detail.email for row in rows):
+        return user_email, "Email already registered"
+    if any(row.detail_phone == detail.phone for row in rows):
+        return user_email, "Phone number already registered"
+    return user_email, None
+
 # User endpoints
 @router.post("/", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-def create_user(user: UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.email == user.email).first()
+@query_budget(3)
+async def create_user(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    db_user = await db.scalar(select(User).filter(User.email == user.email).limit(1))
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    hashed_password = hash_password(user.password)
+    # bcrypt is CPU-bound, so keep it off the event loop
+    hashed_password = await run_in_threadpool(hash_password, user.password)
     db_user = User(email=user.email, password=hashed_password)
     
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    try:
+        await db.flush()  # Assign the user ID before writing the event
+    except IntegrityError:
+        # Another request registered the email since the check
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Email already registered")
+    await users_filter.add_async(db_user.id)
     
-    # Invalidate users cache
-    cache_invalidate_pattern("users:all:*")
+    event_data = {
+        "event_type": "user_created",
+        "user_id": db_user.id,
+        "email": db_user.email,
+        "timestamp": datetime.now().isoformat()
+    }
     
-    # Send user_created event to Kafka
-    try:
-        event_data = {
-            "event_type": "user_created",
-            "user_id": db_user.id,
-            "email": db_user.email,
-            "timestamp": datetime.now().isoformat()
-        }
-        
-        # Send message with user_id as the key for consistent partitioning
-        kafka_utils.send_message(
-            topic=USER_EVENTS_TOPIC,
-            message=event_data,
-            key=str(db_user.id)
-        )
-        logger.info(f"Sent user_created event to Kafka for user ID {db_user.id}")
-    except Exception as e:
-        logger.error(f"Failed to send user_created event to Kafka: {e}")
-        # Note: We continue even if Kafka message fails - this is a non-critical operation
+    # Record the event in the same transaction as the user
+    if outbox_relay.OUTBOX_ENABLED:
+        enqueue_event(db, USER_EVENTS_TOPIC, event_data, key=str(db_user.id))
+    
+    await db.commit()
+    
+    # Invalidate users cache, and replace a cached miss for this ID
+    await async_cache.invalidate_namespace("users:all")
+    if WRITE_THROUGH:
+        await async_cache.cache_put(f"users:{db_user.id}", {"id": db_user.id, "email": db_user.email, "details": None}, 300)
+    else:
+        await async_cache.cache_delete(f"users:{db_user.id}")
+    
+    # Send user_created event to Kafka; a direct send may block on the broker
+    await run_in_threadpool(send_user_event, event_data, str(db_user.id))
     
     logger.info(f"Created new user with ID {db_user.id} directly in database")
     return db_user
 
-@router.get("/", response_model=List[UserResponse])
-def read_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    # Try to get from cache
-    cache_key = f"users:all:skip{skip}:limit{limit}"
-    cached_data = cache_get(cache_key)
+@router.post("/import")
+async def import_users(request: Request, db: AsyncSession = Depends(get_async_db)) -> Dict[str, Any]:
+    """
+    Create many users from a CSV or NDJSON stream.
+    
+    The body is CSV (Content-Type text/csv) with an email,password header
+    row, or NDJSON (application/x-ndjson) with one {"email", "password"}
+    object per line. Rows are read as they arrive and imported in chunks of
+    IMPORT_CHUNK_SIZE, each with one multi-row INSERT in its own transaction,
+    so the rows of a failed request that were already committed stay imported.
+    Returns the new user ID per row and, for rows that were not imported, why.
+    """
+    content_type = request.headers.get("content-type", "")
+    if "csv" in content_type:
+        rows = _read_csv_rows(request)
+    elif "ndjson" in content_type or "jsonl" in content_type:
+        rows = _read_ndjson_rows(request)
+    else:
+        raise HTTPException(status_code=415, detail="Expected text/csv or application/x-ndjson")
+    
+    created: List[Dict[str, Any]] = []
+    errors: List[Dict[str, Any]] = []
+    seen_emails = set()
+    chunk = []
+    truncated = False
+    
+    async for row_number, item in rows:
+        if row_number > IMPORT_MAX_ROWS:
+            truncated = True
+            break
+        try:
+            if isinstance(item, Exception):
+                raise item
+            user = UserCreate(**item)
+        except Exception as e:
+            errors.append({"row": row_number, "status": "invalid", "error": f"Invalid row: {e}"})
+            continue
+        if user.email in seen_emails:
+            errors.append({"row": row_number, "email": user.email, "status": "conflict", "error": "Duplicate email in import"})
+            continue
+        seen_emails.add(user.email)
+        chunk.append((row_number, user))
+        if len(chunk) >= IMPORT_CHUNK_SIZE:
+            await _import_chunk(db, chunk, created, errors)
+            chunk = []
+    if chunk:
+        await _import_chunk(db, chunk, created, errors)
+    
+    if not errors and not truncated:
+        status = "success"
+    elif created:
+        status = "partial"
+    else:
+        status = "error"
+    errors.sort(key=lambda error: error["row"])
+    logger.info(f"Imported {len(created)} users, {len(errors)} rows rejected")
+    return {
+        "status": status,
+        "imported": len(created),
+        "rejected": len(errors),
+        "truncated": truncated,  # rows after IMPORT_MAX_ROWS were not read
+        "users": created,
+        "errors": errors
+    }
+
+async def _import_chunk(db, chunk, created, errors):
+    """Insert one chunk of import rows, adding the created users and the conflicting rows to the results."""
+    registered = await _registered_emails(db, [user.email for _, user in chunk])
+    new_users = []
+    for row_number, user in chunk:
+        if user.email in registered:
+            errors.append({"row": row_number, "email": user.email, "status": "conflict", "error": "Email already registered"})
+        else:
+            new_users.append((row_number, user))
+    if not new_users:
+        return
+    
+    # bcrypt dominates an import, so spread it over the worker processes
+    hashed = await hash_passwords_in_pool([user.password for _, user in new_users])
+    passwords = {user.email: password for (_, user), password in zip(new_users, hashed)}
     
-    if cached_data:
-        # Convert cached data to User objects
-        logger.info(f"Retrieved users list from Redis cache with key: {cache_key}")
-        return cached_data
+    while True:
+        try:
+            user_ids = await _insert_users(db, [user.email for _, user in new_users], passwords)
+            break
+        except IntegrityError:
+            # Another request registered some of these emails since the check
+            await db.rollback()
+            registered = await _registered_emails(db, [user.email for _, user in new_users])
+            if not registered:
+                raise
+            for row_number, user in new_users:
+                if user.email in registered:
+                    errors.append({"row": row_number, "email": user.email, "status": "conflict", "error": "Email already registered"})
+            new_users = [(row_number, user) for row_number, user in new_users if user.email not in registered]
+            if not new_users:
+                return
     
-    # If not in cache, get from database
-    users = db.query(User).offset(skip).limit(limit).all()
+    for row_number, user in new_users:
+        created.append({"row": row_number, "id": user_ids[user.email], "email": user.email})
     
-    # Cache the result for 5 minutes
-    user_data = [{"id": user.id, "email": user.email} for user in users]
-    cache_set(cache_key, user_data, 300)
+    # One cache invalidation and event batch per chunk
+    await async_cache.invalidate_namespace("users:all")
+    await async_cache.cache_delete_many([f"users:{user_id}" for user_id in user_ids.values()])
+    if outbox_relay.OUTBOX_ENABLED:
+        outbox_relay.notify_relay()
+    else:
+        events = [(str(user_id), _user_created_event(user_id, email)) for email, user_id in user_ids.items()]
+        results = await run_in_threadpool(kafka_utils.send_batch, USER_EVENTS_TOPIC, events)
+        failed = sum(1 for result in results if result["status"] != "success")
+        if failed:
+            logger.error(f"Failed to send {failed} of {len(events)} user_created events to Kafka")
+    logger.info(f"Imported chunk of {len(user_ids)} users")
+
+async def _registered_emails(db, emails):
+    return set(await db.scalars(select(User.email).filter(User.email.in_(emails))))
+
+async def _insert_users(db, emails, passwords):
+    """
+    Insert users with a single multi-row INSERT and commit, with their outbox events.
     
-    logger.info(f"Retrieved users list directly from database and cached with key: {cache_key}")
+    The IDs go into the Bloom filter before the commit, like in create_user.
+    
+    Returns:
+        dict: New user ID by email
+    """
+    await db.execute(insert(User).values([{"email": email, "password": passwords[email]} for email in emails]))
+    user_ids = dict((await db.execute(select(User.email, User.id).filter(User.email.in_(emails)))).all())
+    await users_filter.add_async(*user_ids.values())
+    if outbox_relay.OUTBOX_ENABLED:
+        events = [(str(user_id), _user_created_event(user_id, email)) for email, user_id in user_ids.items()]
+        await db.execute(outbox_insert(USER_EVENTS_TOPIC, events))
+    await db.commit()
+    return user_ids
+
+def _user_created_event(user_id, email):
+    return {
+        "event_type": "user_created",
+        "user_id": user_id,
+        "email": email,
+        "timestamp": datetime.now().isoformat()
+    }
+
+async def _read_ndjson_rows(request):
+    """Yield (row number, decoded object or the parse error) per NDJSON line."""
+    row_number = 0
+    async for line in read_lines(request):
+        row_number += 1
+        try:
+            yield row_number, json.loads(line)
+        except ValueError as e:
+            yield row_number, ValueError(f"Invalid JSON line: {e}")
+
+async def _read_csv_rows(request):
+    """Yield (row number, dict keyed by the header row) per CSV line. Quoted fields cannot span lines."""
+    header = None
+    row_number = 0
+    async for line in read_lines(request):
+        try:
+            values = next(csv.reader([line.decode("utf-8-sig" if header is None else "utf-8")]))
+        except (UnicodeDecodeError, csv.Error) as e:
+            if header is None:
+                raise HTTPException(status_code=400, detail=f"Invalid CSV header: {e}")
+            row_number += 1
+            yield row_number, ValueError(f"Invalid CSV line: {e}")
+            continue
+        if header is None:
+            header = [name.strip().lower() for name in values]
+            if not {"email", "password"} <= set(header):
+                raise HTTPException(status_code=400, detail="CSV header must include email and password")
+            continue
+        row_number += 1
+        if len(values) != len(header):
+            yield row_number, ValueError(f"Expected {len(header)} fields, got {len(values)}")
+            continue
+        yield row_number, dict(zip(header, values))
+
+@router.get("/", response_model=List[UserResponse])
+@query_budget(1)
+async def read_users(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None,
+                     db: AsyncSession = Depends(get_async_read_db)):
+    """
+    List users in ID order.
+    
+    When the page is full, the X-Next-Cursor response header holds the cursor
+    for the next page. A cursor takes precedence over skip.
+    """
+    try:
+        after_id = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    cache_key = await async_cache.namespace_key("users:all", page_key(skip, limit, after_id))
+    
+    async def load_users():
+        # Replicas may not have a write from the last few seconds yet
+        use_primary = READ_REPLICAS_ENABLED and await async_cache.namespace_written_recently("users:all")
+        async with async_session_for_read(db, use_primary) as session:
+            users = await session.scalars(users_page_query(skip, limit, after_id))
+            logger.info(f"Retrieved users list directly from database and cached with key: {cache_key}")
+            return [{"id": user.id, "email": user.email} for user in users]
+    
+    # Cache the result for 5 minutes; concurrent misses share one query
+    users = await async_cache.get_or_compute(cache_key, load_users, 300)
+    next_page = next_cursor(users, limit)
+    if next_page:
+        response.headers["X-Next-Cursor"] = next_page
     return users
 
+@router.get("/batch", response_model=List[UserWithDetails])
+@query_budget(1)
+async def read_users_batch(ids: str = Query(..., description="Comma-separated user IDs, e.g. 1,2,3"), db: AsyncSession = Depends(get_async_db)):
+    """Get several users at once. Unknown IDs are left out of the response."""
+    try:
+        user_ids = list(dict.fromkeys(int(user_id) for user_id in ids.split(",") if user_id.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be comma-separated integers")
+    if len(user_ids) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_IDS} ids can be requested at once")
+    
+    cache_keys = {f"users:{user_id}": user_id for user_id in user_ids}
+    
+    async def load_users(missing_keys):
+        missing_ids = [cache_keys[key] for key in missing_keys]
+        users = (await db.scalars(select(User).options(joinedload(User.details)).filter(User.id.in_(missing_ids)))).all()
+        logger.info(f"Retrieved {len(users)} of {len(missing_ids)} uncached users directly from database")
+        return {f"users:{user.id}": user_response(user) for user in users}
+    
+    # Cache hits come from one MGET, misses from one IN query
+    found = await async_cache.get_many_or_compute(list(cache_keys), load_users, 300)
+    return [found[key] for key in cache_keys if key in found]
+
 @router.get("/{user_id}", response_model=UserWithDetails)
-def read_user(user_id: int, db: Session = Depends(get_db)):
-    # Try to get from cache
+@query_budget(1)
+async def read_user(user_id: int, db: AsyncSession = Depends(get_async_db)):
     cache_key = f"users:{user_id}"
-    cached_user = cache_get(cache_key)
     
-    if cached_user:
-        logger.info(f"Retrieved user ID {user_id} from Redis cache")
-        return cached_user
+    async def load_user():
+        # IDs the Bloom filter has never seen are rejected without a query
+        db_user = None
+        if await users_filter.might_contain_async(user_id):
+            # Async sessions cannot lazy load, so fetch the details in the same query
+            db_user = await db.scalar(select(User).options(joinedload(User.details)).filter(User.id == user_id))
+        if db_user is None:
+            # Remember the miss briefly so repeated lookups skip the database
+            await async_cache.cache_set(cache_key, MISSING, NEGATIVE_TTL)
+            raise HTTPException(status_code=404, detail="User not found")
+        
+        logger.info(f"Retrieved user ID {user_id} directly from database and cached")
+        return user_response(db_user)
     
-    # If not in cache, get from database
-    db_user = db.query(User).filter(User.id == user_id).first()
-    if db_user is None:
+    # Cache the result for 5 minutes; concurrent misses share one query
+    user = await async_cache.get_or_compute(cache_key, load_user, 300)
+    if is_missing(user):
         raise HTTPException(status_code=404, detail="User not found")
-    
-    # Prepare response data
-    response_data = {
-        "id": db_user.id,
-        "email": db_user.email,
-        "details": None
-    }
-    
-    if db_user.details:
-        response_data["details"] = {
-            "id": db_user.details.id,
-            "user_id": db_user.details.user_id,
-            "name": db_user.details.name,
-            "email": db_user.details.email,
-            "phone": db_user.details.phone
-        }
-    
-    # Cache the result for 5 minutes
-    cache_set(cache_key, response_data, 300)
-    
-    logger.info(f"Retrieved user ID {user_id} directly from database and cached")
-    return db_user
+    return user
 
 @router.post("/{user_id}/details/", response_model=UserDetailResponse)
-def create_user_detail(user_id: int, detail: UserDetailCreate, db: Session = Depends(get_db)):
+@query_budget(3)
+async def create_user_detail(user_id: int, detail: UserDetailCreate, db: AsyncSession = Depends(get_async_db)):
     """Create details for a specific user."""
-    db_user = db.query(User).filter(User.id == user_id).first()
-    if db_user is None:
+    # Check the user and the existing details, email and phone in one query
+    user_email, conflict = await detail_conflict(db, user_id, detail)
+    if user_email is None:
         raise HTTPException(status_code=404, detail="User not found")
-        
-    # Check if details already exist
-    existing_detail = db.query(UserDetail).filter(UserDetail.user_id == user_id).first()
-    if existing_detail:
-        raise HTTPException(status_code=400, detail="User details already exist")
-        
-    # Check if email is already registered
-    email_check = db.query(UserDetail).filter(UserDetail.email == detail.email).first()
-    if email_check:
-        raise HTTPException(status_code=400, detail="Email already registered")
-        
-    # Check if phone is already registered
-    phone_check = db.query(UserDetail).filter(UserDetail.phone == detail.phone).first()
-    if phone_check:
-        raise HTTPException(status_code=400, detail="Phone number already registered")
+    if conflict:
+        raise HTTPException(status_code=400, detail=conflict)
     
     db_detail = UserDetail(
         user_id=user_id,
@@ -155,36 +451,48 @@ def create_user_detail(user_id: int, detail: UserDetailCreate, db: Session = Dep
     )
     
     db.add(db_detail)
-    db.commit()
-    db.refresh(db_detail)
+    try:
+        await db.flush()  # Assign the detail ID before writing the event
+    except IntegrityError:
+        # A concurrent request took the details, email or phone since the check
+        await db.rollback()
+        user_email, conflict = await detail_conflict(db, user_id, detail)
+        if user_email is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        raise HTTPException(status_code=400, detail=conflict or "User details conflict with existing data")
+    await user_details_filter.add_async(db_detail.id)
     
-    # Invalidate cache
-    cache_delete(f"users:{user_id}")
-    cache_invalidate_pattern("users:all:*")
-    cache_invalidate_pattern("user-details:*")
+    event_data = {
+        "event_type": "user_details_created",
+        "detail_id": db_detail.id,
+        "user_id": user_id,
+        "name": db_detail.name,
+        "email": db_detail.email,
+        "phone": db_detail.phone,
+        "timestamp": datetime.now().isoformat()
+    }
     
-    # Send user_details_created event to Kafka
-    try:
-        event_data = {
-            "event_type": "user_details_created",
-            "detail_id": db_detail.id,
-            "user_id": user_id,
-            "name": db_detail.name,
-            "email": db_detail.email,
-            "phone": db_detail.phone,
-            "timestamp": datetime.now().isoformat()
-        }
-        
-        # Send message with user_id as the key for consistent partitioning
-        kafka_utils.send_message(
-            topic=USER_EVENTS_TOPIC,
-            message=event_data,
-            key=str(user_id)
-        )
-        logger.info(f"Sent user_details_created event to Kafka for user ID {user_id}")
-    except Exception as e:
-        logger.error(f"Failed to send user_details_created event to Kafka: {e}")
-        # Continue even if Kafka message fails
+    # Record the event in the same transaction as the details
+    if outbox_relay.OUTBOX_ENABLED:
+        enqueue_event(db, USER_EVENTS_TOPIC, event_data, key=str(user_id))
+    
+    detail_data = detail_response(db_detail)
+    user_data = {"id": user_id, "email": user_email, "details": detail_data}
+    
+    await db.commit()
+    
+    # Invalidate cache, or refresh the user and detail entries with the data just written
+    if WRITE_THROUGH:
+        await async_cache.cache_put(f"users:{user_id}", user_data, 300)
+        await async_cache.cache_put(f"user-details:{detail_data['id']}", detail_data, 300)
+    else:
+        await async_cache.cache_delete(f"users:{user_id}")
+        await async_cache.cache_delete(f"user-details:{detail_data['id']}")
+    await async_cache.invalidate_namespace("users:all")
+    await async_cache.invalidate_namespace("user-details:all")
+    
+    # Send user_details_created event to Kafka; a direct send may block on the broker
+    await run_in_threadpool(send_user_event, event_data, str(user_id))
     
     logger.info(f"Created user details for user ID {user_id} directly in database")
     return db_detail 
\ No newline at end of file
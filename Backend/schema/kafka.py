@@ -0,0 +1,11 @@
+"""
+Kafka-related Pydantic schemas.
+"""
+
+from pydantic import BaseModel
+from typing import Optional, Dict, Any
+
+# Batch publish schemas
+class BatchMessage(BaseModel):
+    key: Optional[str] = None
+    value: Dict[str, Any]
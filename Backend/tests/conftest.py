@@ -0,0 +1,80 @@
+"""
+Test fixtures: the API over a temporary SQLite database and an in-memory Redis.
+
+The settings below are read at import time, so they are set before the app is
+imported. Queries are served by the async engine through aiosqlite, Redis by
+fakeredis, and any request over its route's query budget raises. The tests
+run in a temporary directory, so the app's log files and the Kafka spill file
+are written there instead of into the source tree.
+
+Run from the Backend directory:
+    pip install -r requirements-dev.txt
+    python -m pytest tests
+"""
+
+import os
+import sys
+import tempfile
+
+_db_dir = tempfile.mkdtemp(prefix="kub-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'test.db')}"
+os.environ["DATABASE_READ_URLS"] = ""
+os.environ["DB_QUERY_BUDGET_MODE"] = "raise"
+os.environ["OUTBOX_RELAY_ENABLED"] = "false"
+os.environ["KAFKA_EVENTS_FEED_ENABLED"] = "false"
+os.environ["CACHE_WARMUP_ENABLED"] = "false"
+os.environ["CACHE_L1_ENABLED"] = "false"
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# main and user_events_consumer open app.log and events_consumer.log in the working directory
+os.chdir(_db_dir)
+
+import fakeredis
+import pytest
+from fastapi.testclient import TestClient
+
+import auth
+import kafka_utils
+from database import Base, engine
+from utils import cache, async_cache
+
+import main
+
+@pytest.fixture
+def redis_server(monkeypatch):
+    """A fresh in-memory Redis behind both the sync and async cache clients."""
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(cache.redis_client, "client", fakeredis.FakeRedis(server=server))
+    monkeypatch.setattr(async_cache, "get_async_client", lambda: fakeredis.FakeAsyncRedis(server=server))
+    return server
+
+@pytest.fixture
+def client(redis_server, monkeypatch):
+    """A TestClient over empty tables, with Kafka and bcrypt stubbed out."""
+    def no_kafka():
+        raise ConnectionError("Kafka is not available in tests")
+
+    monkeypatch.setattr(kafka_utils, "list_topics", no_kafka)
+    # Real bcrypt takes a quarter of a second per hash
+    monkeypatch.setattr(auth, "hash_password", lambda password: f"plain:{password}")
+    monkeypatch.setattr(auth, "verify_password", lambda password, hashed: hashed == f"plain:{password}")
+    monkeypatch.setattr("routes.user_routes.hash_password", auth.hash_password)
+    monkeypatch.setattr("routes.auth_routes.verify_password", auth.verify_password)
+
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+def assert_queries(response, max_queries):
+    """Fail if the request behind response ran more than max_queries SQL statements."""
+    queries = int(response.headers["X-DB-Queries"])
+    assert queries <= max_queries, f"{response.request.url.path} ran {queries} queries, expected at most {max_queries}"
+
+def create_user(client, email="user@example.com", password="secret"):
+    response = client.post("/users/", json={"email": email, "password": password})
+    assert response.status_code == 201, response.text
+    return response.json()
+
+def create_details(client, user_id, email="details@example.com", phone="555-0100", name="Test User"):
+    return client.post(f"/users/{user_id}/details/", json={"name": name, "email": email, "phone": phone})
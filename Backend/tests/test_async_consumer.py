@@ -0,0 +1,42 @@
+"""
+Offsets of the asyncio consumer runtime.
+"""
+
+import asyncio
+
+from kafka import TopicPartition
+
+import kafka_utils
+from async_consumer import AsyncConsumerRuntime
+
+class Record:
+    def __init__(self, offset, value, key=None):
+        self.offset = offset
+        self.value = value
+        self.key = key
+
+def test_cancelled_handler_is_not_committed():
+    tp = TopicPartition("user_events", 0)
+    tracker = kafka_utils.OffsetTracker()
+
+    async def handler(event):
+        if event["n"] == 1:
+            await asyncio.Event().wait()
+
+    async def scenario():
+        runtime = AsyncConsumerRuntime(handler)
+        runtime._slots = asyncio.Semaphore(2)
+        for n in range(2):
+            await runtime._slots.acquire()
+            tracker.add(tp, n)
+            runtime._dispatch(tracker, tp, Record(n, {"n": n}, key=str(n).encode()))
+        await asyncio.sleep(0.01)
+
+        # Shutdown cancels the handler that is still running
+        tasks = list(runtime._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.wait(tasks)
+
+    asyncio.run(scenario())
+    assert {tp: meta.offset for tp, meta in tracker.take_committable().items()} == {tp: 1}
@@ -0,0 +1,90 @@
+"""
+AsyncPublisher's background thread and spill replay.
+"""
+
+import json
+import time
+
+import pytest
+
+import kafka_utils
+
+class FakeFuture:
+    def add_callback(self, callback, *args):
+        pass
+
+    def add_errback(self, errback, *args):
+        pass
+
+class FakeProducer:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, topic, value=None, key=None):
+        self.sent.append((topic, value))
+        return FakeFuture()
+
+@pytest.fixture
+def producer(monkeypatch):
+    fake = FakeProducer()
+    monkeypatch.setattr(kafka_utils, "get_producer", lambda: fake)
+    return fake
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+def test_bad_spill_lines_are_set_aside(producer, tmp_path):
+    spill_path = str(tmp_path / "spill.jsonl")
+    publisher = kafka_utils.AsyncPublisher(policy="spill", spill_path=spill_path)
+    publisher.close()
+
+    with open(spill_path, "w") as f:
+        f.write(json.dumps({"topic": "users", "key": "1", "message": {"n": 1}}) + "\n")
+        f.write("[1, 2]\n")
+        f.write(json.dumps({"topic": "users", "key": "2", "message": {"n": 2}}) + "\n")
+        f.write('{"topic": "us')
+    publisher._replay_spill()
+
+    assert producer.sent == [("users", {"n": 1}), ("users", {"n": 2})]
+    assert publisher.stats()["replayed"] == 2
+    with open(f"{spill_path}.bad") as f:
+        assert f.read() == '[1, 2]\n{"topic": "us\n'
+    assert not (tmp_path / "spill.jsonl.replay").exists()
+
+def test_thread_survives_errors(producer, monkeypatch, tmp_path):
+    publisher = kafka_utils.AsyncPublisher(spill_path=str(tmp_path / "spill.jsonl"))
+    deliver = publisher._deliver
+    calls = []
+
+    def flaky_deliver(*item):
+        calls.append(item)
+        if len(calls) == 1:
+            raise RuntimeError("boom")
+        deliver(*item)
+
+    monkeypatch.setattr(publisher, "_deliver", flaky_deliver)
+    publisher.publish("users", {"n": 1})
+    publisher.publish("users", {"n": 2})
+    wait_for(lambda: producer.sent)
+    publisher.close()
+
+    assert producer.sent == [("users", {"n": 2})]
+
+def test_forked_process_gets_its_own_publisher(producer, monkeypatch):
+    try:
+        parent = kafka_utils.get_async_publisher()
+        # As seen from a forked child, where the parent's sender thread does not exist
+        monkeypatch.setattr(kafka_utils, "_async_publisher_pid", -1)
+        assert kafka_utils.publisher_stats() is None
+        child = kafka_utils.get_async_publisher()
+        assert child is not parent
+
+        child.publish("users", {"n": 1})
+        wait_for(lambda: producer.sent)
+        assert producer.sent == [("users", {"n": 1})]
+    finally:
+        parent.close()
+        kafka_utils.close_producer()
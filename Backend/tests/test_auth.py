@@ -0,0 +1,19 @@
+"""
+Password hashing across the worker processes.
+"""
+
+import asyncio
+
+import bcrypt
+
+import auth
+
+def test_hash_passwords_in_spawned_pool():
+    try:
+        hashed = asyncio.run(auth.hash_passwords_in_pool(["first", "second", "third"]))
+        assert auth._hash_pool._mp_context.get_start_method() == "spawn"
+    finally:
+        auth.shutdown_hash_pool()
+
+    assert [bcrypt.checkpw(password.encode("utf-8"), value.encode("utf-8"))
+            for password, value in zip(["first", "second", "third"], hashed)] == [True, True, True]
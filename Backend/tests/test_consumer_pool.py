@@ -0,0 +1,49 @@
+"""
+Process lanes of the keyed worker pool.
+"""
+
+import pytest
+from kafka import TopicPartition
+
+import kafka_utils
+from consumer_pool import KeyedWorkerPool
+
+class Record:
+    def __init__(self, offset, value, key=None, partition=0):
+        self.offset = offset
+        self.value = value
+        self.key = key
+        self.partition = partition
+
+class FakeConsumer:
+    """Returns the given records on the first poll, then stops the pool."""
+
+    def __init__(self, records, pool):
+        self.tp = TopicPartition("user_events", 0)
+        self.records = records
+        self.pool = pool
+        self.committed = []
+
+    def poll(self, timeout_ms=None, max_records=None):
+        records, self.records = self.records, []
+        if not records:
+            self.pool.stop()
+            return {}
+        return {self.tp: records}
+
+    def commit(self, offsets=None):
+        self.committed.append({tp: meta.offset for tp, meta in offsets.items()})
+
+def double(event):
+    return event["n"] * 2
+
+def test_process_lanes_handle_and_commit():
+    pool = KeyedWorkerPool(double, concurrency=2, worker_type="process")
+    consumer = FakeConsumer([Record(n, {"n": n}, key=str(n).encode()) for n in range(4)], pool)
+    pool.run(consumer, kafka_utils.OffsetTracker())
+    assert consumer.committed[-1] == {consumer.tp: 4}
+    assert all(lane._mp_context.get_start_method() == "spawn" for lane in pool._lanes)
+
+def test_process_lanes_reject_unpicklable_handler():
+    with pytest.raises(ValueError, match="picklable"):
+        KeyedWorkerPool(lambda event: None, worker_type="process")
@@ -0,0 +1,96 @@
+"""
+Failed events that cannot be routed must not have their offsets committed.
+"""
+
+import asyncio
+import threading
+
+import pytest
+from kafka import TopicPartition
+
+import dead_letters
+import kafka_utils
+from async_consumer import AsyncConsumerRuntime
+from consumer_pool import KeyedWorkerPool
+
+class Record:
+    def __init__(self, offset, value, key=None, partition=0):
+        self.offset = offset
+        self.value = value
+        self.key = key
+        self.partition = partition
+
+class FakeConsumer:
+    """Returns the given records on the first poll and nothing after."""
+
+    def __init__(self, records):
+        self.tp = TopicPartition("user_events", 0)
+        self.records = records
+        self.committed = []
+
+    def poll(self, timeout_ms=None, max_records=None):
+        records, self.records = self.records, []
+        return {self.tp: records} if records else {}
+
+    def commit(self, offsets=None):
+        self.committed.append({tp: meta.offset for tp, meta in offsets.items()})
+
+@pytest.fixture
+def kafka_down(monkeypatch):
+    monkeypatch.setattr(kafka_utils, "send_message", lambda topic, message, key=None: False)
+
+def test_route_raises_when_send_fails(kafka_down):
+    router = dead_letters.FailureRouter("user_events")
+    with pytest.raises(dead_letters.RoutingError):
+        router.route({"event_type": "user_created"}, ValueError("boom"))
+
+def test_worker_pool_does_not_commit_unrouted_record(kafka_down):
+    router = dead_letters.FailureRouter("user_events")
+
+    def handler(event):
+        if event["n"] == 1:
+            router.route(event, ValueError("boom"))
+
+    consumer = FakeConsumer([Record(0, {"n": 0}), Record(1, {"n": 1}, key=b"1"), Record(2, {"n": 2})])
+    with pytest.raises(dead_letters.RoutingError):
+        KeyedWorkerPool(handler, concurrency=2).run(consumer, kafka_utils.OffsetTracker())
+    # Offset 1 is consumed again after the restart
+    assert consumer.committed == [{consumer.tp: 1}]
+
+def test_async_runtime_does_not_commit_unrouted_record(kafka_down):
+    router = dead_letters.FailureRouter("user_events")
+
+    async def handler(event):
+        if event["n"] == 1:
+            router.route(event, ValueError("boom"))
+
+    consumer = FakeConsumer([Record(0, {"n": 0}), Record(1, {"n": 1}, key=b"1"), Record(2, {"n": 2})])
+    with pytest.raises(dead_letters.RoutingError):
+        asyncio.run(AsyncConsumerRuntime(handler).run(consumer, kafka_utils.OffsetTracker()))
+    assert consumer.committed == [{consumer.tp: 1}]
+
+def test_retry_worker_restarts_after_error(kafka_down, monkeypatch):
+    monkeypatch.setattr(dead_letters, "RETRY_RESTART_DELAY", 0)
+    router = dead_letters.FailureRouter("user_events")
+    handled = threading.Event()
+    stop = threading.Event()
+    calls = []
+
+    def consume_messages(topic, group_id, manual_commit=False):
+        calls.append(topic)
+        yield {"event_type": "user_created", "n": len(calls)}
+        stop.wait()
+
+    def handler(event):
+        # The first event cannot be routed while Kafka is down
+        if event["n"] == 1:
+            raise ValueError("boom")
+        handled.set()
+
+    monkeypatch.setattr(kafka_utils, "consume_messages", consume_messages)
+    dead_letters.RetryWorker("user_events.retry.5s", "group", handler, router).start()
+    try:
+        assert handled.wait(5)
+        assert calls == ["user_events.retry.5s", "user_events.retry.5s"]
+    finally:
+        stop.set()
@@ -0,0 +1,24 @@
+"""
+Batch mode of the user events consumer.
+"""
+
+import user_events_consumer
+
+def test_batch_without_batch_handler_retries_only_failed_events(monkeypatch):
+    handled = []
+    routed = []
+
+    def handle(event_data):
+        if event_data["user_id"] == 2:
+            raise ValueError("boom")
+        handled.append(event_data["user_id"])
+
+    monkeypatch.setitem(user_events_consumer.EVENT_HANDLERS, "user_details_created", handle)
+    monkeypatch.setattr(user_events_consumer.failure_router, "route",
+                        lambda event_data, error, key=None: routed.append((event_data["user_id"], key)))
+
+    user_events_consumer.process_batch([
+        {"event_type": "user_details_created", "user_id": user_id} for user_id in (1, 2, 3)
+    ])
+    assert handled == [1, 3]
+    assert routed == [(2, "2")]
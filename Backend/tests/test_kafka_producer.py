@@ -0,0 +1,37 @@
+"""
+When the shared Kafka producer is rebuilt.
+"""
+
+from kafka.errors import KafkaConnectionError, KafkaTimeoutError, NoBrokersAvailable
+
+import kafka_utils
+
+class FakeProducer:
+    def __init__(self, connected=True):
+        self.connected = connected
+        self.closed_with = None
+
+    def bootstrap_connected(self):
+        return self.connected
+
+    def close(self, timeout=None):
+        self.closed_with = timeout
+
+def test_timeout_on_connected_producer_keeps_it(monkeypatch):
+    manager = kafka_utils.ProducerManager(factory=FakeProducer)
+    monkeypatch.setattr(kafka_utils, "producer_manager", manager)
+    manager.get()
+    assert not kafka_utils._is_connection_error(KafkaTimeoutError("slow broker"))
+
+def test_timeout_on_disconnected_producer_resets_it(monkeypatch):
+    manager = kafka_utils.ProducerManager(factory=lambda: FakeProducer(connected=False))
+    monkeypatch.setattr(kafka_utils, "producer_manager", manager)
+    producer = manager.get()
+    assert kafka_utils._is_connection_error(KafkaTimeoutError("no route"))
+    assert kafka_utils._is_connection_error(NoBrokersAvailable())
+    assert kafka_utils._is_connection_error(KafkaConnectionError())
+
+    manager.reset(producer)
+    # In-flight sends of other requests get a grace period
+    assert producer.closed_with == kafka_utils.RESET_CLOSE_TIMEOUT
+    assert manager.get() is not producer
@@ -0,0 +1,32 @@
+"""
+Batch publishing limits.
+"""
+
+import json
+
+from routes import kafka_routes
+
+def ndjson(count):
+    return "".join(json.dumps({"key": str(n), "value": {"n": n}}) + "\n" for n in range(count))
+
+def test_ndjson_batch_over_limit_stops_reading(client, monkeypatch):
+    monkeypatch.setattr(kafka_routes, "MAX_BATCH_MESSAGES", 2)
+    parse_line = kafka_routes._parse_line
+    parsed = []
+
+    def counting_parse_line(line):
+        parsed.append(line)
+        return parse_line(line)
+
+    monkeypatch.setattr(kafka_routes, "_parse_line", counting_parse_line)
+    response = client.post("/kafka/publish/user_events/batch", content=ndjson(5),
+                           headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 413
+    # Rejected at the first message over the limit
+    assert len(parsed) == 3
+
+def test_json_batch_over_limit(client, monkeypatch):
+    monkeypatch.setattr(kafka_routes, "MAX_BATCH_MESSAGES", 2)
+    response = client.post("/kafka/publish/user_events/batch",
+                           json=[{"value": {"n": n}} for n in range(3)])
+    assert response.status_code == 413
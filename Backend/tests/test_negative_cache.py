@@ -0,0 +1,34 @@
+"""
+Cached misses (the MISSING sentinel) must never be served as values.
+"""
+
+from conftest import assert_queries, create_user
+from utils import cache
+
+def test_batch_skips_cached_miss(client):
+    user = create_user(client)
+
+    # Caches MISSING under users:998
+    assert client.get("/users/998").status_code == 404
+
+    response = client.get(f"/users/batch?ids={user['id']},998")
+    assert response.status_code == 200
+    assert [found["id"] for found in response.json()] == [user["id"]]
+    assert_queries(response, 1)
+
+    # The cached miss still counts as known, so only the user is fetched again
+    cache.cache_delete(f"users:{user['id']}")
+    response = client.get(f"/users/batch?ids=998,{user['id']}")
+    assert [found["id"] for found in response.json()] == [user["id"]]
+
+def test_sync_get_many_or_compute_skips_cached_miss(redis_server):
+    cache.cache_set("users:998", cache.MISSING, 30)
+    computed = []
+
+    def compute_missing(keys):
+        computed.extend(keys)
+        return {key: {"id": 1} for key in keys}
+
+    found = cache.get_many_or_compute(["users:1", "users:998"], compute_missing, 300)
+    assert found == {"users:1": {"id": 1}}
+    assert computed == ["users:1"]
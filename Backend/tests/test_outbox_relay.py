@@ -0,0 +1,121 @@
+"""
+Outbox relay batches: key order, retries and leases.
+
+Kafka is replaced by a producer that rejects sends to chosen topics, or
+fails their delivery.
+"""
+
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+import kafka_utils
+import outbox_relay
+from database import Base, SessionLocal, engine
+from models.outbox import OutboxEvent
+
+class FakeFuture:
+    def __init__(self, error=None):
+        self.error = error
+
+    def get(self, timeout=None):
+        if self.error is not None:
+            raise self.error
+
+class FakeProducer:
+    def __init__(self):
+        self.sent = []
+        self.rejected_topics = set()
+        self.undelivered_topics = set()
+
+    def send(self, topic, value=None, key=None):
+        if topic in self.rejected_topics:
+            raise RuntimeError("buffer full")
+        self.sent.append((topic, key.decode("utf-8") if key else None, value))
+        if topic in self.undelivered_topics:
+            return FakeFuture(RuntimeError("broker unavailable"))
+        return FakeFuture()
+
+    def flush(self, timeout=None):
+        pass
+
+@pytest.fixture
+def producer(monkeypatch):
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    fake = FakeProducer()
+    monkeypatch.setattr(kafka_utils, "get_producer", lambda: fake)
+    return fake
+
+def add_events(*events):
+    db = SessionLocal()
+    for topic, key, number in events:
+        outbox_relay.enqueue_event(db, topic, {"n": number}, key=key)
+    db.commit()
+    db.close()
+
+def pending():
+    db = SessionLocal()
+    try:
+        return db.query(OutboxEvent).order_by(OutboxEvent.id).all()
+    finally:
+        db.close()
+
+def test_publishes_and_deletes(producer):
+    add_events(("users", "1", 1), ("users", "2", 2), ("users", None, 3))
+    assert outbox_relay.OutboxRelay().drain_once() == 3
+    assert [value["n"] for _, _, value in producer.sent] == [1, 2, 3]
+    assert pending() == []
+
+def test_failure_holds_back_later_events_for_key(producer):
+    producer.rejected_topics.add("bad")
+    add_events(("bad", "1", 1), ("users", "1", 2), ("users", "2", 3))
+    relay = outbox_relay.OutboxRelay()
+
+    assert relay.drain_once() == 1
+    assert [key for _, key, _ in producer.sent] == ["2"]
+    failed, held = pending()
+    assert failed.attempts == 1 and failed.claimed_by is None
+    assert failed.next_attempt_at > datetime.utcnow()
+    assert held.attempts == 0 and held.claimed_by is None
+
+    # Held back until the failed event is retried
+    assert relay.drain_once() == 0
+
+def test_delivery_failure_retries_later_events_for_key(producer):
+    producer.undelivered_topics.add("bad")
+    add_events(("bad", "1", 1), ("users", "1", 2), ("users", "2", 3))
+
+    assert outbox_relay.OutboxRelay().drain_once() == 1
+    # Event 2 went out after a failed event, so it is sent again after it
+    assert [event.attempts for event in pending()] == [1, 1]
+
+def test_blocked_events_do_not_starve_later_keys(producer):
+    producer.rejected_topics.add("bad")
+    add_events(("bad", "1", 1), ("users", "1", 2), ("users", "1", 3), ("users", "2", 4))
+    relay = outbox_relay.OutboxRelay(batch_size=2)
+    relay.drain_once()
+
+    # Key 1 is waiting for its retry, so the batch is filled from other keys
+    assert relay.drain_once() == 1
+    assert [value["n"] for _, _, value in producer.sent] == [4]
+
+def test_leased_events_are_skipped(producer):
+    add_events(("users", "1", 1), ("users", "1", 2), ("users", "2", 3))
+    db = SessionLocal()
+    first = db.query(OutboxEvent).order_by(OutboxEvent.id).first()
+    first.claimed_by = "other-relay"
+    first.next_attempt_at = datetime.utcnow() + timedelta(seconds=60)
+    db.commit()
+    db.close()
+
+    assert outbox_relay.OutboxRelay().drain_once() == 1
+    assert [key for _, key, _ in producer.sent] == ["2"]
+    # The other relay settles its own event; it is not deleted under it
+    assert [event.claimed_by for event in pending()] == ["other-relay", None]
+
+def test_payload_is_sent_as_json(producer):
+    add_events(("users", "1", 1))
+    outbox_relay.OutboxRelay().drain_once()
+    assert json.dumps(producer.sent[0][2]) == '{"n": 1}'
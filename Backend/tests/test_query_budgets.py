@@ -0,0 +1,101 @@
+"""
+Query budgets of the user, user details and login routes.
+
+DB_QUERY_BUDGET_MODE=raise makes the middleware raise QueryBudgetExceeded
+for a request over its route's @query_budget, which fails the request in
+TestClient. assert_queries also holds each response to the expected count.
+"""
+
+import pytest
+
+from conftest import assert_queries, create_details, create_user
+from utils.request_context import QueryBudgetExceeded
+
+def test_create_user(client):
+    response = client.post("/users/", json={"email": "user@example.com", "password": "secret"})
+    assert response.status_code == 201
+    # Email check, user insert and outbox insert
+    assert_queries(response, 3)
+
+    response = client.post("/users/", json={"email": "user@example.com", "password": "other"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Email already registered"
+    assert_queries(response, 1)
+
+def test_read_user_loads_details_in_one_query(client):
+    user = create_user(client)
+    create_details(client, user["id"])
+
+    response = client.get(f"/users/{user['id']}")
+    assert response.status_code == 200
+    assert response.json()["details"]["phone"] == "555-0100"
+    assert_queries(response, 1)
+
+    # Served from the cache the second time
+    assert_queries(client.get(f"/users/{user['id']}"), 0)
+
+def test_read_unknown_user(client):
+    response = client.get("/users/998")
+    assert response.status_code == 404
+    assert_queries(response, 1)
+
+def test_login_runs_one_query(client):
+    user = create_user(client, password="secret")
+    create_details(client, user["id"])
+
+    response = client.post("/login/", json={"email": user["email"], "password": "secret"})
+    assert response.status_code == 200
+    assert response.json()["details"]["email"] == "details@example.com"
+    assert_queries(response, 1)
+
+    response = client.post("/login/", json={"email": user["email"], "password": "wrong"})
+    assert response.status_code == 401
+    assert_queries(response, 1)
+
+def test_create_user_detail(client):
+    user = create_user(client)
+
+    response = create_details(client, user["id"])
+    assert response.status_code == 200
+    assert response.json()["user_id"] == user["id"]
+    # Conflict check, detail insert and outbox insert
+    assert_queries(response, 3)
+
+@pytest.mark.parametrize("details, error", [
+    ({}, "User details already exist"),
+    ({"email": "details@example.com", "phone": "555-0199"}, "Email already registered"),
+    ({"email": "other@example.com", "phone": "555-0100"}, "Phone number already registered"),
+])
+def test_create_user_detail_conflicts(client, details, error):
+    first = create_user(client, email="first@example.com")
+    create_details(client, first["id"])
+    target = first if not details else create_user(client, email="second@example.com")
+
+    response = create_details(client, target["id"], **details)
+    assert response.status_code == 400
+    assert response.json()["detail"] == error
+    assert_queries(response, 1)
+
+def test_create_user_detail_unknown_user(client):
+    response = create_details(client, 998)
+    assert response.status_code == 404
+    assert_queries(response, 1)
+
+def test_read_users_batch(client):
+    first = create_user(client, email="first@example.com")
+    second = create_user(client, email="second@example.com")
+    create_details(client, first["id"])
+
+    response = client.get(f"/users/batch?ids={first['id']},{second['id']},998")
+    assert response.status_code == 200
+    assert [user["id"] for user in response.json()] == [first["id"], second["id"]]
+    assert response.json()[0]["details"] is not None
+    assert_queries(response, 1)
+
+def test_budget_is_enforced(client, monkeypatch):
+    from routes import user_routes
+
+    user = create_user(client)
+    monkeypatch.setattr(user_routes.read_user, "query_budget", 0)
+    with pytest.raises(QueryBudgetExceeded):
+        client.get(f"/users/{user['id']}")
@@ -0,0 +1,57 @@
+"""
+Circuit breaker of the sync and async Redis clients.
+"""
+
+import asyncio
+
+import fakeredis
+import pytest
+import redis
+import redis.asyncio
+
+from utils import cache, async_cache
+
+def test_pool_exhaustion_keeps_breaker_closed():
+    pool = redis.BlockingConnectionPool(connection_class=fakeredis.FakeRedisConnection, server=fakeredis.FakeServer(),
+                                        max_connections=1, timeout=0.05)
+    breaker = cache.ResilientRedis(pool, failure_threshold=2)
+    # Hold the only connection, so every command times out waiting for one
+    held = pool.get_connection()
+    try:
+        for _ in range(breaker.failure_threshold + 1):
+            with pytest.raises(redis.exceptions.ConnectionError, match="No connection available"):
+                breaker.get("key")
+        assert breaker.available
+    finally:
+        pool.release(held)
+
+    breaker.set("key", "value")
+    assert breaker.get("key") == b"value"
+
+def test_async_pool_exhaustion_keeps_breaker_closed(monkeypatch):
+    breaker = cache.ResilientRedis(redis.BlockingConnectionPool(), failure_threshold=2)
+    monkeypatch.setattr(cache, "redis_client", breaker)
+
+    async def exhaust():
+        pool = redis.asyncio.BlockingConnectionPool(connection_class=fakeredis.FakeAsyncRedisConnection,
+                                                    server=fakeredis.FakeServer(), max_connections=1, timeout=0.05)
+        client = redis.asyncio.Redis(connection_pool=pool)
+        monkeypatch.setattr(async_cache, "get_async_client", lambda: client)
+        held = await pool.get_connection()
+        try:
+            for _ in range(breaker.failure_threshold + 1):
+                with pytest.raises(redis.exceptions.ConnectionError, match="No connection available"):
+                    await async_cache._call("get", "key")
+        finally:
+            await pool.release(held)
+
+    asyncio.run(exhaust())
+    assert breaker.available
+
+def test_connection_errors_open_breaker():
+    breaker = cache.ResilientRedis(redis.BlockingConnectionPool(), failure_threshold=2)
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure(redis.exceptions.ConnectionError("Connection refused"))
+    assert not breaker.available
+    with pytest.raises(cache.CacheUnavailableError):
+        breaker.get("key")
@@ -0,0 +1,114 @@
+"""
+Bulk user import from CSV and NDJSON uploads.
+"""
+
+import json
+
+import pytest
+
+from conftest import create_user
+from routes import user_routes
+from utils import streaming
+
+@pytest.fixture(autouse=True)
+def plain_hashing(monkeypatch):
+    """Hash in-process with the tests' stand-in for bcrypt instead of the worker processes."""
+    async def hash_passwords_in_pool(passwords):
+        return [f"plain:{password}" for password in passwords]
+
+    monkeypatch.setattr(user_routes, "hash_passwords_in_pool", hash_passwords_in_pool)
+
+def import_csv(client, body):
+    return client.post("/users/import", content=body, headers={"Content-Type": "text/csv"})
+
+def import_ndjson(client, rows):
+    body = "".join((row if isinstance(row, str) else json.dumps(row)) + "\n" for row in rows)
+    return client.post("/users/import", content=body, headers={"Content-Type": "application/x-ndjson"})
+
+def test_import_csv(client):
+    response = import_csv(client, "\ufeffEmail,Password\na@example.com,secret\nb@example.com,secret\n")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["status"] == "success" and body["imported"] == 2 and not body["truncated"]
+    assert [user["email"] for user in body["users"]] == ["a@example.com", "b@example.com"]
+
+    # The imported users can log in and are readable
+    login = client.post("/login/", json={"email": "a@example.com", "password": "secret"})
+    assert login.status_code == 200
+    assert client.get(f"/users/{body['users'][1]['id']}").json()["email"] == "b@example.com"
+
+def test_import_csv_rejects_bad_rows(client):
+    response = import_csv(client, "email,password\na@example.com,secret\nb@example.com\na@example.com,other\n")
+    body = response.json()
+    assert body["status"] == "partial" and body["imported"] == 1
+    assert [(error["row"], error["status"]) for error in body["errors"]] == [(2, "invalid"), (3, "conflict")]
+    assert body["errors"][1]["error"] == "Duplicate email in import"
+
+def test_import_csv_needs_header(client):
+    response = import_csv(client, "email,name\na@example.com,A\n")
+    assert response.status_code == 400
+
+def test_import_ndjson(client):
+    response = import_ndjson(client, [
+        {"email": "a@example.com", "password": "secret"},
+        "{not json",
+        {"email": "b@example.com"},
+        {"email": "c@example.com", "password": "secret"},
+    ])
+    body = response.json()
+    assert body["imported"] == 2
+    assert [user["row"] for user in body["users"]] == [1, 4]
+    assert [(error["row"], error["status"]) for error in body["errors"]] == [(2, "invalid"), (3, "invalid")]
+
+def test_import_reports_existing_emails(client):
+    create_user(client, email="taken@example.com")
+    response = import_ndjson(client, [
+        {"email": "taken@example.com", "password": "secret"},
+        {"email": "new@example.com", "password": "secret"},
+    ])
+    body = response.json()
+    assert body["status"] == "partial"
+    assert [user["email"] for user in body["users"]] == ["new@example.com"]
+    assert body["errors"] == [{"row": 1, "email": "taken@example.com", "status": "conflict",
+                               "error": "Email already registered"}]
+
+def test_import_retries_after_concurrent_insert(client, monkeypatch):
+    create_user(client, email="raced@example.com")
+    registered_emails = user_routes._registered_emails
+    calls = []
+
+    async def racing_registered_emails(db, emails):
+        # The first check runs before the other request commits
+        calls.append(emails)
+        return set() if len(calls) == 1 else await registered_emails(db, emails)
+
+    monkeypatch.setattr(user_routes, "_registered_emails", racing_registered_emails)
+    response = import_ndjson(client, [
+        {"email": "raced@example.com", "password": "secret"},
+        {"email": "new@example.com", "password": "secret"},
+    ])
+    body = response.json()
+    assert len(calls) == 2
+    assert [user["email"] for user in body["users"]] == ["new@example.com"]
+    assert [error["email"] for error in body["errors"]] == ["raced@example.com"]
+
+def test_import_in_chunks_and_truncates(client, monkeypatch):
+    monkeypatch.setattr(user_routes, "IMPORT_CHUNK_SIZE", 2)
+    monkeypatch.setattr(user_routes, "IMPORT_MAX_ROWS", 3)
+    response = import_ndjson(client, [{"email": f"user{n}@example.com", "password": "secret"} for n in range(5)])
+    body = response.json()
+    assert body["status"] == "partial" and body["truncated"]
+    assert [user["row"] for user in body["users"]] == [1, 2, 3]
+
+def test_import_rejects_unknown_content_type(client):
+    response = client.post("/users/import", json=[{"email": "a@example.com", "password": "secret"}])
+    assert response.status_code == 415
+
+def test_overlong_line_is_rejected(client, monkeypatch):
+    monkeypatch.setattr(streaming, "MAX_LINE_BYTES", 64)
+    response = import_ndjson(client, [{"email": "a" * 100 + "@example.com", "password": "secret"}])
+    assert response.status_code == 413
+
+    response = client.post("/kafka/publish/user_events/batch", content=json.dumps({"value": {"n": "x" * 100}}),
+                           headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 413
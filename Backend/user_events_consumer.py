@@ -8,11 +8,12 @@ It demonstrates how events would be processed by different services in a microse
 
 import os
 import time
+import asyncio
 import json
 import logging
+import itertools
 from datetime import datetime
 import sys
-import requests  # For sending events back to the API
 
 # Configure logging
 logging.basicConfig(
@@ -27,13 +28,22 @@ logger = logging.getLogger("user_events_consumer")
 
 # Import Kafka utilities
 import kafka_utils
+from consumer_pool import KeyedWorkerPool
+from async_consumer import AsyncConsumerRuntime
+from dead_letters import FailureRouter, start_retry_workers
 
 # Topic and consumer group
 USER_EVENTS_TOPIC = "user_events"
 CONSUMER_GROUP = "user-events-processor"
 
-# API endpoint to report processed events
-API_BASE_URL = os.environ.get("API_BASE_URL", "http://localhost:8000")
+# Consumer runtime: "pool" (worker threads/processes), "asyncio" or "batch"
+CONSUMER_MODE = os.environ.get("CONSUMER_MODE", "pool")
+
+# Largest batch handed to batch handlers in "batch" mode
+BATCH_MAX_RECORDS = int(os.environ.get("CONSUMER_BATCH_MAX_RECORDS", 500))
+
+# Sends failed events to the retry topics and finally the DLQ
+failure_router = FailureRouter(USER_EVENTS_TOPIC)
 
 def handle_user_created(event_data):
     """
@@ -53,6 +63,32 @@ def handle_user_created(event_data):
     # Simulate processing time
     time.sleep(0.5)
     
+    complete_user_created(event_data)
+    
+    # Report the processed event
+    report_processed_event(event_data)
+
+async def handle_user_created_async(event_data):
+    """Asyncio version of handle_user_created."""
+    logger.info(f"Processing user_created event for user {event_data.get('user_id')} ({event_data.get('email')}) from {event_data.get('timestamp')}")
+    
+    # Simulate processing time without blocking the event loop
+    await asyncio.sleep(0.5)
+    
+    complete_user_created(event_data)
+    
+    # Report the processed event
+    report_processed_event(event_data)
+
+def complete_user_created(event_data, audit_log=True):
+    """
+    Run the (simulated) user_created side effects and record the result on the event.
+    
+    Batch handlers pass audit_log=False and write the audit records in bulk.
+    """
+    user_id = event_data.get("user_id")
+    email = event_data.get("email")
+    
     # Example: Send welcome email (simulated)
     logger.info(f"📧 Welcome email sent to {email}")
     
@@ -60,7 +96,8 @@ def handle_user_created(event_data):
     logger.info(f"📊 Analytics profile created for user {user_id}")
     
     # Example: Log audit record (simulated)
-    logger.info(f"📝 Audit log entry created for new user {user_id}")
+    if audit_log:
+        logger.info(f"📝 Audit log entry created for new user {user_id}")
     
     # Add processing result to the event data
     event_data["processing_result"] = {
@@ -69,9 +106,6 @@ def handle_user_created(event_data):
         "audit_log_created": True,
         "processed_at": datetime.now().isoformat()
     }
-    
-    # Report the processed event
-    report_processed_event(event_data)
 
 def handle_user_details_created(event_data):
     """
@@ -92,6 +126,29 @@ def handle_user_details_created(event_data):
     # Simulate processing time
     time.sleep(0.5)
     
+    complete_user_details_created(event_data)
+    
+    # Report the processed event
+    report_processed_event(event_data)
+
+async def handle_user_details_created_async(event_data):
+    """Asyncio version of handle_user_details_created."""
+    logger.info(f"Processing user_details_created event for user {event_data.get('user_id')} ({event_data.get('name')})")
+    
+    # Simulate processing time without blocking the event loop
+    await asyncio.sleep(0.5)
+    
+    complete_user_details_created(event_data)
+    
+    # Report the processed event
+    report_processed_event(event_data)
+
+def complete_user_details_created(event_data):
+    """Run the (simulated) user_details_created side effects and record the result on the event."""
+    user_id = event_data.get("user_id")
+    name = event_data.get("name")
+    email = event_data.get("email")
+    
     # Example: Update user profile in CRM (simulated)
     logger.info(f"👤 CRM profile updated for {name} (ID: {user_id})")
     
@@ -104,66 +161,164 @@ def handle_user_details_created(event_data):
         "notification_sent": True,
         "processed_at": datetime.now().isoformat()
     }
+
+def handle_user_created_batch(events):
+    """
+    Handle a batch of user_created events
     
-    # Report the processed event
-    report_processed_event(event_data)
+    The audit records for the whole batch are written with one bulk insert
+    instead of one insert per user.
+    """
+    logger.info(f"Processing {len(events)} user_created events")
+    
+    # Simulate processing time, paid once per batch
+    time.sleep(0.5)
+    
+    for event_data in events:
+        complete_user_created(event_data, audit_log=False)
+    
+    # Example: Bulk insert of audit records (simulated)
+    logger.info(f"📝 Audit log entries created for {len(events)} new users in one insert")
+    
+    # Report the processed events
+    report_processed_events(events)
+
+def build_processed_event(event_data):
+    """Create a new event to show processing result"""
+    return {
+        "event_type": f"{event_data['event_type']}_processed",
+        "original_event": event_data["event_type"],
+        "user_id": event_data.get("user_id"),
+        "email": event_data.get("email"),
+        "name": event_data.get("name", ""),
+        "processing_result": event_data.get("processing_result", {}),
+        "timestamp": datetime.now().isoformat()
+    }
 
 def report_processed_event(event_data):
-    """Report the processed event back to the API for frontend display"""
+    """
+    Publish the processed event to Kafka for frontend display.
+    
+    Uses the consumer's own long-lived producer and does not wait for the
+    broker, so it is safe to call from async handlers too.
+    """
     try:
-        # Create a new event to show processing result
-        processed_event = {
-            "event_type": f"{event_data['event_type']}_processed",
-            "original_event": event_data["event_type"],
-            "user_id": event_data.get("user_id"),
-            "email": event_data.get("email"),
-            "name": event_data.get("name", ""),
-            "processing_result": event_data.get("processing_result", {}),
-            "timestamp": datetime.now().isoformat()
-        }
-        
-        # Try to send the processed event to the API
-        try:
-            response = requests.post(
-                f"{API_BASE_URL}/kafka/publish/{USER_EVENTS_TOPIC}",
-                json=processed_event,
-                timeout=3
-            )
-            if response.status_code == 200:
-                logger.info(f"Reported processed event to API: {processed_event['event_type']}")
-            else:
-                logger.warning(f"Failed to report processed event: {response.status_code} {response.text}")
-        except Exception as e:
-            logger.error(f"Error reporting processed event to API: {e}")
-            
-            # Fallback: Send directly to Kafka
-            try:
-                kafka_utils.send_message(
-                    topic=USER_EVENTS_TOPIC,
-                    message=processed_event
-                )
-                logger.info(f"Sent processed event directly to Kafka: {processed_event['event_type']}")
-            except Exception as kafka_err:
-                logger.error(f"Error sending processed event to Kafka: {kafka_err}")
+        processed_event = build_processed_event(event_data)
+        kafka_utils.publish_async(
+            topic=USER_EVENTS_TOPIC,
+            message=processed_event,
+            key=event_key(event_data),
+            on_error=lambda e: logger.error(f"Error sending processed event to Kafka: {e}")
+        )
+        logger.info(f"Reported processed event to Kafka: {processed_event['event_type']}")
     except Exception as e:
         logger.error(f"Error preparing processed event: {e}")
 
+def report_processed_events(events):
+    """Publish several processed events; the producer batches them into few requests"""
+    for event_data in events:
+        report_processed_event(event_data)
+
+# Handlers by event type. Batch handlers take a list of events of one type;
+# types without one fall back to their per-event handler.
+EVENT_HANDLERS = {
+    "user_created": handle_user_created,
+    "user_details_created": handle_user_details_created,
+}
+BATCH_HANDLERS = {
+    "user_created": handle_user_created_batch,
+}
+
 def process_event(event_data):
     """Process an event based on its type"""
     event_type = event_data.get("event_type")
+    handler = EVENT_HANDLERS.get(event_type)
+    
+    if handler:
+        handler(event_data)
+    else:
+        logger.warning(f"Unknown event type: {event_type}")
+
+def process_batch(events):
+    """
+    Process a polled batch of events, handing runs of the same type to its batch handler.
+    
+    Runs are consecutive, so events keep their relative order across types.
+    """
+    # Skip already processed events (to avoid loops)
+    events = [event_data for event_data in events if not event_data.get("event_type", "").endswith("_processed")]
+    logger.debug(f"Processing batch of {len(events)} events")
+    
+    for event_type, run in itertools.groupby(events, key=lambda event_data: event_data.get("event_type")):
+        run = list(run)
+        batch_handler = BATCH_HANDLERS.get(event_type)
+        if not batch_handler:
+            # Only the events that failed are retried; the rest were handled
+            for event_data in run:
+                try:
+                    process_event(event_data)
+                except Exception as e:
+                    failure_router.route(event_data, e, key=event_key(event_data))
+            continue
+        
+        try:
+            batch_handler(run)
+        except Exception as e:
+            logger.error(f"Error processing batch of {len(run)} {event_type} events: {e}")
+            # Retry the events one by one from the retry topics
+            for event_data in run:
+                failure_router.route(event_data, e, key=event_key(event_data))
+
+def event_key(event_data):
+    """Partition key of a user event"""
+    user_id = event_data.get("user_id")
+    return str(user_id) if user_id is not None else None
+
+def handle_event(event_data):
+    """Process one consumed event. Runs on a worker lane."""
+    logger.info(f"Received event: {json.dumps(event_data)[:100]}...")
+    
+    # Skip already processed events (to avoid loops)
+    if event_data.get("event_type", "").endswith("_processed"):
+        logger.info(f"Skipping already processed event: {event_data.get('event_type')}")
+        return
+    
+    try:
+        process_event(event_data)
+    except Exception as e:
+        # Retry later from a retry topic instead of stalling this partition
+        failure_router.route(event_data, e, key=event_key(event_data))
+
+async def process_event_async(event_data):
+    """Asyncio version of process_event"""
+    event_type = event_data.get("event_type")
     
     if event_type == "user_created":
-        handle_user_created(event_data)
+        await handle_user_created_async(event_data)
     elif event_type == "user_details_created":
-        handle_user_details_created(event_data)
+        await handle_user_details_created_async(event_data)
     else:
         logger.warning(f"Unknown event type: {event_type}")
 
+async def handle_event_async(event_data):
+    """Asyncio version of handle_event"""
+    logger.info(f"Received event: {json.dumps(event_data)[:100]}...")
+    
+    # Skip already processed events (to avoid loops)
+    if event_data.get("event_type", "").endswith("_processed"):
+        logger.info(f"Skipping already processed event: {event_data.get('event_type')}")
+        return
+    
+    try:
+        await process_event_async(event_data)
+    except Exception as e:
+        # Retry later from a retry topic instead of stalling this partition
+        await asyncio.to_thread(failure_router.route, event_data, e, event_key(event_data))
+
 def main():
     """Main consumer loop"""
     logger.info(f"Starting user events consumer (group: {CONSUMER_GROUP})")
     logger.info(f"Listening for events on topic: {USER_EVENTS_TOPIC}")
-    logger.info(f"API base URL: {API_BASE_URL}")
     
     try:
         # Check if topic exists, create it if it doesn't
@@ -171,23 +326,32 @@ def main():
         if USER_EVENTS_TOPIC not in topics:
             logger.info(f"Topic {USER_EVENTS_TOPIC} doesn't exist. It will be created when the first message is sent.")
         
-        # Consume messages
-        for event_data in kafka_utils.consume_messages(USER_EVENTS_TOPIC, CONSUMER_GROUP):
-            try:
-                logger.info(f"Received event: {json.dumps(event_data)[:100]}...")
-                
-                # Skip already processed events (to avoid loops)
-                if event_data.get("event_type", "").endswith("_processed"):
-                    logger.info(f"Skipping already processed event: {event_data.get('event_type')}")
-                    continue
-                    
-                process_event(event_data)
-            except Exception as e:
-                logger.error(f"Error processing event: {e}")
+        # Failed events are handled again from the retry topics
+        start_retry_workers(USER_EVENTS_TOPIC, CONSUMER_GROUP, process_event, failure_router)
+        
+        if CONSUMER_MODE == "batch":
+            # Offsets of a batch are committed once process_batch returns
+            for events in kafka_utils.consume_batches(USER_EVENTS_TOPIC, CONSUMER_GROUP, max_records=BATCH_MAX_RECORDS):
+                process_batch(events)
+            return
+        
+        # Offsets are committed in batches once each event has been handled
+        tracker = kafka_utils.OffsetTracker()
+        consumer = kafka_utils.get_consumer(USER_EVENTS_TOPIC, CONSUMER_GROUP, offset_tracker=tracker)
+        try:
+            if CONSUMER_MODE == "asyncio":
+                asyncio.run(AsyncConsumerRuntime(handle_event_async).run(consumer, tracker))
+            else:
+                KeyedWorkerPool(handle_event).run(consumer, tracker)
+        finally:
+            consumer.close(autocommit=False)
     except KeyboardInterrupt:
         logger.info("Consumer shutting down...")
     except Exception as e:
         logger.error(f"Consumer error: {e}")
+    finally:
+        # Deliver processed events still waiting in the producer
+        kafka_utils.close_producer(timeout=10)
 
 if __name__ == "__main__":
     # Delay startup to ensure Kafka is ready
@@ -0,0 +1,400 @@
+"""
+Async Redis cache utilities.
+
+Async counterparts of the helpers in utils.cache, built on redis.asyncio so
+async route handlers never block the event loop on Redis. They share the
+codec, L1 cache, statistics and circuit breaker of utils.cache, so sync and
+async code read and write the same entries.
+"""
+
+import json
+import time
+import uuid
+import random
+import asyncio
+import logging
+
+import redis
+import redis.asyncio as aioredis
+
+from utils import cache, request_context
+from utils.cache import codec, cache_stats_counters, _unwrap, _should_refresh_early, _RELEASE_LOCK_SCRIPT
+
+logger = logging.getLogger(__name__)
+
+# Client for the running event loop; connections cannot be shared across loops
+_client = None
+_client_loop = None
+
+def get_async_client():
+    """Return the shared async Redis client, creating its pool on first use."""
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop:
+        pool = aioredis.BlockingConnectionPool(
+            host=cache.REDIS_HOST,
+            port=cache.REDIS_PORT,
+            db=cache.REDIS_DB,
+            password=cache.REDIS_PASSWORD,
+            max_connections=cache.REDIS_MAX_CONNECTIONS,
+            timeout=cache.REDIS_POOL_TIMEOUT,
+            socket_timeout=cache.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=cache.REDIS_SOCKET_TIMEOUT,
+            health_check_interval=cache.REDIS_HEALTH_CHECK_INTERVAL,
+            retry_on_timeout=True
+        )
+        _client = aioredis.Redis(connection_pool=pool)
+        _client_loop = loop
+    return _client
+
+async def close_async_cache():
+    """Close the shared async client and its connections."""
+    global _client, _client_loop
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+        _client_loop = None
+
+async def _guarded(run):
+    """Await run() through the circuit breaker shared with utils.cache."""
+    breaker = cache.redis_client
+    if not breaker.available:
+        raise cache.CacheUnavailableError("Redis is unavailable (circuit open)")
+    started = time.perf_counter()
+    try:
+        result = await run()
+    except (redis.exceptions.ConnectionError, redis.exceptions.TimeoutError) as e:
+        breaker.record_failure(e)
+        raise
+    finally:
+        request_context.record_redis(time.perf_counter() - started)
+    breaker.record_success()
+    return result
+
+async def _call(method, *args, **kwargs):
+    """Run a Redis command through the circuit breaker."""
+    return await _guarded(lambda: getattr(get_async_client(), method)(*args, **kwargs))
+
+async def _pipeline(fill):
+    """Run the commands queued by fill(pipe) in one round-trip, through the circuit breaker."""
+    async def execute():
+        pipe = get_async_client().pipeline(transaction=False)
+        fill(pipe)
+        return await pipe.execute()
+    return await _guarded(execute)
+
+async def publish_invalidation(key=None, pattern=None, keys=None):
+    """Async version of utils.cache.publish_invalidation."""
+    if cache.local_cache is None:
+        return
+    try:
+        message = json.dumps({"origin": cache.INSTANCE_ID, "key": key, "pattern": pattern, "keys": keys})
+        await _call("publish", cache.INVALIDATION_CHANNEL, message)
+    except Exception as e:
+        logger.error(f"Cache error publishing invalidation: {str(e)}")
+
+async def cache_get(key):
+    """Get data from cache, checking the in-process L1 cache before Redis."""
+    local_cache = cache.local_cache
+    try:
+        generation = None
+        if local_cache is not None:
+            hit, value = local_cache.get(key)
+            if hit:
+                cache_stats_counters.record("l1_hits")
+                logger.debug(f"L1 cache hit for key: {key}")
+                return value
+            cache_stats_counters.record("l1_misses")
+            generation = local_cache.generation
+
+        data = await _call("get", key)
+        if data:
+            cache_stats_counters.record("l2_hits")
+            logger.info(f"Cache hit for key: {key}")
+            value = codec.decode(data)
+            if local_cache is not None:
+                local_cache.set(key, value, generation=generation)
+            return value
+        cache_stats_counters.record("l2_misses")
+        logger.info(f"Cache miss for key: {key}")
+        return None
+    except Exception as e:
+        logger.error(f"Cache error getting {key}: {str(e)}")
+        return None
+
+async def cache_set(key, value, expiry=3600):
+    """Set data in cache with expiry in seconds."""
+    try:
+        await _call("setex", key, expiry, codec.encode(value))
+        if cache.local_cache is not None:
+            cache.local_cache.set(key, value, expiry)
+        logger.info(f"Set cache for key: {key} with expiry: {expiry}s")
+        return True
+    except Exception as e:
+        logger.error(f"Cache error setting {key}: {str(e)}")
+        return False
+
+async def cache_get_many(keys):
+    """Async version of utils.cache.cache_get_many."""
+    local_cache = cache.local_cache
+    found = {}
+    try:
+        remaining = list(keys)
+        generation = None
+        if local_cache is not None:
+            generation = local_cache.generation
+            missing = []
+            for key in remaining:
+                hit, value = local_cache.get(key)
+                if hit:
+                    found[key] = value
+                else:
+                    missing.append(key)
+            cache_stats_counters.add("l1_hits", len(found))
+            cache_stats_counters.add("l1_misses", len(missing))
+            remaining = missing
+
+        if remaining:
+            for key, data in zip(remaining, await _call("mget", remaining) or []):
+                if data is None:
+                    continue
+                value = codec.decode(data)
+                found[key] = value
+                if local_cache is not None:
+                    local_cache.set(key, value, generation=generation)
+            hits = len([key for key in remaining if key in found])
+            cache_stats_counters.add("l2_hits", hits)
+            cache_stats_counters.add("l2_misses", len(remaining) - hits)
+        logger.info(f"Cache multi-get for {len(keys)} keys: {len(found)} hits")
+        return found
+    except Exception as e:
+        logger.error(f"Cache error getting {len(keys)} keys: {str(e)}")
+        return found
+
+async def cache_set_many(items, expiry=3600):
+    """Async version of utils.cache.cache_set_many."""
+    try:
+        def fill(pipe):
+            for key, value in items.items():
+                pipe.setex(key, expiry, codec.encode(value))
+        await _pipeline(fill)
+        if cache.local_cache is not None:
+            for key, value in items.items():
+                cache.local_cache.set(key, value, expiry)
+        logger.info(f"Set cache for {len(items)} keys with expiry: {expiry}s")
+        return True
+    except Exception as e:
+        logger.error(f"Cache error setting {len(items)} keys: {str(e)}")
+        return False
+
+async def cache_delete(key):
+    """Delete data from cache."""
+    try:
+        if cache.local_cache is not None:
+            cache.local_cache.delete(key)
+        await _call("delete", key)
+        await publish_invalidation(key=key)
+        logger.info(f"Deleted cache for key: {key}")
+        return True
+    except Exception as e:
+        logger.error(f"Cache error deleting {key}: {str(e)}")
+        return False
+
+async def cache_delete_many(keys):
+    """Delete several keys with one command and one invalidation message."""
+    if not keys:
+        return True
+    try:
+        if cache.local_cache is not None:
+            for key in keys:
+                cache.local_cache.delete(key)
+        await _call("delete", *keys)
+        await publish_invalidation(keys=list(keys))
+        logger.info(f"Deleted cache for {len(keys)} keys")
+        return True
+    except Exception as e:
+        logger.error(f"Cache error deleting {len(keys)} keys: {str(e)}")
+        return False
+
+async def cache_put(key, value, expiry=3600):
+    """Async version of utils.cache.cache_put."""
+    ok = await cache_set(key, {"value": value, "delta": 0.0, "expires_at": time.time() + expiry}, expiry)
+    await publish_invalidation(key=key)
+    return ok
+
+async def namespace_version(namespace):
+    """Return the current version of a namespace (0 if it was never invalidated)."""
+    cache._namespaces.add(namespace)
+    version_key = cache._version_key(namespace)
+    local_cache = cache.local_cache
+    try:
+        generation = None
+        if local_cache is not None:
+            hit, version = local_cache.get(version_key)
+            if hit:
+                return version
+            generation = local_cache.generation
+        version = int(await _call("get", version_key) or 0)
+        if local_cache is not None:
+            local_cache.set(version_key, version, generation=generation)
+        return version
+    except Exception as e:
+        logger.error(f"Cache error reading version of {namespace}: {str(e)}")
+        return 0
+
+async def namespace_written_recently(namespace):
+    """Async version of utils.cache.namespace_written_recently."""
+    try:
+        return bool(await _call("exists", cache._written_key(namespace)))
+    except Exception as e:
+        logger.error(f"Cache error reading write marker of {namespace}: {str(e)}")
+        return True
+
+async def namespace_key(namespace, key):
+    """Build a cache key inside a versioned namespace, like utils.cache.namespace_key."""
+    return f"{namespace}:v{await namespace_version(namespace)}:{key}"
+
+async def invalidate_namespace(namespace):
+    """Async version of utils.cache.invalidate_namespace."""
+    version_key = cache._version_key(namespace)
+    try:
+        if cache.local_cache is not None:
+            cache.local_cache.delete(version_key)
+
+        def fill(pipe):
+            pipe.incr(version_key)
+            pipe.set(cache._written_key(namespace), 1, px=max(int(cache.READ_AFTER_WRITE_WINDOW * 1000), 1))
+        version, _ = await _pipeline(fill)
+        await publish_invalidation(key=version_key)
+        logger.info(f"Invalidated cache namespace {namespace} (now version {version})")
+        return True
+    except Exception as e:
+        logger.error(f"Cache error invalidating namespace {namespace}: {str(e)}")
+        return False
+
+async def record_access(key):
+    """Async version of utils.cache.record_access."""
+    if cache.HOTKEY_SAMPLE_RATE <= 0 or random.random() >= cache.HOTKEY_SAMPLE_RATE:
+        return
+    try:
+        await _call("zincrby", cache.HOTKEYS_KEY, 1, key)
+    except Exception as e:
+        logger.debug(f"Cache error recording access to {key}: {str(e)}")
+
+# Per-key locks coalescing misses within this event loop: key -> [lock, users]
+_key_locks = {}
+
+async def _acquire_redis_lock(key, timeout):
+    token = uuid.uuid4().hex
+    try:
+        if await _call("set", f"lock:{key}", token, nx=True, px=int(timeout * 1000)):
+            return token
+    except Exception as e:
+        logger.error(f"Cache error locking {key}: {str(e)}")
+    return None
+
+async def _release_redis_lock(key, token):
+    try:
+        await _call("eval", _RELEASE_LOCK_SCRIPT, 1, f"lock:{key}", token)
+    except Exception as e:
+        # The lock expires on its own after its timeout
+        logger.warning(f"Cache error unlocking {key}: {str(e)}")
+
+async def _compute_and_set(key, compute, expiry):
+    started = time.monotonic()
+    value = await compute()
+    delta = time.monotonic() - started
+    cache_stats_counters.record("computes")
+    await cache_set(key, {"value": value, "delta": delta, "expires_at": time.time() + expiry}, expiry)
+    return value
+
+async def get_many_or_compute(keys, compute_missing, expiry=3600):
+    """
+    Async version of utils.cache.get_many_or_compute.
+
+    Args:
+        keys: Cache keys
+        compute_missing: Coroutine function taking the list of missing keys and returning a dict of
+            key -> JSON-serializable value; keys it leaves out are not cached
+        expiry: Cache expiry in seconds
+
+    Returns:
+        dict: Values by key for every key that was cached or computed, leaving out cached misses
+    """
+    cached = {key: _unwrap(entry)[0] for key, entry in (await cache_get_many(keys)).items()}
+    # A cached MISSING is known not to exist: neither returned nor recomputed
+    found = {key: value for key, value in cached.items() if not cache.is_missing(value)}
+    missing = [key for key in keys if key not in cached]
+    if missing:
+        started = time.monotonic()
+        computed = await compute_missing(missing)
+        delta = time.monotonic() - started
+        cache_stats_counters.record("computes")
+        expires_at = time.time() + expiry
+        await cache_set_many({key: {"value": value, "delta": delta, "expires_at": expires_at}
+                              for key, value in computed.items()}, expiry)
+        found.update(computed)
+    return found
+
+async def get_or_compute(key, compute, expiry=3600, beta=cache.EARLY_REFRESH_BETA, lock_timeout=cache.LOCK_TIMEOUT):
+    """
+    Async version of utils.cache.get_or_compute.
+
+    Args:
+        key: Cache key
+        compute: Coroutine function returning a JSON-serializable value; exceptions propagate and nothing is cached
+        expiry: Cache expiry in seconds
+        beta: Eagerness of early refresh, 0 to disable
+        lock_timeout: Seconds to wait for another replica's recompute before computing anyway
+
+    Returns:
+        The cached or computed value
+    """
+    await record_access(key)
+    entry = await cache_get(key)
+    if entry is not None:
+        value, delta, expires_at = _unwrap(entry)
+        if expires_at is not None and beta > 0 and _should_refresh_early(delta, expires_at, beta):
+            # Only one replica refreshes; if the lock is taken, serve the cached value
+            token = await _acquire_redis_lock(key, lock_timeout)
+            if token is not None:
+                cache_stats_counters.record("early_refreshes")
+                logger.info(f"Refreshing cache key ahead of expiry: {key}")
+                try:
+                    return await _compute_and_set(key, compute, expiry)
+                finally:
+                    await _release_redis_lock(key, token)
+        return value
+
+    lock_entry = _key_locks.setdefault(key, [asyncio.Lock(), 0])
+    lock_entry[1] += 1
+    try:
+        async with lock_entry[0]:
+            # Another task may have filled the key while we waited
+            entry = await cache_get(key)
+            if entry is not None:
+                return _unwrap(entry)[0]
+
+            if not cache.redis_client.available:
+                return await _compute_and_set(key, compute, expiry)
+
+            deadline = time.monotonic() + lock_timeout
+            token = await _acquire_redis_lock(key, lock_timeout)
+            while token is None and cache.redis_client.available and time.monotonic() < deadline:
+                # Another replica is computing the value, wait for it to land in Redis
+                cache_stats_counters.record("lock_waits")
+                await asyncio.sleep(cache.LOCK_POLL_INTERVAL)
+                entry = await cache_get(key)
+                if entry is not None:
+                    return _unwrap(entry)[0]
+                token = await _acquire_redis_lock(key, lock_timeout)
+
+            try:
+                return await _compute_and_set(key, compute, expiry)
+            finally:
+                if token is not None:
+                    await _release_redis_lock(key, token)
+    finally:
+        lock_entry[1] -= 1
+        if lock_entry[1] == 0:
+            del _key_locks[key]
@@ -0,0 +1,183 @@
+"""
+Redis-backed Bloom filters for rejecting IDs that do not exist.
+
+Each filter is a Redis bitmap shared by every replica. IDs are added right
+after their row is flushed, before the transaction commits, so a committed row
+is always in the filter. A filter is only trusted once it has been rebuilt from
+the database; the bit just past the end of the bitmap marks that, so a lookup
+checks readiness and membership with a single BITFIELD command.
+
+Lookups fail open: if Redis is unavailable the ID is treated as possibly
+present and the caller falls through to the database.
+"""
+
+import os
+import math
+import time
+import hashlib
+import logging
+import threading
+
+from utils import cache, async_cache
+
+logger = logging.getLogger(__name__)
+
+# Filter settings
+BLOOM_ENABLED = os.getenv("BLOOM_FILTER_ENABLED", "true").lower() == "true"
+BLOOM_CAPACITY = int(os.getenv("BLOOM_FILTER_CAPACITY", 1000000))
+BLOOM_ERROR_RATE = float(os.getenv("BLOOM_FILTER_ERROR_RATE", 0.01))
+REBUILD_CHUNK_SIZE = int(os.getenv("BLOOM_FILTER_REBUILD_CHUNK_SIZE", 1000))
+
+class BloomFilter:
+    """A Bloom filter over integer IDs stored in a Redis bitmap."""
+
+    def __init__(self, key, capacity=BLOOM_CAPACITY, error_rate=BLOOM_ERROR_RATE):
+        self.key = key
+        self.size = int(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.ready_offset = self.size
+        self._pending = set()  # IDs whose add failed, retried in the background
+        self._pending_lock = threading.Lock()
+
+    def positions(self, item_id):
+        """Bit positions for an ID, by double hashing."""
+        digest = hashlib.blake2b(str(item_id).encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def _set_args(self, ids):
+        args = ["BITFIELD", self.key]
+        for item_id in ids:
+            for position in self.positions(item_id):
+                args += ["SET", "u1", position, 1]
+        return args
+
+    def _get_args(self, item_id):
+        args = ["BITFIELD", self.key, "GET", "u1", self.ready_offset]
+        for position in self.positions(item_id):
+            args += ["GET", "u1", position]
+        return args
+
+    def add(self, *ids):
+        """
+        Add IDs to the filter. Errors are logged, never raised.
+
+        A failed add is retried in the background until Redis accepts it,
+        since a ready filter missing an ID would hide that row.
+        """
+        if not BLOOM_ENABLED or not ids:
+            return
+        try:
+            cache.redis_client.execute_command(*self._set_args(ids))
+        except Exception as e:
+            self._add_later(ids, e)
+
+    async def add_async(self, *ids):
+        """Async version of add."""
+        if not BLOOM_ENABLED or not ids:
+            return
+        try:
+            await async_cache._call("execute_command", *self._set_args(ids))
+        except Exception as e:
+            self._add_later(ids, e)
+
+    def _add_later(self, ids, error):
+        logger.error(f"Bloom filter error adding to {self.key}, will retry: {str(error)}")
+        with self._pending_lock:
+            start_retry = not self._pending
+            self._pending.update(ids)
+        if start_retry:
+            threading.Thread(target=self._retry_pending, name=f"bloom-retry-{self.key}", daemon=True).start()
+
+    def _retry_pending(self):
+        while True:
+            time.sleep(cache.BREAKER_RESET_TIMEOUT)
+            with self._pending_lock:
+                ids = list(self._pending)
+            try:
+                cache.redis_client.execute_command(*self._set_args(ids))
+            except Exception:
+                continue
+            with self._pending_lock:
+                self._pending.difference_update(ids)
+                if not self._pending:
+                    logger.info(f"Added {len(ids)} delayed IDs to Bloom filter {self.key}")
+                    return
+
+    def reset(self):
+        """Clear the ready flag so the next rebuild_filters() call rebuilds this filter."""
+        cache.redis_client.setbit(self.key, self.ready_offset, 0)
+
+    def _contains(self, bits):
+        ready, *members = bits
+        # Until the filter has been rebuilt it cannot rule anything out
+        return not ready or all(members)
+
+    def might_contain(self, item_id):
+        """False only if the ID definitely does not exist."""
+        if not BLOOM_ENABLED:
+            return True
+        try:
+            return self._contains(cache.redis_client.execute_command(*self._get_args(item_id)))
+        except Exception as e:
+            logger.error(f"Bloom filter error reading {self.key}: {str(e)}")
+            return True
+
+    async def might_contain_async(self, item_id):
+        """Async version of might_contain."""
+        if not BLOOM_ENABLED:
+            return True
+        try:
+            return self._contains(await async_cache._call("execute_command", *self._get_args(item_id)))
+        except Exception as e:
+            logger.error(f"Bloom filter error reading {self.key}: {str(e)}")
+            return True
+
+    def is_ready(self):
+        return bool(cache.redis_client.getbit(self.key, self.ready_offset))
+
+    def rebuild(self, db, id_column):
+        """
+        Add every ID in id_column to the filter, then mark it ready.
+
+        Bits are only ever set, so IDs added concurrently by writes are kept.
+        """
+        last_id = 0
+        total = 0
+        while True:
+            ids = [row[0] for row in db.query(id_column).filter(id_column > last_id)
+                   .order_by(id_column).limit(REBUILD_CHUNK_SIZE).all()]
+            if not ids:
+                break
+            cache.redis_client.execute_command(*self._set_args(ids))
+            last_id = ids[-1]
+            total += len(ids)
+        cache.redis_client.setbit(self.key, self.ready_offset, 1)
+        logger.info(f"Rebuilt Bloom filter {self.key} with {total} IDs")
+
+users_filter = BloomFilter("bloom:users")
+user_details_filter = BloomFilter("bloom:user-details")
+
+def rebuild_filters():
+    """Rebuild every filter that is not ready yet."""
+    # Imported here so utils does not depend on the models at import time
+    from database import SessionLocal
+    from models.user import User
+    from models.user_details import UserDetail
+
+    db = SessionLocal()
+    try:
+        for bloom_filter, id_column in ((users_filter, User.id), (user_details_filter, UserDetail.id)):
+            if not bloom_filter.is_ready():
+                bloom_filter.rebuild(db, id_column)
+    except Exception as e:
+        logger.error(f"Bloom filter rebuild failed: {e}")
+    finally:
+        db.close()
+
+def start_rebuild():
+    """Rebuild the filters in the background so startup is not delayed."""
+    if not BLOOM_ENABLED:
+        return
+    threading.Thread(target=rebuild_filters, name="bloom-rebuild", daemon=True).start()
@@ -4,9 +4,18 @@ Redis cache utilities.
 
 import os
 import json
+import math
+import uuid
+import random
+import fnmatch
 import logging
+import threading
 import redis
 import time
+from collections import OrderedDict
+
+from utils.codecs import Codec
+from utils import request_context
 
 logger = logging.getLogger(__name__)
 
@@ -16,56 +25,315 @@ REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
 REDIS_DB = int(os.getenv("REDIS_DB", 0))
 REDIS_PASSWORD = os.getenv("REDIS_PASSWORD", "")
 
-# Set a global redis_client variable
-redis_client = None
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 50))
+REDIS_POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT", 1))  # seconds to wait for a free connection
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", 5))
+REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", 30))
 
-# Try to connect to Redis with retry logic
-max_retries = 5
-retry_interval = 2  # seconds
+# Circuit breaker
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("REDIS_BREAKER_FAILURE_THRESHOLD", 3))
+BREAKER_RESET_TIMEOUT = float(os.getenv("REDIS_BREAKER_RESET_TIMEOUT", 5))  # seconds between reconnect probes
 
-for retry in range(max_retries):
-    try:
-        # Create Redis client with socket timeout
-        redis_client = redis.Redis(
-            host=REDIS_HOST,
-            port=REDIS_PORT,
-            db=REDIS_DB,
-            password=REDIS_PASSWORD,
-            decode_responses=True,  # Automatically decode responses to Python strings
-            socket_timeout=5,  # Add timeout for socket operations
-            socket_connect_timeout=5,  # Add timeout for connection
-            retry_on_timeout=True  # Retry on timeout
-        )
+class CacheUnavailableError(redis.exceptions.ConnectionError):
+    """Raised without contacting Redis while the circuit breaker is open."""
+
+def is_pool_timeout(error):
+    """True if error is a blocking pool's timeout waiting for a free connection, not a Redis failure."""
+    # Raised by get_connection of both redis.BlockingConnectionPool and its asyncio version
+    return isinstance(error, redis.exceptions.ConnectionError) and str(error) == "No connection available."
+
+class ResilientRedis:
+    """
+    Redis client that fails fast while Redis is down.
+    
+    Connections are opened lazily from a bounded pool, so nothing blocks at
+    import time. After BREAKER_FAILURE_THRESHOLD consecutive connection errors
+    the breaker opens: calls raise CacheUnavailableError immediately instead of
+    each waiting out the socket timeout, and a background thread pings Redis
+    until it answers, then closes the breaker again.
+    """
+    
+    def __init__(self, pool, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET_TIMEOUT):
+        self.client = redis.Redis(connection_pool=pool)
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._open = False
+        self._lock = threading.Lock()
+    
+    @property
+    def available(self):
+        """False while the breaker is open."""
+        return not self._open
+    
+    def __getattr__(self, name):
+        attr = getattr(self.client, name)
+        if not callable(attr):
+            return attr
         
-        # Test Redis connection
-        redis_ping = redis_client.ping()
-        logger.info(f"Redis connection successful: {redis_ping}")
-        break  # Connection successful, exit retry loop
+        def call(*args, **kwargs):
+            return self._call(attr, *args, **kwargs)
+        return call
+    
+    def pipeline(self, *args, **kwargs):
+        pipe = self._call(self.client.pipeline, *args, **kwargs)
+        execute = pipe.execute
+        pipe.execute = lambda *a, **kw: self._call(execute, *a, **kw)
+        return pipe
+    
+    def _call(self, method, *args, **kwargs):
+        if self._open:
+            raise CacheUnavailableError("Redis is unavailable (circuit open)")
+        started = time.perf_counter()
+        try:
+            result = method(*args, **kwargs)
+        except (redis.exceptions.ConnectionError, redis.exceptions.TimeoutError) as e:
+            self.record_failure(e)
+            raise
+        finally:
+            request_context.record_redis(time.perf_counter() - started)
+        self.record_success()
+        return result
+    
+    def record_success(self):
+        self._failures = 0
+    
+    def record_failure(self, error):
+        """Count a connection error, opening the breaker once the threshold is reached."""
+        if is_pool_timeout(error):
+            # Every pooled connection is busy: Redis is up, this replica is just saturated
+            logger.warning(f"Redis connection pool exhausted: {error}")
+            return
+        with self._lock:
+            self._failures += 1
+            if self._open or self._failures < self.failure_threshold:
+                return
+            self._open = True
+        logger.error(f"Redis unavailable after {self._failures} failures, failing fast until it recovers: {error}")
+        threading.Thread(target=self._probe, name="redis-reconnect", daemon=True).start()
+    
+    def _probe(self):
+        while True:
+            time.sleep(self.reset_timeout)
+            try:
+                self.client.ping()
+            except Exception as e:
+                logger.warning(f"Redis still unavailable: {e}")
+                continue
+            with self._lock:
+                self._failures = 0
+                self._open = False
+            logger.info("Redis connection recovered")
+            return
+
+# Connections are created on first use, never at import time
+connection_pool = redis.BlockingConnectionPool(
+    host=REDIS_HOST,
+    port=REDIS_PORT,
+    db=REDIS_DB,
+    password=REDIS_PASSWORD,
+    max_connections=REDIS_MAX_CONNECTIONS,
+    timeout=REDIS_POOL_TIMEOUT,
+    socket_timeout=REDIS_SOCKET_TIMEOUT,
+    socket_connect_timeout=REDIS_SOCKET_TIMEOUT,
+    health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+    retry_on_timeout=True
+)
+# Values are bytes encoded by utils.codecs, so responses are not decoded
+redis_client = ResilientRedis(connection_pool)
+
+# In-process L1 cache in front of Redis (optional)
+L1_ENABLED = os.getenv("CACHE_L1_ENABLED", "false").lower() == "true"
+L1_MAX_ITEMS = int(os.getenv("CACHE_L1_MAX_ITEMS", 10000))
+L1_TTL = float(os.getenv("CACHE_L1_TTL", 5))  # seconds, caps how long L1 may lag Redis
+INVALIDATION_CHANNEL = os.getenv("CACHE_INVALIDATION_CHANNEL", "cache:invalidate")
+
+# Stampede protection for get_or_compute
+LOCK_TIMEOUT = float(os.getenv("CACHE_LOCK_TIMEOUT", 10))  # seconds a recompute may hold the lock
+LOCK_POLL_INTERVAL = float(os.getenv("CACHE_LOCK_POLL_INTERVAL", 0.05))
+EARLY_REFRESH_BETA = float(os.getenv("CACHE_EARLY_REFRESH_BETA", 1.0))  # 0 disables early refresh
+
+# Negative caching: MISSING is cached briefly for IDs that do not exist
+NEGATIVE_TTL = int(os.getenv("CACHE_NEGATIVE_TTL", 30))
+MISSING = {"__missing__": True}
+
+# Write-through and hot key tracking for cache warm-up
+WRITE_THROUGH = os.getenv("CACHE_WRITE_THROUGH", "false").lower() == "true"
+HOTKEY_SAMPLE_RATE = float(os.getenv("CACHE_HOTKEY_SAMPLE_RATE", 0.01))
+HOTKEYS_KEY = "cache:hotkeys"
+
+# Versioned namespaces
+# Reads of a namespace go to the primary for this long after a write, so
+# lagging read replicas cannot repopulate it with stale rows
+READ_AFTER_WRITE_WINDOW = float(os.getenv("DB_REPLICA_MAX_LAG", 5))
+SWEEP_INTERVAL = float(os.getenv("CACHE_SWEEP_INTERVAL", 0))  # seconds between sweeps of stale versions, 0 disables
+SCAN_COUNT = int(os.getenv("CACHE_SCAN_COUNT", 500))
+
+# Identifies this process on the invalidation channel
+INSTANCE_ID = uuid.uuid4().hex
+
+class LocalCache:
+    """
+    Size-bounded in-process LRU cache with per-key TTL.
+    
+    Values are stored as decoded Python objects and returned as-is, so callers
+    must not mutate what cache_get returns. Every invalidation bumps
+    `generation`; a value read from Redis before an invalidation is not stored
+    afterwards, so a racing read cannot resurrect a deleted key.
+    """
+    
+    def __init__(self, max_items=L1_MAX_ITEMS, default_ttl=L1_TTL):
+        self.max_items = max_items
+        self.default_ttl = default_ttl
+        self.generation = 0
+        self._items = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        """Return (hit, value)."""
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return False, None
+            if item[0] <= time.monotonic():
+                del self._items[key]
+                return False, None
+            self._items.move_to_end(key)
+            return True, item[1]
+    
+    def set(self, key, value, ttl=None, generation=None):
+        """Store a value unless an invalidation happened since `generation` was read."""
+        ttl = min(ttl or self.default_ttl, self.default_ttl)
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._items[key] = (time.monotonic() + ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+    
+    def delete(self, key):
+        with self._lock:
+            self.generation += 1
+            self._items.pop(key, None)
+    
+    def delete_pattern(self, pattern):
+        with self._lock:
+            self.generation += 1
+            for key in [k for k in self._items if fnmatch.fnmatchcase(k, pattern)]:
+                del self._items[key]
+    
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._items.clear()
+    
+    def __len__(self):
+        return len(self._items)
+
+class CacheStats:
+    """Hit/miss counters per cache tier."""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {
+            "l1_hits": 0, "l1_misses": 0, "l2_hits": 0, "l2_misses": 0,
+            "computes": 0, "early_refreshes": 0, "lock_waits": 0,
+        }
+    
+    def record(self, name):
+        self.add(name, 1)
+    
+    def add(self, name, count):
+        with self._lock:
+            self._counts[name] += count
+        request_context.record_cache(name, count)
+    
+    def snapshot(self):
+        with self._lock:
+            counts = dict(self._counts)
+        for tier in ("l1", "l2"):
+            total = counts[f"{tier}_hits"] + counts[f"{tier}_misses"]
+            counts[f"{tier}_hit_ratio"] = round(counts[f"{tier}_hits"] / total, 4) if total else None
+        return counts
+
+local_cache = LocalCache() if L1_ENABLED else None
+codec = Codec()
+cache_stats_counters = CacheStats()
+
+def publish_invalidation(key=None, pattern=None, keys=None):
+    """Tell other replicas to drop a key, several keys or a pattern from their L1 cache."""
+    if local_cache is None:
+        return
+    try:
+        message = {"origin": INSTANCE_ID, "key": key, "pattern": pattern, "keys": keys}
+        redis_client.publish(INVALIDATION_CHANNEL, json.dumps(message))
     except Exception as e:
-        logger.warning(f"Redis connection attempt {retry+1}/{max_retries} failed: {e}")
-        if retry < max_retries - 1:
-            logger.info(f"Retrying in {retry_interval} seconds...")
-            time.sleep(retry_interval)
-        else:
-            logger.error(f"Failed to connect to Redis after {max_retries} attempts: {e}")
-            # Initialize a dummy client that logs operations but doesn't fail
-            class DummyRedis:
-                def __getattr__(self, name):
-                    def dummy_method(*args, **kwargs):
-                        logger.debug(f"Redis operation '{name}' called, but Redis is unavailable")
-                        return None
-                    return dummy_method
-            
-            redis_client = DummyRedis()
+        logger.error(f"Cache error publishing invalidation: {str(e)}")
+
+def _listen_for_invalidations():
+    """Apply invalidations published by other replicas to the local L1 cache."""
+    while True:
+        try:
+            pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(INVALIDATION_CHANNEL)
+            # Anything cached before (re)subscribing may have missed invalidations
+            local_cache.clear()
+            for message in pubsub.listen():
+                if message.get("type") != "message":
+                    continue
+                data = json.loads(message["data"])
+                if data.get("origin") == INSTANCE_ID:
+                    continue
+                if data.get("key"):
+                    local_cache.delete(data["key"])
+                for key in data.get("keys") or []:
+                    local_cache.delete(key)
+                if data.get("pattern"):
+                    local_cache.delete_pattern(data["pattern"])
+        except Exception as e:
+            logger.warning(f"Cache invalidation listener error, resubscribing: {e}")
+            local_cache.clear()
+            time.sleep(BREAKER_RESET_TIMEOUT)
+
+def start_invalidation_listener():
+    """Start the pub/sub listener that keeps L1 consistent across replicas."""
+    if local_cache is None:
+        return
+    threading.Thread(target=_listen_for_invalidations, name="cache-invalidation", daemon=True).start()
+    logger.info(f"L1 cache enabled ({L1_MAX_ITEMS} items, {L1_TTL}s TTL), listening on {INVALIDATION_CHANNEL}")
+
+def cache_stats():
+    """Return hit/miss counters and hit ratios for the L1 and Redis tiers."""
+    stats = cache_stats_counters.snapshot()
+    stats["l1_enabled"] = local_cache is not None
+    stats["codec"] = codec.name
+    stats["l1_size"] = len(local_cache) if local_cache is not None else 0
+    return stats
 
 # Cache helper functions
 def cache_get(key):
-    """Get data from cache."""
+    """Get data from cache, checking the in-process L1 cache before Redis."""
     try:
+        generation = None
+        if local_cache is not None:
+            hit, value = local_cache.get(key)
+            if hit:
+                cache_stats_counters.record("l1_hits")
+                logger.debug(f"L1 cache hit for key: {key}")
+                return value
+            cache_stats_counters.record("l1_misses")
+            generation = local_cache.generation
+        
         data = redis_client.get(key)
         if data:
+            cache_stats_counters.record("l2_hits")
             logger.info(f"Cache hit for key: {key}")
-            return json.loads(data)
+            value = codec.decode(data)
+            if local_cache is not None:
+                local_cache.set(key, value, generation=generation)
+            return value
+        cache_stats_counters.record("l2_misses")
         logger.info(f"Cache miss for key: {key}")
         return None
     except Exception as e:
@@ -75,31 +343,410 @@ def cache_get(key):
 def cache_set(key, value, expiry=3600):
     """Set data in cache with expiry in seconds."""
     try:
-        redis_client.setex(key, expiry, json.dumps(value))
+        redis_client.setex(key, expiry, codec.encode(value))
+        if local_cache is not None:
+            local_cache.set(key, value, expiry)
         logger.info(f"Set cache for key: {key} with expiry: {expiry}s")
         return True
     except Exception as e:
         logger.error(f"Cache error setting {key}: {str(e)}")
         return False
 
+def is_missing(value):
+    """True if a cached value is the MISSING sentinel."""
+    return isinstance(value, dict) and value.get("__missing__") is True
+
+def cache_get_many(keys):
+    """
+    Get several keys at once, checking L1 first and fetching the rest with one MGET.
+    
+    Returns:
+        dict: Cached values by key; missing keys are left out
+    """
+    found = {}
+    try:
+        remaining = list(keys)
+        generation = None
+        if local_cache is not None:
+            generation = local_cache.generation
+            missing = []
+            for key in remaining:
+                hit, value = local_cache.get(key)
+                if hit:
+                    found[key] = value
+                else:
+                    missing.append(key)
+            cache_stats_counters.add("l1_hits", len(found))
+            cache_stats_counters.add("l1_misses", len(missing))
+            remaining = missing
+        
+        if remaining:
+            for key, data in zip(remaining, redis_client.mget(remaining) or []):
+                if data is None:
+                    continue
+                value = codec.decode(data)
+                found[key] = value
+                if local_cache is not None:
+                    local_cache.set(key, value, generation=generation)
+            hits = len([key for key in remaining if key in found])
+            cache_stats_counters.add("l2_hits", hits)
+            cache_stats_counters.add("l2_misses", len(remaining) - hits)
+        logger.info(f"Cache multi-get for {len(keys)} keys: {len(found)} hits")
+        return found
+    except Exception as e:
+        logger.error(f"Cache error getting {len(keys)} keys: {str(e)}")
+        return found
+
+def cache_set_many(items, expiry=3600):
+    """Set several keys with the same expiry in one pipelined round-trip."""
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for key, value in items.items():
+            pipe.setex(key, expiry, codec.encode(value))
+        pipe.execute()
+        if local_cache is not None:
+            for key, value in items.items():
+                local_cache.set(key, value, expiry)
+        logger.info(f"Set cache for {len(items)} keys with expiry: {expiry}s")
+        return True
+    except Exception as e:
+        logger.error(f"Cache error setting {len(items)} keys: {str(e)}")
+        return False
+
 def cache_delete(key):
     """Delete data from cache."""
     try:
+        if local_cache is not None:
+            local_cache.delete(key)
         redis_client.delete(key)
+        publish_invalidation(key=key)
         logger.info(f"Deleted cache for key: {key}")
         return True
     except Exception as e:
         logger.error(f"Cache error deleting {key}: {str(e)}")
         return False
 
+def _unlink_matching(pattern, keep=None):
+    """Delete keys matching a pattern with incremental SCAN, in batches. Returns the number deleted."""
+    deleted = 0
+    batch = []
+    for key in redis_client.scan_iter(match=pattern, count=SCAN_COUNT) or []:
+        if keep is not None and keep(key.decode("utf-8") if isinstance(key, bytes) else key):
+            continue
+        batch.append(key)
+        if len(batch) >= SCAN_COUNT:
+            deleted += redis_client.unlink(*batch) or 0
+            batch = []
+    if batch:
+        deleted += redis_client.unlink(*batch) or 0
+    return deleted
+
 def cache_invalidate_pattern(pattern):
-    """Invalidate all keys matching a pattern."""
+    """
+    Invalidate all keys matching a pattern.
+    
+    This walks the keyspace with SCAN, so its cost grows with the cache. For
+    keys that are invalidated on every write, use a namespace instead.
+    """
     try:
-        keys = redis_client.keys(pattern)
-        if keys:
-            redis_client.delete(*keys)
-            logger.info(f"Invalidated {len(keys)} keys matching pattern: {pattern}")
+        if local_cache is not None:
+            local_cache.delete_pattern(pattern)
+        deleted = _unlink_matching(pattern)
+        if deleted:
+            logger.info(f"Invalidated {deleted} keys matching pattern: {pattern}")
+        publish_invalidation(pattern=pattern)
         return True
     except Exception as e:
         logger.error(f"Cache error invalidating pattern {pattern}: {str(e)}")
-        return False 
\ No newline at end of file
+        return False
+
+# Namespaces seen by this process, swept by the background sweeper
+_namespaces = set()
+
+def _version_key(namespace):
+    return f"ns:{namespace}:version"
+
+def _written_key(namespace):
+    return f"ns:{namespace}:written"
+
+def namespace_written_recently(namespace):
+    """True if the namespace was invalidated within READ_AFTER_WRITE_WINDOW seconds."""
+    try:
+        return bool(redis_client.exists(_written_key(namespace)))
+    except Exception as e:
+        logger.error(f"Cache error reading write marker of {namespace}: {str(e)}")
+        # Without the marker, assume a recent write and read from the primary
+        return True
+
+def namespace_version(namespace):
+    """Return the current version of a namespace (0 if it was never invalidated)."""
+    _namespaces.add(namespace)
+    version_key = _version_key(namespace)
+    try:
+        generation = None
+        if local_cache is not None:
+            hit, version = local_cache.get(version_key)
+            if hit:
+                return version
+            generation = local_cache.generation
+        version = int(redis_client.get(version_key) or 0)
+        if local_cache is not None:
+            local_cache.set(version_key, version, generation=generation)
+        return version
+    except Exception as e:
+        logger.error(f"Cache error reading version of {namespace}: {str(e)}")
+        return 0
+
+def namespace_key(namespace, key):
+    """
+    Build a cache key inside a versioned namespace.
+    
+    For example namespace_key("users:all", "skip0:limit100") gives
+    "users:all:v3:skip0:limit100" while the namespace is at version 3.
+    """
+    return f"{namespace}:v{namespace_version(namespace)}:{key}"
+
+def invalidate_namespace(namespace):
+    """
+    Invalidate every key in a namespace with a single INCR.
+    
+    Keys built for older versions are never read again and expire through
+    their TTL, or earlier if the sweeper is enabled. A value computed from
+    data read before the bump is written under the old version, so it cannot
+    be served after the invalidation.
+    """
+    version_key = _version_key(namespace)
+    try:
+        if local_cache is not None:
+            local_cache.delete(version_key)
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.incr(version_key)
+        pipe.set(_written_key(namespace), 1, px=max(int(READ_AFTER_WRITE_WINDOW * 1000), 1))
+        version, _ = pipe.execute()
+        publish_invalidation(key=version_key)
+        logger.info(f"Invalidated cache namespace {namespace} (now version {version})")
+        return True
+    except Exception as e:
+        logger.error(f"Cache error invalidating namespace {namespace}: {str(e)}")
+        return False
+
+def sweep_namespace(namespace):
+    """Delete keys left behind by older versions of a namespace. Returns the number deleted."""
+    current = f"{namespace}:v{namespace_version(namespace)}:"
+    return _unlink_matching(f"{namespace}:v*", keep=lambda key: key.startswith(current))
+
+def _run_sweeper():
+    while True:
+        time.sleep(SWEEP_INTERVAL)
+        for namespace in list(_namespaces):
+            try:
+                deleted = sweep_namespace(namespace)
+                if deleted:
+                    logger.info(f"Swept {deleted} stale keys from cache namespace {namespace}")
+            except Exception as e:
+                logger.error(f"Cache error sweeping namespace {namespace}: {str(e)}")
+
+def start_sweeper():
+    """Start the background sweeper if CACHE_SWEEP_INTERVAL is set."""
+    if SWEEP_INTERVAL <= 0:
+        return
+    threading.Thread(target=_run_sweeper, name="cache-sweeper", daemon=True).start()
+    logger.info(f"Cache sweeper running every {SWEEP_INTERVAL}s")
+
+class KeyLocks:
+    """Per-key locks that are dropped once no thread holds or waits on them."""
+    
+    def __init__(self):
+        self._guard = threading.Lock()
+        self._locks = {}  # key -> [lock, users]
+    
+    def acquire(self, key):
+        with self._guard:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        entry[0].acquire()
+    
+    def release(self, key):
+        with self._guard:
+            entry = self._locks[key]
+            entry[0].release()
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[key]
+
+_key_locks = KeyLocks()
+
+# Deletes the lock only if this caller still owns it
+_RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+def _acquire_redis_lock(key, timeout=LOCK_TIMEOUT):
+    """Try once to take the cross-replica lock for a key. Returns the lock token or None."""
+    token = uuid.uuid4().hex
+    try:
+        if redis_client.set(f"lock:{key}", token, nx=True, px=int(timeout * 1000)):
+            return token
+    except Exception as e:
+        logger.error(f"Cache error locking {key}: {str(e)}")
+    return None
+
+def _release_redis_lock(key, token):
+    try:
+        redis_client.eval(_RELEASE_LOCK_SCRIPT, 1, f"lock:{key}", token)
+    except Exception as e:
+        # The lock expires on its own after LOCK_TIMEOUT
+        logger.warning(f"Cache error unlocking {key}: {str(e)}")
+
+def _unwrap(entry):
+    """Split a cached entry into (value, compute time, expiry timestamp)."""
+    if isinstance(entry, dict) and entry.keys() == {"value", "delta", "expires_at"}:
+        return entry["value"], entry["delta"], entry["expires_at"]
+    # Written by cache_set directly, no refresh metadata
+    return entry, None, None
+
+def _compute_and_set(key, compute, expiry):
+    started = time.monotonic()
+    value = compute()
+    delta = time.monotonic() - started
+    cache_stats_counters.record("computes")
+    cache_set(key, {"value": value, "delta": delta, "expires_at": time.time() + expiry}, expiry)
+    return value
+
+def _should_refresh_early(delta, expires_at, beta):
+    """
+    Probabilistic early expiration (XFetch).
+    
+    The closer the entry is to expiring, and the slower it was to compute, the
+    more likely a read is chosen to refresh it, so one request recomputes a hot
+    key ahead of time instead of all of them at once when it expires.
+    """
+    return time.time() - delta * beta * math.log(1.0 - random.random()) >= expires_at
+
+def cache_put(key, value, expiry=3600):
+    """
+    Store a freshly written value in the get_or_compute format.
+    
+    Other replicas drop the key from their L1 cache, so they read the new
+    value from Redis instead of a stale or negative entry.
+    """
+    ok = cache_set(key, {"value": value, "delta": 0.0, "expires_at": time.time() + expiry}, expiry)
+    publish_invalidation(key=key)
+    return ok
+
+def record_access(key):
+    """Count a sample of reads per key so warm-up can preload the hottest keys."""
+    if HOTKEY_SAMPLE_RATE <= 0 or random.random() >= HOTKEY_SAMPLE_RATE:
+        return
+    try:
+        redis_client.zincrby(HOTKEYS_KEY, 1, key)
+    except Exception as e:
+        logger.debug(f"Cache error recording access to {key}: {str(e)}")
+
+def hot_keys(prefix, count):
+    """Return up to `count` of the most read keys starting with prefix, hottest first."""
+    keys = redis_client.zrevrange(HOTKEYS_KEY, 0, count * 2 - 1)
+    keys = [key.decode("utf-8") if isinstance(key, bytes) else key for key in keys]
+    return [key for key in keys if key.startswith(prefix)][:count]
+
+def get_many_or_compute(keys, compute_missing, expiry=3600):
+    """
+    Get several keys at once, computing the missing ones in a single call.
+    
+    Entries are stored in the same format as get_or_compute, so both can serve
+    the same keys. Misses are not coalesced across concurrent callers.
+    
+    Args:
+        keys: Cache keys
+        compute_missing: Callable taking the list of missing keys and returning a dict of
+            key -> JSON-serializable value; keys it leaves out are not cached
+        expiry: Cache expiry in seconds
+    
+    Returns:
+        dict: Values by key for every key that was cached or computed, leaving out cached misses
+    """
+    cached = {key: _unwrap(entry)[0] for key, entry in cache_get_many(keys).items()}
+    # A cached MISSING is known not to exist: neither returned nor recomputed
+    found = {key: value for key, value in cached.items() if not is_missing(value)}
+    missing = [key for key in keys if key not in cached]
+    if missing:
+        started = time.monotonic()
+        computed = compute_missing(missing)
+        delta = time.monotonic() - started
+        cache_stats_counters.record("computes")
+        expires_at = time.time() + expiry
+        cache_set_many({key: {"value": value, "delta": delta, "expires_at": expires_at}
+                        for key, value in computed.items()}, expiry)
+        found.update(computed)
+    return found
+
+def get_or_compute(key, compute, expiry=3600, beta=EARLY_REFRESH_BETA, lock_timeout=LOCK_TIMEOUT):
+    """
+    Get a value from cache, computing and caching it on a miss.
+    
+    Concurrent misses for the same key run `compute` once: threads in this
+    process wait on a per-key lock and other replicas wait on a Redis lock,
+    then read the value the winner cached. A hot key is refreshed ahead of
+    expiry by the read chosen by _should_refresh_early, while every other read
+    keeps getting the cached value.
+    
+    Args:
+        key: Cache key
+        compute: Callable returning a JSON-serializable value; exceptions propagate and nothing is cached
+        expiry: Cache expiry in seconds
+        beta: Eagerness of early refresh, 0 to disable
+        lock_timeout: Seconds to wait for another replica's recompute before computing anyway
+    
+    Returns:
+        The cached or computed value
+    """
+    record_access(key)
+    entry = cache_get(key)
+    if entry is not None:
+        value, delta, expires_at = _unwrap(entry)
+        if expires_at is not None and beta > 0 and _should_refresh_early(delta, expires_at, beta):
+            # Only one replica refreshes; if the lock is taken, serve the cached value
+            token = _acquire_redis_lock(key, lock_timeout)
+            if token is not None:
+                cache_stats_counters.record("early_refreshes")
+                logger.info(f"Refreshing cache key ahead of expiry: {key}")
+                try:
+                    return _compute_and_set(key, compute, expiry)
+                finally:
+                    _release_redis_lock(key, token)
+        return value
+    
+    _key_locks.acquire(key)
+    try:
+        # Another thread may have filled the key while we waited
+        entry = cache_get(key)
+        if entry is not None:
+            return _unwrap(entry)[0]
+        
+        if not redis_client.available:
+            return _compute_and_set(key, compute, expiry)
+        
+        deadline = time.monotonic() + lock_timeout
+        token = _acquire_redis_lock(key, lock_timeout)
+        while token is None and redis_client.available and time.monotonic() < deadline:
+            # Another replica is computing the value, wait for it to land in Redis
+            cache_stats_counters.record("lock_waits")
+            time.sleep(LOCK_POLL_INTERVAL)
+            entry = cache_get(key)
+            if entry is not None:
+                return _unwrap(entry)[0]
+            token = _acquire_redis_lock(key, lock_timeout)
+        
+        try:
+            return _compute_and_set(key, compute, expiry)
+        finally:
+            if token is not None:
+                _release_redis_lock(key, token)
+    finally:
+        _key_locks.release(key)
+
+start_invalidation_listener()
+start_sweeper()
@@ -0,0 +1,108 @@
+"""
+Serialization and compression for cached values.
+
+Encoded values start with a 4-byte header: a 2-byte marker, the codec id and
+the compression id. Values without the marker are read as plain JSON, which is
+how entries were stored before the header existed.
+
+orjson, msgpack, zstandard and lz4 are optional; a codec whose library is not
+installed falls back to json for writes.
+"""
+
+import os
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+# Codec settings
+CACHE_CODEC = os.getenv("CACHE_CODEC", "orjson")  # json, orjson or msgpack
+CACHE_COMPRESSION = os.getenv("CACHE_COMPRESSION", "none")  # none, zstd or lz4
+COMPRESS_MIN_BYTES = int(os.getenv("CACHE_COMPRESS_MIN_BYTES", 1024))
+
+MAGIC = b"\x00C"
+
+def _json_dumps(value):
+    return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+# name -> (id, dumps, loads); None when the library is missing
+CODECS = {
+    "json": (1, _json_dumps, json.loads),
+    "orjson": (2, orjson.dumps, orjson.loads) if orjson else None,
+    "msgpack": (3, lambda v: msgpack.packb(v, use_bin_type=True), lambda b: msgpack.unpackb(b, raw=False)) if msgpack else None,
+}
+
+COMPRESSORS = {
+    "none": (0, None, None),
+    "zstd": (1, lambda b: zstandard.ZstdCompressor(level=3).compress(b), lambda b: zstandard.ZstdDecompressor().decompress(b)) if zstandard else None,
+    "lz4": (2, lambda b: lz4.frame.compress(b), lambda b: lz4.frame.decompress(b)) if lz4 else None,
+}
+
+_CODECS_BY_ID = {codec[0]: (name, codec) for name, codec in CODECS.items() if codec}
+_COMPRESSORS_BY_ID = {compressor[0]: (name, compressor) for name, compressor in COMPRESSORS.items() if compressor}
+
+class Codec:
+    """Encodes values with one serializer, compressing them above a size threshold."""
+
+    def __init__(self, codec=CACHE_CODEC, compression=CACHE_COMPRESSION, compress_min_bytes=COMPRESS_MIN_BYTES):
+        if codec not in CODECS:
+            raise ValueError(f"Unknown cache codec '{codec}', expected one of {', '.join(CODECS)}")
+        if compression not in COMPRESSORS:
+            raise ValueError(f"Unknown cache compression '{compression}', expected one of {', '.join(COMPRESSORS)}")
+        if CODECS[codec] is None:
+            logger.warning(f"Cache codec '{codec}' is not installed, using json")
+            codec = "json"
+        if COMPRESSORS[compression] is None:
+            logger.warning(f"Cache compression '{compression}' is not installed, storing values uncompressed")
+            compression = "none"
+        self.name = codec if compression == "none" else f"{codec}+{compression}"
+        self.codec_id, self._dumps, _ = CODECS[codec]
+        self.compression_id, self._compress, _ = COMPRESSORS[compression]
+        self.compress_min_bytes = compress_min_bytes
+
+    def encode(self, value):
+        """Serialize a value to bytes with the codec header."""
+        payload = self._dumps(value)
+        compression_id = 0
+        if self._compress is not None and len(payload) >= self.compress_min_bytes:
+            payload = self._compress(payload)
+            compression_id = self.compression_id
+        return MAGIC + bytes((self.codec_id, compression_id)) + payload
+
+    def decode(self, data):
+        """Deserialize bytes written by any codec, or a legacy JSON entry."""
+        if isinstance(data, str) or not data.startswith(MAGIC):
+            return json.loads(data)
+        codec_id, compression_id = data[2], data[3]
+        payload = data[4:]
+        if compression_id:
+            if compression_id not in _COMPRESSORS_BY_ID:
+                raise ValueError(f"Cached value uses compression id {compression_id}, which is not installed")
+            payload = _COMPRESSORS_BY_ID[compression_id][1][2](payload)
+        if codec_id not in _CODECS_BY_ID:
+            raise ValueError(f"Cached value uses codec id {codec_id}, which is not installed")
+        return _CODECS_BY_ID[codec_id][1][2](payload)
+
+def available_codecs():
+    """Return the codec and compression names whose libraries are installed."""
+    return [name for name, codec in CODECS.items() if codec], [name for name, c in COMPRESSORS.items() if c]
@@ -0,0 +1,52 @@
+"""
+Keyset pagination helpers for the list routes.
+
+Pages are read in ID order with WHERE id > :after_id, so a deep page costs
+the same as the first one. Clients get the position of the next page as an
+opaque cursor token and pass it back unchanged. Cache keys are built from the
+cursor position, so every client walking the list shares the same page
+entries.
+"""
+
+import json
+import base64
+
+def encode_cursor(last_id):
+    """Opaque token for the page after the row with ID last_id."""
+    payload = json.dumps({"after": last_id}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor):
+    """
+    Return the ID a cursor token points after.
+
+    Raises:
+        ValueError: If the token was not made by encode_cursor
+    """
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        after_id = json.loads(payload)["after"]
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    if not isinstance(after_id, int) or isinstance(after_id, bool) or after_id < 0:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return after_id
+
+def page_key(skip, limit, after_id=None):
+    """
+    Cache key suffix for a list page.
+
+    The first page is the same whether it is asked for with skip=0 or without
+    a cursor, so both share the cursor-aligned key.
+    """
+    if after_id is None and skip == 0:
+        after_id = 0
+    if after_id is not None:
+        return f"after{after_id}:limit{limit}"
+    return f"skip{skip}:limit{limit}"
+
+def next_cursor(page, limit):
+    """Cursor for the page after `page`, or None if it was the last page."""
+    if limit <= 0 or len(page) < limit:
+        return None
+    return encode_cursor(page[-1]["id"])
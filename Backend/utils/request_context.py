@@ -0,0 +1,162 @@
+"""
+Request-scoped instrumentation.
+
+DataSourceMiddleware starts a RequestMetrics for each request and stores it in
+a context variable. The cache and database layers add to it as they work,
+including from threadpool workers, which inherit the request's context. At the
+end of the request the middleware turns it into response headers, and
+checks the query count against the endpoint's budget, if it declares one.
+"""
+
+import os
+import time
+import logging
+import contextvars
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# What to do when a request runs more queries than its endpoint's budget: off, log or raise
+QUERY_BUDGET_MODE = os.getenv("DB_QUERY_BUDGET_MODE", "log").lower()
+
+class QueryBudgetExceeded(AssertionError):
+    """A request ran more SQL statements than its endpoint allows."""
+
+class RequestMetrics:
+    """What the cache and database did while serving one request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.l1_hits = 0
+        self.redis_hits = 0
+        self.cache_misses = 0
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.redis_calls = 0
+        self.redis_time = 0.0
+        self.pool_wait = 0.0
+
+    @property
+    def source(self):
+        """Where the response data came from, or None if neither cache nor database was used."""
+        if self.db_queries:
+            return "database"
+        if self.redis_hits:
+            return "redis_cache"
+        if self.l1_hits:
+            return "local_cache"
+        return None
+
+    @property
+    def cache_status(self):
+        hits = self.l1_hits + self.redis_hits
+        if hits and self.cache_misses:
+            return "PARTIAL"
+        if hits:
+            return "HIT"
+        if self.cache_misses:
+            return "MISS"
+        return None
+
+    def headers(self):
+        """Response headers describing this request."""
+        total = (time.perf_counter() - self.started) * 1000
+        timings = [
+            f'db;dur={self.db_time * 1000:.2f};desc="{self.db_queries} queries"',
+            f'redis;dur={self.redis_time * 1000:.2f};desc="{self.redis_calls} calls"',
+            f'pool;dur={self.pool_wait * 1000:.2f};desc="connection wait"',
+            f"total;dur={total:.2f}",
+        ]
+        headers = {"X-DB-Queries": str(self.db_queries), "Server-Timing": ", ".join(timings)}
+        if self.source:
+            headers["X-Data-Source"] = self.source
+        if self.cache_status:
+            headers["X-Cache"] = self.cache_status
+        return headers
+
+_current = contextvars.ContextVar("request_metrics", default=None)
+
+def query_budget(max_queries):
+    """
+    Declare the most SQL statements an endpoint may run per request.
+    
+    Apply it below the route decorator:
+    
+        @router.get("/{user_id}")
+        @query_budget(1)
+        async def read_user(...):
+    
+    With DB_QUERY_BUDGET_MODE=raise, for example in tests, a request over the
+    budget raises QueryBudgetExceeded; by default it is logged as a warning.
+    """
+    def decorate(endpoint):
+        endpoint.query_budget = max_queries
+        return endpoint
+    return decorate
+
+def check_query_budget(endpoint, metrics, path):
+    """Compare a finished request's query count with the budget of the endpoint that served it."""
+    budget = getattr(endpoint, "query_budget", None)
+    if budget is None or QUERY_BUDGET_MODE == "off" or metrics.db_queries <= budget:
+        return
+    message = f"{path} ran {metrics.db_queries} queries, over its budget of {budget}"
+    if QUERY_BUDGET_MODE == "raise":
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
+
+def start_request():
+    """Begin collecting metrics for the current request. Returns (metrics, reset token)."""
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+def end_request(token):
+    _current.reset(token)
+
+def current():
+    """Metrics of the request being served, or None outside a request."""
+    return _current.get()
+
+def record_cache(name, count=1):
+    """Count cache lookups, using the names from utils.cache.CacheStats."""
+    metrics = _current.get()
+    if metrics is None:
+        return
+    if name == "l1_hits":
+        metrics.l1_hits += count
+    elif name == "l2_hits":
+        metrics.redis_hits += count
+    elif name == "l2_misses":
+        metrics.cache_misses += count
+
+def record_redis(elapsed):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.redis_calls += 1
+        metrics.redis_time += elapsed
+
+def record_pool_wait(elapsed):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.pool_wait += elapsed
+
+def instrument_engine(engine):
+    """Count queries and query time per request on a SQLAlchemy engine."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.db_queries += 1
+            metrics.db_time += time.perf_counter() - started
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_started"):
+            conn.info["query_started"].pop()
@@ -0,0 +1,37 @@
+"""
+Line reader for streamed request bodies (NDJSON and CSV uploads).
+
+Lines are handed out as they arrive, so a large upload is never held in
+memory at once, and a line longer than STREAM_MAX_LINE_BYTES is rejected
+without reading the rest of it.
+"""
+
+import os
+
+from fastapi import HTTPException, Request
+
+# Longest line accepted in a streamed upload
+MAX_LINE_BYTES = int(os.getenv("STREAM_MAX_LINE_BYTES", 1048576))
+
+async def read_lines(request: Request):
+    """
+    Yield each non-empty line of the request body as it arrives.
+
+    Raises:
+        HTTPException: 413 as soon as a line is longer than MAX_LINE_BYTES
+    """
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            _check_length(line)
+            if line.strip():
+                yield line
+        _check_length(buffer)
+    if buffer.strip():
+        yield buffer
+
+def _check_length(line: bytes) -> None:
+    if len(line) > MAX_LINE_BYTES:
+        raise HTTPException(status_code=413, detail=f"Line exceeds {MAX_LINE_BYTES} bytes")